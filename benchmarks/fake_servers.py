@@ -0,0 +1,312 @@
+"""Local stand-ins for the Azure AI chat-completions and Jira REST APIs.
+
+The servers speak just enough of each protocol for ``TestCaseGenerator``
+to run unmodified against them, with configurable latency, error and
+throttling (429 + ``Retry-After``) rates and response sizes. They use
+only the standard library so benchmarks need no extra dependencies.
+"""
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class FaultProfile:
+    """Latency and failure behaviour applied to every request."""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_seconds: float = 0.5
+
+    def delay(self) -> None:
+        """Sleep for the configured latency plus uniform jitter."""
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0)
+
+    def fault(self) -> Optional[Tuple[int, Dict[str, str]]]:
+        """Return ``(status, headers)`` for an injected failure, if any."""
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429, {'Retry-After': str(self.retry_after_seconds)}
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, {}
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Shared plumbing: JSON bodies, fault injection and quiet logging."""
+
+    # HTTP/1.1 keeps connections alive so pooled clients behave realistically
+    protocol_version = 'HTTP/1.1'
+    profile: FaultProfile
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silence per-request logging; benchmarks issue thousands."""
+
+    def _read_json(self) -> Any:
+        """Read and decode the request body."""
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a JSON response with optional extra headers."""
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject(self) -> bool:
+        """Apply latency and maybe answer with a fault; True if handled."""
+        self.profile.delay()
+        fault = self.profile.fault()
+        if fault is None:
+            return False
+        status, headers = fault
+        self._send_json(status, {'error': {'code': str(status), 'message': 'injected fault'}}, headers)
+        return True
+
+
+def fake_test_cases(count: int, steps: int, seed: str) -> List[Dict[str, Any]]:
+    """Build ``count`` schema-valid test cases with ``steps`` steps each."""
+    return [{
+        'title': f"{seed} scenario {index + 1}",
+        'description': f"Verify behaviour {index + 1} of {seed}",
+        'preconditions': ['User account exists'],
+        'test_steps': [
+            {'step_number': step + 1, 'action': f"Perform action {step + 1}",
+             'expected_result': f"Result {step + 1} is shown"}
+            for step in range(steps)
+        ],
+        'expected_outcome': 'Feature behaves as specified',
+        'test_data': 'user@example.com',
+        'priority': random.choice(['Critical', 'High', 'Medium', 'Low']),
+        'test_type': random.choice(['Functional', 'Negative', 'Boundary']),
+        'labels': ['generated']
+    } for index in range(count)]
+
+
+class FakeAzureAIHandler(_Handler):
+    """Answers ``POST /chat/completions`` (plain and streamed)."""
+
+    test_cases_per_story: int = 5
+    steps_per_test_case: int = 4
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        if self._inject():
+            return
+        messages = body.get('messages', [])
+        system = messages[0].get('content', '') if messages else ''
+        prompt = messages[-1].get('content', '') if messages else ''
+        content = self._answer(system, prompt)
+        usage = {'prompt_tokens': sum(len(m.get('content', '')) for m in messages) // 4,
+                 'completion_tokens': len(content) // 4}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if body.get('stream'):
+            self._stream(content, body.get('model', 'fake'))
+            return
+        self._send_json(200, {
+            'id': 'cmpl-fake', 'created': int(time.time()), 'model': body.get('model', 'fake'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': usage
+        })
+
+    def _answer(self, system: str, prompt: str) -> str:
+        """Return a review verdict, a test case array or a packed object per the prompt."""
+        if 'reviewing test cases' in system and prompt.lstrip().startswith('['):
+            return json.dumps([{'index': case.get('index'), 'is_valid': True,
+                                'quality_score': random.randint(6, 9), 'feedback': 'Looks good',
+                                'suggestions': []} for case in json.loads(prompt)])
+        if 'reviewing test cases' in system:
+            return json.dumps({'is_valid': True, 'quality_score': random.randint(6, 9),
+                               'feedback': 'Looks good', 'suggestions': []})
+        packed = re.findall(r'### Story (S\d+)\s+Title: (.*)', prompt)
+        if packed:
+            return json.dumps({story_id: fake_test_cases(self.test_cases_per_story, self.steps_per_test_case,
+                                                         title.strip())
+                               for story_id, title in packed})
+        match = re.search(r'Title: (.*)', prompt)
+        seed = match.group(1).strip() if match else 'Story'
+        return json.dumps(fake_test_cases(self.test_cases_per_story, self.steps_per_test_case, seed))
+
+    def _stream(self, content: str, model: str) -> None:
+        """Send ``content`` as server-sent chat completion deltas."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pieces = [content[i:i + 40] for i in range(0, len(content), 40)]
+        for index, piece in enumerate(pieces):
+            finish = 'stop' if index == len(pieces) - 1 else None
+            event = {'id': 'cmpl-fake', 'created': int(time.time()), 'model': model,
+                     'choices': [{'index': 0, 'finish_reason': finish,
+                                  'delta': {'role': 'assistant', 'content': piece}}]}
+            self._chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data: bytes) -> None:
+        """Write one chunk of a chunked transfer-encoded body."""
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+
+class FakeJiraHandler(_Handler):
+    """Answers the Jira REST endpoints used by ``JiraService``."""
+
+    store: "JiraStore"
+
+    def do_GET(self) -> None:
+        if self._inject():
+            return
+        url = urlparse(self.path)
+        if url.path.endswith('/search'):
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            self._send_json(200, self.store.search(params.get('jql', ''), int(params.get('startAt', 0)),
+                                                   int(params.get('maxResults', 50)), params.get('fields', '*all')))
+        else:
+            self._send_json(404, {'errorMessages': ['not found']})
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        if self._inject():
+            return
+        path = urlparse(self.path).path
+        if path.endswith('/issue/bulk'):
+            issues, errors = [], []
+            for number, update in enumerate(body.get('issueUpdates', [])):
+                try:
+                    issues.append(self.store.create(update))
+                except IssueRejected as e:
+                    errors.append({'status': 400, 'failedElementNumber': number,
+                                   'elementErrors': {'errorMessages': [], 'errors': e.errors}})
+            # Jira answers 400 when no element could be created
+            self._send_json(201 if issues or not errors else 400, {'issues': issues, 'errors': errors})
+        elif path.endswith('/issue'):
+            try:
+                self._send_json(201, self.store.create(body))
+            except IssueRejected as e:
+                self._send_json(400, {'errorMessages': [], 'errors': e.errors})
+        elif path.endswith('/issueLink'):
+            self._send_json(201, {})
+        else:
+            self._send_json(404, {'errorMessages': ['not found']})
+
+    def do_PUT(self) -> None:
+        self._read_json()
+        if self._inject():
+            return
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class IssueRejected(Exception):
+    """An issue payload Jira would refuse, with its per-field errors."""
+
+    def __init__(self, errors: Dict[str, str]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class JiraStore:
+    """In-memory issue store seeded with stories and linked tests.
+
+    When ``priorities`` is given, creating an issue with any other priority
+    is rejected the way Jira rejects an unknown field value.
+    """
+
+    def __init__(self, project_key: str = 'BENCH', stories: int = 0, tests_per_story: int = 0,
+                 priorities: Optional[Set[str]] = None):
+        self.project_key = project_key
+        self.priorities = priorities
+        self._lock = threading.Lock()
+        self._issues: List[Dict[str, Any]] = []
+        for _ in range(stories):
+            story = self._add('Story', {})
+            for _ in range(tests_per_story):
+                self._add('Test', {'issuelinks': [{'outwardIssue': {'key': story['key']}}]})
+
+    def _add(self, issue_type: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Append an issue with the next key (caller holds the lock if shared)."""
+        key = f"{self.project_key}-{len(self._issues) + 1}"
+        issue = {'id': str(len(self._issues) + 1), 'key': key,
+                 'fields': {'issuetype': {'name': issue_type}, 'labels': [], **fields}}
+        self._issues.append(issue)
+        return issue
+
+    def create(self, update: Dict[str, Any]) -> Dict[str, str]:
+        """Create an issue from a create payload and return its reference."""
+        fields = dict(update.get('fields', {}))
+        links = [{'outwardIssue': link['add']['outwardIssue']}
+                 for link in (update.get('update') or {}).get('issuelinks', [])]
+        priority = (fields.get('priority') or {}).get('name')
+        if self.priorities is not None and priority not in self.priorities:
+            raise IssueRejected({'priority': f"Priority name '{priority}' is not valid"})
+        issue_type = (fields.pop('issuetype', None) or {}).get('name', 'Test')
+        fields.pop('description', None)
+        with self._lock:
+            issue = self._add(issue_type, {**fields, 'issuelinks': links})
+        return {'id': issue['id'], 'key': issue['key'], 'self': ''}
+
+    def search(self, jql: str, start: int, limit: int, fields: str = '*all') -> Dict[str, Any]:
+        """Evaluate the handful of JQL shapes the tool issues.
+
+        As in Jira, only the comma-separated ``fields`` are returned unless
+        it is ``*all``.
+        """
+        # Results are always in creation (key) order, so ORDER BY is dropped
+        # before matching, or it would be read as part of a type list
+        jql = re.split(r'\s+ORDER BY\s+', jql, flags=re.IGNORECASE)[0]
+        wanted_types = None
+        match = re.search(r'issuetype\s*(?:=\s*(\w+)|in\s*\(([^)]*)\))', jql)
+        if match:
+            names = match.group(1) or match.group(2)
+            wanted_types = {name.strip() for name in names.split(',') if name.strip()}
+        labels = set(re.findall(r'"(tcg-[^"]+)"', jql))
+        with self._lock:
+            matches = [issue for issue in self._issues
+                       if (wanted_types is None or issue['fields']['issuetype']['name'] in wanted_types)
+                       and (not labels or labels & set(issue['fields'].get('labels') or []))]
+        page = matches[start:start + min(limit, 100)]
+        if fields != '*all':
+            wanted_fields = set(fields.split(','))
+            page = [{**issue, 'fields': {name: value for name, value in issue['fields'].items()
+                                         if name in wanted_fields}} for issue in page]
+        return {'startAt': start, 'maxResults': limit, 'total': len(matches), 'issues': page}
+
+
+def _serve(handler: type) -> Tuple[ThreadingHTTPServer, str]:
+    """Start ``handler`` on a free localhost port in a daemon thread."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_fake_azure_ai(profile: FaultProfile, test_cases_per_story: int = 5,
+                        steps_per_test_case: int = 4) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the chat-completions stand-in and return ``(server, endpoint)``."""
+    handler = type('ConfiguredAzureAIHandler', (FakeAzureAIHandler,), {
+        'profile': profile,
+        'test_cases_per_story': test_cases_per_story,
+        'steps_per_test_case': steps_per_test_case
+    })
+    return _serve(handler)
+
+
+def start_fake_jira(profile: FaultProfile, store: JiraStore) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the Jira REST stand-in and return ``(server, base_url)``."""
+    handler = type('ConfiguredJiraHandler', (FakeJiraHandler,), {'profile': profile, 'store': store})
+    return _serve(handler)
@@ -0,0 +1,108 @@
+"""Cold-start benchmark: import and construction time of lightweight commands.
+
+Each scenario runs in a fresh interpreter several times; the median wall
+time above a bare ``python -c pass`` is reported. A scenario fails when it
+exceeds ``--max-ms`` or loads a module it must not need (for example the
+Azure SDK for a coverage-only run), and the script then exits with 1, so
+it can guard startup latency in CI.
+
+Example:
+    python benchmarks/import_time.py --runs 7 --max-ms 400 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+# Third-party SDKs that should only load when a command really uses them
+HEAVY_MODULES = ('azure', 'atlassian', 'aiohttp', 'numpy')
+
+# name -> (code to run, environment overrides, modules it must not load)
+SCENARIOS = {
+    'import main': ('import main', {}, HEAVY_MODULES),
+    'import cli': ('import cli', {}, HEAVY_MODULES),
+    'coverage generator': (
+        'from test_case_generator import TestCaseGenerator\n'
+        'TestCaseGenerator().jira_service',
+        {}, ('azure', 'aiohttp', 'numpy')
+    ),
+    'export generator': (
+        'from test_case_generator import TestCaseGenerator\n'
+        'TestCaseGenerator()',
+        {'OUTPUT_SINK': 'jira_csv'}, HEAVY_MODULES
+    ),
+}
+
+# Appended to every scenario: report which heavy modules got imported
+REPORT_MODULES = (
+    '\nimport json, sys\n'
+    'print(json.dumps([m for m in {modules!r} if m in sys.modules]))'
+)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse the benchmark command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='interpreter launches per scenario')
+    parser.add_argument('--max-ms', type=float, default=500.0,
+                        help='allowed median milliseconds above a bare interpreter')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    return parser.parse_args(argv)
+
+
+def launch(code: str, env: Dict[str, str], workdir: str) -> Any:
+    """Run ``code`` in a fresh interpreter; return (seconds, last stdout line)."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                               capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    lines = completed.stdout.strip().splitlines()
+    return elapsed, lines[-1] if lines else ''
+
+
+def main(argv: List[str]) -> int:
+    """Time every scenario and check its budget and module hygiene."""
+    args = parse_args(argv)
+    base_env = dict(os.environ)
+    base_env['PYTHONPATH'] = os.pathsep.join(filter(None, [SRC_DIR, ROOT_DIR, base_env.get('PYTHONPATH')]))
+    # Run from a scratch directory so journals/exports never touch the repo
+    workdir = os.path.join(ROOT_DIR, 'benchmarks', '.startup')
+    os.makedirs(workdir, exist_ok=True)
+    base_env.update({'JOURNAL_PATH': os.path.join(workdir, 'journal.sqlite3'),
+                     'EXPORT_PATH': os.path.join(workdir, 'export.csv')})
+
+    bare = statistics.median(launch('pass', base_env, workdir)[0] for _ in range(args.runs))
+    print(f"{'scenario':<22} {'median ms':>10} {'status':>8}  heavy modules loaded")
+    results = []
+    ok = True
+    for name, (code, overrides, forbidden) in SCENARIOS.items():
+        env = {**base_env, **overrides}
+        timings, loaded = [], []
+        for _ in range(args.runs):
+            elapsed, last_line = launch(code + REPORT_MODULES.format(modules=HEAVY_MODULES), env, workdir)
+            timings.append(elapsed)
+            loaded = json.loads(last_line or '[]')
+        median_ms = (statistics.median(timings) - bare) * 1000
+        violations = [module for module in loaded if module in forbidden]
+        passed = median_ms <= args.max_ms and not violations
+        ok = ok and passed
+        print(f"{name:<22} {median_ms:>10.1f} {'ok' if passed else 'FAIL':>8}  {', '.join(loaded) or '-'}")
+        results.append({'scenario': name, 'median_ms': round(median_ms, 1),
+                        'modules_loaded': loaded, 'forbidden_loaded': violations, 'passed': passed})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'arguments': vars(args), 'bare_interpreter_ms': round(bare * 1000, 1),
+                       'results': results}, output_file, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,214 @@
+"""Throughput benchmark for TestCaseGenerator against local fake services.
+
+Starts the stand-in servers from ``fake_servers``, points the application
+settings at them and drives ``process_user_story``,
+``batch_process_stories`` and ``get_test_coverage_report`` at several
+scales. Reports stories/min, p50/p95 per-story latency and peak traced
+memory, and can fail when throughput drops against a saved baseline.
+
+Example:
+    python benchmarks/run_benchmark.py --scales 10,50 --latency-ms 200 \\
+        --throttle-rate 0.05 --output bench.json --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from fake_servers import FaultProfile, JiraStore, start_fake_azure_ai, start_fake_jira
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+PROJECT_KEY = 'BENCH'
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse the benchmark command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='10,50', help='comma-separated story counts for the batch runs')
+    parser.add_argument('--single-runs', type=int, default=5, help='sequential process_user_story calls')
+    parser.add_argument('--coverage-stories', type=int, default=2000, help='stories seeded for the coverage run')
+    parser.add_argument('--tests-per-story', type=int, default=5, help='tests seeded per story')
+    parser.add_argument('--test-cases', type=int, default=5, help='test cases per generated story')
+    parser.add_argument('--steps', type=int, default=4, help='steps per generated test case')
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='fake Azure AI latency')
+    parser.add_argument('--jira-latency-ms', type=float, default=30.0, help='fake Jira latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 503 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--log-level', default='WARNING', help='application log level during the runs')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', help='compare stories/min with a previous --output file')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed fractional drop in stories/min against the baseline')
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, ai_url: str, jira_url: str, workdir: str) -> None:
+    """Point the application settings at the fake servers.
+
+    Settings are read from the environment when ``config`` is first
+    imported, so this must run before any application module is loaded.
+    """
+    os.environ.update({
+        'AZURE_AI_ENDPOINT': ai_url,
+        'AZURE_AI_KEY': 'benchmark',
+        'JIRA_URL': jira_url,
+        'JIRA_EMAIL': 'bench@example.com',
+        'JIRA_API_TOKEN': 'benchmark',
+        'JIRA_PROJECT_KEY': PROJECT_KEY,
+        # Generous budgets: the benchmark measures the pipeline, not quotas
+        'AZURE_AI_REQUESTS_PER_MINUTE': '100000',
+        'AZURE_AI_TOKENS_PER_MINUTE': '0',
+        'JIRA_REQUESTS_PER_MINUTE': '100000',
+        'RETRY_BACKOFF_BASE': '0.05',
+        # Caches and journals would turn repeated runs into no-ops
+        'LLM_CACHE_ENABLED': 'false',
+        'JOURNAL_ENABLED': 'false',
+        'COVERAGE_SNAPSHOT_PATH': os.path.join(workdir, 'coverage_{project_key}.json'),
+    })
+    sys.path.insert(0, SRC_DIR)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of ``values``."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def measure(name: str, stories: int, run: Callable[[], Any]) -> Dict[str, Any]:
+    """Run one scenario, tracing wall time and peak Python memory."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    latencies = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        'scenario': name,
+        'stories': stories,
+        'seconds': round(elapsed, 3),
+        'stories_per_min': round(stories / elapsed * 60, 1) if elapsed and stories else 0.0,
+        'p50_seconds': round(percentile(latencies, 0.50), 3),
+        'p95_seconds': round(percentile(latencies, 0.95), 3),
+        'peak_memory_mb': round(peak / 1024 / 1024, 2)
+    }
+    print(f"{name:<28} {stories:>7} {result['seconds']:>9.2f} {result['stories_per_min']:>12.1f} "
+          f"{result['p50_seconds']:>8.3f} {result['p95_seconds']:>8.3f} {result['peak_memory_mb']:>9.2f}")
+    return result
+
+
+def story_data(count: int) -> List[Dict[str, Any]]:
+    """Build ``count`` batch entries in the format ``batch_process_stories`` takes."""
+    return [{
+        'story': {
+            'title': f"Benchmark story {index}",
+            'description': 'As a user, I want the feature so that I get value',
+            'acceptance_criteria': ['Criterion one', 'Criterion two', 'Criterion three']
+        },
+        'parent_key': f"{PROJECT_KEY}-{index + 1}"
+    } for index in range(count)]
+
+
+def run_scenarios(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Run every scenario and return their measurements."""
+    from models import UserStory
+    from test_case_generator import TestCaseGenerator
+
+    # Applied after the imports, which configure logging themselves
+    logging.getLogger().setLevel(args.log_level)
+    results = []
+
+    def single() -> List[float]:
+        async def go() -> List[float]:
+            async with TestCaseGenerator() as generator:
+                latencies = []
+                for entry in story_data(args.single_runs):
+                    result = await generator.process_user_story(UserStory(**entry['story']), entry['parent_key'])
+                    latencies.append(result['metrics']['wall_time_seconds'])
+                return latencies
+        return asyncio.run(go())
+
+    results.append(measure('process_user_story', args.single_runs, single))
+
+    for scale in [int(value) for value in args.scales.split(',') if value]:
+        def batch(scale: int = scale) -> List[float]:
+            async def go() -> List[float]:
+                async with TestCaseGenerator() as generator:
+                    batch_results = await generator.batch_process_stories(story_data(scale))
+                return [r['metrics']['wall_time_seconds'] for r in batch_results if 'metrics' in r]
+            return asyncio.run(go())
+
+        results.append(measure(f"batch_process_stories[{scale}]", scale, batch))
+
+    def coverage() -> List[float]:
+        generator = TestCaseGenerator()
+        started = time.perf_counter()
+        report = generator.get_test_coverage_report(PROJECT_KEY)
+        asyncio.run(generator.close())
+        if not report:
+            raise RuntimeError('coverage report failed')
+        # A report over the wrong issue set would time a different workload
+        if report['total_stories'] != args.coverage_stories:
+            raise RuntimeError(f"coverage report saw {report['total_stories']} stories, "
+                               f"expected {args.coverage_stories}")
+        return [time.perf_counter() - started]
+
+    results.append(measure('get_test_coverage_report', args.coverage_stories, coverage))
+    return results
+
+
+def check_baseline(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> bool:
+    """Return False if any scenario's throughput fell below the allowed floor."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = {entry['scenario']: entry for entry in json.load(baseline_file)['results']}
+    ok = True
+    for entry in results:
+        previous = baseline.get(entry['scenario'])
+        if not previous or not previous['stories_per_min']:
+            continue
+        floor = previous['stories_per_min'] * (1 - max_regression)
+        if entry['stories_per_min'] < floor:
+            print(f"REGRESSION {entry['scenario']}: {entry['stories_per_min']} stories/min "
+                  f"< {floor:.1f} (baseline {previous['stories_per_min']})")
+            ok = False
+    return ok
+
+
+def main(argv: List[str]) -> int:
+    """Start the fake services, run the scenarios and report."""
+    args = parse_args(argv)
+    ai_profile = FaultProfile(latency_ms=args.latency_ms, error_rate=args.error_rate,
+                              throttle_rate=args.throttle_rate)
+    jira_profile = FaultProfile(latency_ms=args.jira_latency_ms, error_rate=args.error_rate,
+                                throttle_rate=args.throttle_rate)
+    store = JiraStore(PROJECT_KEY, stories=args.coverage_stories, tests_per_story=args.tests_per_story)
+    ai_server, ai_url = start_fake_azure_ai(ai_profile, args.test_cases, args.steps)
+    jira_server, jira_url = start_fake_jira(jira_profile, store)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, ai_url, jira_url, workdir)
+        print(f"{'scenario':<28} {'stories':>7} {'seconds':>9} {'stories/min':>12} {'p50':>8} {'p95':>8} {'peak MB':>9}")
+        try:
+            results = run_scenarios(args)
+        finally:
+            ai_server.shutdown()
+            jira_server.shutdown()
+
+    # Compare before writing so --output and --baseline may share a path
+    ok = check_baseline(results, args.baseline, args.max_regression) if args.baseline and \
+        os.path.exists(args.baseline) else True
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'arguments': vars(args), 'results': results}, output_file, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,49 +1,49 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Any
+import sys
 from test_case_generator import TestCaseGenerator
 from models import UserStory
 from config import settings
+from metrics import serve_prometheus
 
-logging.basicConfig(level=getattr(logging, settings.log_level))
 logger = logging.getLogger(__name__)
 
 async def main():
     """Main application entry point."""
-    generator = TestCaseGenerator()
+    async with TestCaseGenerator() as generator:
     
-    # Example user story
-    sample_story = UserStory(
-        title="User Login Functionality",
-        description="As a user, I want to log into the system using my email and password so that I can access my account.",
-        acceptance_criteria=[
-            "User can enter email and password",
-            "System validates credentials",
-            "User is redirected to dashboard on successful login",
-            "Error message is shown for invalid credentials",
-            "Account is locked after 3 failed attempts"
-        ]
-    )
+        # Example user story
+        sample_story = UserStory(
+            title="User Login Functionality",
+            description="As a user, I want to log into the system using my email and password so that I can access my account.",
+            acceptance_criteria=[
+                "User can enter email and password",
+                "System validates credentials",
+                "User is redirected to dashboard on successful login",
+                "Error message is shown for invalid credentials",
+                "Account is locked after 3 failed attempts"
+            ]
+        )
     
-    # Process single story
-    logger.info("Processing sample user story...")
-    result = await generator.process_user_story(sample_story)
+        # Process single story
+        logger.info("Processing sample user story...")
+        result = await generator.process_user_story(sample_story)
     
-    print("\n=== PROCESSING RESULTS ===")
-    print(json.dumps(result, indent=2))
+        print("\n=== PROCESSING RESULTS ===")
+        print(json.dumps(result, indent=2))
     
-    # Generate coverage report
-    logger.info("Generating test coverage report...")
-    coverage_report = generator.get_test_coverage_report(settings.jira_project_key)
+        # Generate coverage report
+        logger.info("Generating test coverage report...")
+        coverage_report = generator.get_test_coverage_report(
+            settings.jira_project_key, incremental=settings.coverage_incremental
+        )
     
-    print("\n=== COVERAGE REPORT ===")
-    print(json.dumps(coverage_report, indent=2))
+        print("\n=== COVERAGE REPORT ===")
+        print(json.dumps(coverage_report, indent=2))
 
 def run_batch_example():
     """Example of batch processing multiple stories."""
-    generator = TestCaseGenerator()
-    
     stories_data = [
         {
             'story': {
@@ -71,7 +71,8 @@ def run_batch_example():
     ]
     
     async def process_batch():
-        results = await generator.batch_process_stories(stories_data)
+        async with TestCaseGenerator() as generator:
+            results = await generator.batch_process_stories(stories_data)
         print("\n=== BATCH PROCESSING RESULTS ===")
         for result in results:
             print(json.dumps(result, indent=2))
@@ -80,8 +81,18 @@ def run_batch_example():
     asyncio.run(process_batch())
 
 if __name__ == "__main__":
+    # With arguments, run the JSONL command line (see cli.py)
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    # Configured here, not at import, so importing this module has no side effects
+    logging.basicConfig(level=getattr(logging, settings.log_level))
     print("Azure AI Foundry + Jira Test Case Generator")
     print("===========================================")
+
+    if settings.metrics_port:
+        serve_prometheus(settings.metrics_port, settings.metrics_host)
     
     # Run main example
     asyncio.run(main())
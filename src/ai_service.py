@@ -1,22 +1,422 @@
+import asyncio
 import json
 import logging
-from typing import List, Dict, Any
-from azure.ai.inference import ChatCompletionsClient
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, TypeVar
+# The ``aio`` client is used so completions run on the event loop instead of
+# blocking it; azure-core shares one pooled aiohttp session per client.
+from azure.ai.inference.aio import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
 from azure.core.credentials import AzureKeyCredential
-from models import TestCase, UserStory, TestType, Priority
+from models import TestCase, UserStory
 from config import settings
+from rate_limiter import call_with_retry_async, get_rate_limiter
+from llm_cache import CompletionCache
+from json_stream import JsonArrayStreamParser
+from metrics import record_call, record_escalation, record_recovery, record_usage, track_call
+from prevalidation import score_test_case
+from recovery import SalvagedAnswer, coerce_test_case, decode_lenient, salvage_rejected, \
+    salvage_test_cases, strip_fence
 
-logging.basicConfig(level=getattr(logging, settings.log_level))
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Appended to the generation prompt when several stories share a request.
+# It is static so the whole system message forms an identical prefix on
+# every packed request, which provider-side prompt caching can reuse.
+PACKED_STORIES_INSTRUCTIONS = """
+You will receive several user stories, each introduced by an id line such as
+"### Story S1". Generate test cases for every story independently.
+
+Respond with a single JSON object mapping each story id to that story's
+array of test cases, for example:
+{"S1": [ ...test cases... ], "S2": [ ...test cases... ]}
+Include every story id exactly once and nothing outside the JSON object.
+"""
+
+VALIDATION_PROMPT = """
+You are a QA Lead reviewing test cases for quality and completeness.
+
+Evaluate the following test case and provide feedback on:
+1. Clarity of test steps
+2. Completeness of coverage
+3. Realistic test data
+4. Appropriate priority level
+5. Missing elements
+
+Respond with JSON format:
+{
+    "is_valid": true/false,
+    "quality_score": 1-10,
+    "feedback": "Detailed feedback",
+    "suggestions": ["suggestion 1", "suggestion 2"]
+}
+"""
+
+# Appended to the validation prompt when several cases share a request
+BATCH_VALIDATION_INSTRUCTIONS = """
+You will receive a JSON array of test cases, each with an "index" field.
+Evaluate every test case independently and respond with a JSON array
+containing one object in the format above per test case, each including
+the "index" of the test case it refers to. Respond with the array only.
+"""
+
+# Appended to the story when a generation was cut off; the titles listed
+# are the cases already received
+CONTINUATION_INSTRUCTIONS = """
+Your previous answer for this story was cut off. These test cases were
+already received:
+{titles}
+
+Respond with a JSON array containing only the remaining test cases for this
+story, without repeating any of the above. Respond with [] if none remain.
+"""
+
+# Sent with a single test case that failed schema validation
+REPAIR_INSTRUCTIONS = """
+This test case could not be used because: {error}
+
+{test_case}
+
+Respond with the corrected test case as a single JSON object in the
+structure above, keeping its content. Respond with the object only.
+"""
+
+# Verdict used when validation itself fails, so a review outage never
+# blocks filing
+FALLBACK_VALIDATION = {"is_valid": True, "quality_score": 5, "feedback": "Validation failed", "suggestions": []}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting."""
+    return len(text) // 4
+
+
+class TokenUsage(NamedTuple):
+    """Token usage in the shape of a response's ``usage`` block."""
+
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class StoryPacker:
+    """Incrementally group consecutive small stories into packs.
+
+    Stories estimated above ``packing_small_story_tokens`` always get a
+    request of their own; small ones are packed in input order until the
+    pack would exceed ``packing_token_budget`` or ``packing_max_stories``.
+    Packs are handed out as soon as they are closed, so stories arriving
+    from a stream never wait for more than one open pack to fill.
+    """
+
+    def __init__(self):
+        self._current: List[Any] = []
+        self._current_tokens = 0
+
+    def add(self, item: Any, user_story: UserStory) -> List[List[Any]]:
+        """Add a story (identified by ``item``) and return the packs it closed."""
+        tokens = estimate_tokens(format_story(user_story))
+        if tokens > settings.packing_small_story_tokens:
+            return [[item]]
+        closed = []
+        if self._current and (self._current_tokens + tokens > settings.packing_token_budget
+                              or len(self._current) >= settings.packing_max_stories):
+            closed.append(self._current)
+            self._current, self._current_tokens = [], 0
+        self._current.append(item)
+        self._current_tokens += tokens
+        if len(self._current) >= settings.packing_max_stories:
+            # Full already: no later story can join it
+            closed.append(self._current)
+            self._current, self._current_tokens = [], 0
+        return closed
+
+    def flush(self) -> List[List[Any]]:
+        """Return the open pack, if any, at the end of the input."""
+        closed = [self._current] if self._current else []
+        self._current, self._current_tokens = [], 0
+        return closed
+
+
+def plan_story_packs(user_stories: List[UserStory]) -> List[List[int]]:
+    """Group a list of stories into packs; see ``StoryPacker``.
+
+    Returns lists of indices into ``user_stories``.
+    """
+    packer = StoryPacker()
+    packs: List[List[int]] = []
+    for index, user_story in enumerate(user_stories):
+        packs.extend(packer.add(index, user_story))
+    return packs + packer.flush()
+
+
+def plan_validation_chunks(test_cases: List[TestCase]) -> List[List[int]]:
+    """Split test case indices into chunks for batched validation.
+
+    Consecutive cases are grouped until the chunk would exceed
+    ``validation_batch_token_budget`` or ``validation_batch_max_cases``; a
+    case larger than the budget gets a chunk of its own.
+    """
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, test_case in enumerate(test_cases):
+        tokens = estimate_tokens(test_case.model_dump_json(indent=2))
+        if current and (current_tokens + tokens > settings.validation_batch_token_budget
+                        or len(current) >= settings.validation_batch_max_cases):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_verdict(content: str) -> Dict[str, Any]:
+    """Parse a validation answer, rejecting anything without a numeric score."""
+    verdict = json.loads(content)
+    if not is_verdict(verdict):
+        raise ValueError("Validation response is not a verdict object")
+    return verdict
+
+
+def is_verdict(verdict: Any) -> bool:
+    """Return True for a verdict dict carrying a numeric ``quality_score``."""
+    return (isinstance(verdict, dict) and isinstance(verdict.get('quality_score'), (int, float))
+            and not isinstance(verdict.get('quality_score'), bool))
+
+
+def verdict_acceptable(verdict: Optional[Dict[str, Any]]) -> bool:
+    """Return True when a small-model verdict can stand without escalation."""
+    return verdict is not None and verdict['quality_score'] >= settings.cascade_min_quality_score
+
+
+def test_cases_acceptable(test_cases: List[TestCase]) -> bool:
+    """Return True when every generated case passes the local quality rules."""
+    return bool(test_cases) and all(
+        score_test_case(test_case)[0] >= settings.cascade_min_quality_score for test_case in test_cases
+    )
+
+
+def prefers_small_model(user_story: UserStory) -> bool:
+    """Return True when a story is short enough to try the small model first."""
+    return bool(settings.azure_ai_small_model) and \
+        estimate_tokens(format_story(user_story)) <= settings.cascade_short_story_tokens
+
+
+def escalation_reason(error: Exception) -> str:
+    """Classify a small-model failure for the escalation metric.
+
+    An answer that does not parse or fit the schema raises ``ValueError``
+    (``json.JSONDecodeError``, pydantic's ``ValidationError``) or, when the
+    JSON is not an object where a test case was expected, ``TypeError``;
+    both count as ``invalid_output``. Anything else is an ``error`` of the
+    deployment itself.
+    """
+    return "invalid_output" if isinstance(error, (ValueError, TypeError)) else "error"
+
+
+def format_story(user_story: UserStory) -> str:
+    """Render a user story as the text sent to the model."""
+    return f"""
+Title: {user_story.title}
+Description: {user_story.description}
+Acceptance Criteria: {' | '.join(user_story.acceptance_criteria)}
+"""
+
+
+class CompletionParseError(ValueError):
+    """A completion arrived but could not be parsed.
+
+    Keeps the raw answer and its ``finish_reason`` so callers can recover
+    what is usable instead of asking for the whole answer again.
+    """
+
+    def __init__(self, error: Exception, content: str, finish_reason: Optional[str]):
+        super().__init__(str(error))
+        self.error = error
+        self.content = content
+        self.finish_reason = finish_reason
+
+
 class AzureAIService:
     def __init__(self):
         self.client = ChatCompletionsClient(
             endpoint=settings.azure_ai_endpoint,
-            credential=AzureKeyCredential(settings.azure_ai_key)
+            credential=AzureKeyCredential(settings.azure_ai_key),
+            # Retries are handled by rate_limiter so 429s feed the shared
+            # limiter; azure-core's own retry policy would hide them.
+            retry_total=0
+        )
+        self.rate_limiter = get_rate_limiter("azure_ai")
+        self.cache: Optional[CompletionCache] = None
+        if settings.llm_cache_enabled:
+            try:
+                self.cache = CompletionCache(
+                    settings.llm_cache_path,
+                    ttl_seconds=settings.llm_cache_ttl_seconds,
+                    max_entries=settings.llm_cache_max_entries
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache unavailable, continuing without it: {e}")
+
+    async def close(self) -> None:
+        """Close the shared HTTP session held by the async client."""
+        await self.client.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def __aenter__(self) -> "AzureAIService":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def _complete(self, messages: List[Any], max_tokens: int, temperature: float,
+                        stream: bool = False, operation: str = "complete", model: Optional[str] = None) -> Any:
+        """Run a chat completion under the shared rate limiter with retries.
+
+        ``model`` defaults to ``azure_ai_model``. Calls are timed and their
+        token usage recorded under ``operation`` and the model.
+        With ``stream=True`` the retries cover opening the stream only; use
+        ``_stream_completion``, which also settles the stream's usage.
+        """
+        # Reserve prompt (~4 characters per token) plus the completion budget
+        # up front, then settle against the usage the service reports.
+        reserved = self._reservation(messages, max_tokens)
+        model = model or settings.azure_ai_model
+        request = dict(
+            limiter=self.rate_limiter,
+            tokens=reserved,
+            messages=messages,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream,
+            connection_timeout=settings.timeout,
+            read_timeout=settings.timeout
         )
-        
+        if stream:
+            return await call_with_retry_async(self.client.complete, **request)
+
+        with track_call("azure_ai", operation, model):
+            response = await call_with_retry_async(self.client.complete, **request)
+        usage = getattr(response, "usage", None)
+        self.rate_limiter.record_tokens(reserved, getattr(usage, "total_tokens", None))
+        record_usage(model, usage)
+        return response
+
+    @staticmethod
+    def _reservation(messages: List[Any], max_tokens: int) -> int:
+        """Tokens reserved for a request: the estimated prompt plus ``max_tokens``."""
+        return sum(estimate_tokens(m.content) for m in messages) + max_tokens
+
+    async def _stream_completion(self, messages: List[Any], max_tokens: int, temperature: float,
+                                 model: Optional[str] = None) -> AsyncIterator[Any]:
+        """Stream a completion, yielding the first choice of each update.
+
+        Once the stream ends (or fails) its token usage is recorded and the
+        rate limiter's reservation settled. Most deployments report no usage
+        on streams, so it is then estimated (~4 characters per token) from
+        the prompt and the content received.
+        """
+        model = model or settings.azure_ai_model
+        response = await self._complete(messages, max_tokens=max_tokens, temperature=temperature,
+                                        stream=True, model=model)
+        usage = None
+        received = 0
+        try:
+            async for update in response:
+                usage = getattr(update, "usage", None) or usage
+                if not update.choices:
+                    continue
+                choice = update.choices[0]
+                if choice.delta and choice.delta.content:
+                    received += len(choice.delta.content)
+                yield choice
+        finally:
+            await response.aclose()
+            if usage is None:
+                prompt_tokens, completion_tokens = self._reservation(messages, 0), received // 4
+                usage = TokenUsage(prompt_tokens, completion_tokens, prompt_tokens + completion_tokens)
+            self.rate_limiter.record_tokens(self._reservation(messages, max_tokens),
+                                            getattr(usage, "total_tokens", None))
+            record_usage(model, usage)
+
+    async def _complete_parsed(self, messages: List[Any], max_tokens: int, temperature: float,
+                               parse: Callable[[str], T], subject: Optional[Any] = None,
+                               bypass_cache: bool = False, operation: str = "complete",
+                               model: Optional[str] = None) -> T:
+        """Return the parsed completion, served from the cache when possible.
+
+        Only answers that ``parse`` accepts are stored, and a cached answer
+        that no longer parses (e.g. after a model change) is discarded, so a
+        bad completion is never replayed. ``bypass_cache`` (or the
+        ``LLM_CACHE_BYPASS`` setting) skips the lookup but still refreshes
+        the entry with the new answer. A fresh answer that ``parse`` rejects
+        raises ``CompletionParseError``.
+        """
+        key = None
+        if self.cache is not None:
+            key = CompletionCache.make_key(model or settings.azure_ai_model, messages, temperature,
+                                           max_tokens, subject)
+            if not (bypass_cache or settings.llm_cache_bypass):
+                cached = self.cache.get(key)
+                if cached is not None:
+                    try:
+                        result = parse(cached)
+                        logger.debug(f"LLM cache hit: {key[:12]}")
+                        return result
+                    except Exception:
+                        self.cache.delete(key)
+
+        response = await self._complete(messages, max_tokens=max_tokens, temperature=temperature,
+                                        operation=operation, model=model)
+        content = response.choices[0].message.content
+        try:
+            result = parse(content)
+        except Exception as e:
+            raise CompletionParseError(e, content, response.choices[0].finish_reason) from e
+        # Truncated answers are not cached even if they happen to parse
+        if key is not None and response.choices[0].finish_reason != "length":
+            self.cache.put(key, content)
+        return result
+
+    async def _cascade(self, operation: str, attempt: Callable[[Optional[str]], Awaitable[T]],
+                       acceptable: Callable[[T], bool]) -> T:
+        """Run ``attempt`` on the small model, escalating to the large one.
+
+        The large model redoes the request when the small model's answer
+        does not parse or fit the schema, when ``acceptable`` rejects it, or
+        when the small deployment fails outright; see ``escalation_reason``.
+        """
+        try:
+            result = await attempt(settings.azure_ai_small_model)
+            if acceptable(result):
+                return result
+            reason = "low_score"
+        except Exception as e:
+            reason = escalation_reason(e)
+            logger.warning(f"Small model {settings.azure_ai_small_model} failed for {operation} ({reason}): {e}")
+        record_escalation(operation, reason)
+        logger.info(f"Escalating {operation} to {settings.azure_ai_model} ({reason})")
+        return await attempt(None)
+
+    def _parse_test_cases(self, content: str) -> List[TestCase]:
+        """Parse a JSON array of test cases returned by the model."""
+        test_cases_data = json.loads(content)
+        test_cases = []
+
+        for tc_data in test_cases_data:
+            test_case = TestCase(**tc_data)
+            test_cases.append(test_case)
+
+        return test_cases
+
     def _get_test_case_prompt(self) -> str:
         return """
 You are a Senior QA Engineer tasked with creating comprehensive test cases.
@@ -62,36 +462,40 @@ Ensure test cases are:
 - Properly prioritized based on business impact
 """
 
-    async def generate_test_cases(self, user_story: UserStory) -> List[TestCase]:
-        """Generate test cases from a user story using Azure AI."""
+    def _build_generation_messages(self, user_story: UserStory) -> List[Any]:
+        """Build the chat messages that ask for a story's test cases."""
+        return [
+            SystemMessage(content=self._get_test_case_prompt()),
+            UserMessage(content=format_story(user_story))
+        ]
+
+    async def generate_test_cases(self, user_story: UserStory, bypass_cache: bool = False,
+                                  cascade: bool = True) -> List[TestCase]:
+        """Generate test cases from a user story using Azure AI.
+
+        Short stories go to the small model first when one is configured
+        (``cascade=False`` goes straight to the large model); its answer is
+        escalated unless every case passes the local quality rules.
+        """
         try:
-            story_text = f"""
-Title: {user_story.title}
-Description: {user_story.description}
-Acceptance Criteria: {' | '.join(user_story.acceptance_criteria)}
-"""
-            
-            messages = [
-                SystemMessage(content=self._get_test_case_prompt()),
-                UserMessage(content=story_text)
-            ]
-            
-            response = self.client.complete(
-                messages=messages,
-                model=settings.azure_ai_model,
-                max_tokens=4000,
-                temperature=0.3
-            )
-            
-            content = response.choices[0].message.content
-            
-            # Parse JSON response
-            test_cases_data = json.loads(content)
-            test_cases = []
-            
-            for tc_data in test_cases_data:
-                test_case = TestCase(**tc_data)
-                test_cases.append(test_case)
+            messages = self._build_generation_messages(user_story)
+
+            async def attempt(model: Optional[str]) -> List[TestCase]:
+                try:
+                    return await self._complete_parsed(
+                        messages, max_tokens=4000, temperature=0.3,
+                        parse=self._parse_test_cases, subject=user_story, bypass_cache=bypass_cache,
+                        operation="generate", model=model
+                    )
+                except CompletionParseError as e:
+                    if not settings.recovery_enabled:
+                        raise e.error
+                    return await self._recover_test_cases(user_story, e, model)
+
+            if cascade and prefers_small_model(user_story):
+                test_cases = await self._cascade("generate", attempt, test_cases_acceptable)
+            else:
+                test_cases = await attempt(None)
                 
             logger.info(f"Generated {len(test_cases)} test cases for story: {user_story.title}")
             return test_cases
@@ -103,42 +507,419 @@ Acceptance Criteria: {' | '.join(user_story.acceptance_criteria)}
             logger.error(f"Error generating test cases: {e}")
             raise
 
-    async def validate_test_case(self, test_case: TestCase) -> Dict[str, Any]:
-        """Validate a test case for completeness and quality."""
-        validation_prompt = """
-You are a QA Lead reviewing test cases for quality and completeness.
+    async def _recover_test_cases(self, user_story: UserStory, error: CompletionParseError,
+                                  model: Optional[str]) -> List[TestCase]:
+        """Rebuild a story's test cases from an answer that failed to parse.
 
-Evaluate the following test case and provide feedback on:
-1. Clarity of test steps
-2. Completeness of coverage
-3. Realistic test data
-4. Appropriate priority level
-5. Missing elements
+        Every complete case is kept; a truncated answer (``finish_reason``
+        ``length`` or an unclosed array) is continued for the missing cases
+        only and cases that fail validation are repaired one at a time.
+        Raises the original parse error when nothing could be recovered.
+        """
+        answer = salvage_test_cases(error.content)
+        truncated = error.finish_reason == "length" or not answer.complete
+        record_recovery("salvaged", len(answer.test_cases) - answer.normalized)
+        record_recovery("normalized", answer.normalized)
+        test_cases = answer.test_cases + await self._recover_rest(
+            user_story, answer.test_cases, answer.broken, truncated, model
+        )
+        if not test_cases:
+            raise error.error
+        logger.info(f"Recovered {len(test_cases)} test cases for story '{user_story.title}' from an "
+                    f"unparseable answer ({len(answer.test_cases)} kept, finish_reason={error.finish_reason})")
+        return test_cases
 
-Respond with JSON format:
-{
-    "is_valid": true/false,
-    "quality_score": 1-10,
-    "feedback": "Detailed feedback",
-    "suggestions": ["suggestion 1", "suggestion 2"]
-}
-"""
-        
-        try:
+    async def _recover_rest(self, user_story: UserStory, received: List[TestCase], broken: List[Any],
+                            truncated: bool, model: Optional[str]) -> List[TestCase]:
+        """Fetch the cases missing after ``received``: continue the answer if
+        it was ``truncated``, then repair the ``broken`` ones."""
+        broken = list(broken)
+        recovered: List[TestCase] = []
+        if truncated:
+            recovered = await self._continue_generation(user_story, received, broken, model)
+        return recovered + await self._repair_test_cases(broken, model)
+
+    async def _continue_generation(self, user_story: UserStory, received: List[TestCase],
+                                   broken: List[Any], model: Optional[str]) -> List[TestCase]:
+        """Ask for the test cases a cut-off answer did not reach.
+
+        Up to ``recovery_max_continuations`` requests are made, each listing
+        the titles received so far; cases repeating one are dropped and
+        broken ones are appended to ``broken``.
+        """
+        continued: List[TestCase] = []
+        for _ in range(settings.recovery_max_continuations):
+            titles = [test_case.title for test_case in received + continued]
             messages = [
-                SystemMessage(content=validation_prompt),
-                UserMessage(content=test_case.model_dump_json(indent=2))
+                SystemMessage(content=self._get_test_case_prompt()),
+                UserMessage(content=format_story(user_story) + CONTINUATION_INSTRUCTIONS.format(
+                    titles='\n'.join(f"- {title}" for title in titles) or "(none)"
+                ))
             ]
-            
-            response = self.client.complete(
-                messages=messages,
-                model=settings.azure_ai_model,
-                max_tokens=1000,
-                temperature=0.2
+            try:
+                response = await self._complete(messages, max_tokens=4000, temperature=0.3,
+                                                operation="generate_continue", model=model)
+            except Exception as e:
+                logger.warning(f"Continuation for story '{user_story.title}' failed: {e}")
+                break
+            choice = response.choices[0]
+            answer = salvage_test_cases(choice.message.content)
+            seen = {title.strip().lower() for title in titles}
+            fresh = [test_case for test_case in answer.test_cases if test_case.title.strip().lower() not in seen]
+            continued.extend(fresh)
+            broken.extend(answer.broken)
+            if (choice.finish_reason != "length" and answer.complete) or not fresh:
+                break
+        record_recovery("continued", len(continued))
+        return continued
+
+    async def _repair_test_cases(self, broken: List[Any], model: Optional[str]) -> List[TestCase]:
+        """Re-request ``(data, error)`` cases one at a time, concurrently.
+
+        At most ``recovery_max_repairs`` are sent; cases that still cannot
+        be repaired are dropped.
+        """
+        if len(broken) > settings.recovery_max_repairs:
+            logger.warning(f"Dropping {len(broken) - settings.recovery_max_repairs} unrepairable test cases")
+        repaired = await asyncio.gather(*(
+            self._repair_test_case(data, error, model) for data, error in broken[:settings.recovery_max_repairs]
+        ))
+        test_cases = [test_case for test_case in repaired if test_case is not None]
+        record_recovery("re_requested", len(test_cases))
+        return test_cases
+
+    async def _repair_test_case(self, data: Any, error: str, model: Optional[str]) -> Optional[TestCase]:
+        """Send one invalid test case back with its error; None if still unusable."""
+        raw = data if isinstance(data, str) else json.dumps(data, indent=2)
+        messages = [
+            SystemMessage(content=self._get_test_case_prompt()),
+            UserMessage(content=REPAIR_INSTRUCTIONS.format(error=error, test_case=raw))
+        ]
+
+        def parse(content: str) -> TestCase:
+            value = decode_lenient(strip_fence(content))
+            if isinstance(value, list) and len(value) == 1:
+                value = value[0]
+            return coerce_test_case(value)[0]
+
+        try:
+            return await self._complete_parsed(messages, max_tokens=1500, temperature=0.2, parse=parse,
+                                               operation="repair", model=model)
+        except Exception as e:
+            logger.warning(f"Could not repair test case: {e}")
+            return None
+
+    async def generate_test_cases_packed(self, user_stories: List[UserStory],
+                                         bypass_cache: bool = False) -> List[List[TestCase]]:
+        """Generate test cases for several small stories in one request.
+
+        The stories are sent under ids S1..Sn after a static system prompt
+        and the answer is split back per id. Any story whose entry is
+        missing or fails to parse is regenerated on its own, so a partly
+        bad answer never loses a story. Packs of short stories go to the
+        small model when one is configured; a story whose cases then fail
+        the quality rules is regenerated on the large model. Returns one
+        list per input story.
+        """
+        if len(user_stories) == 1:
+            return [await self.generate_test_cases(user_stories[0], bypass_cache)]
+
+        story_ids = [f"S{number}" for number in range(1, len(user_stories) + 1)]
+        stories_text = ''.join(
+            f"### Story {story_id}{format_story(user_story)}\n"
+            for story_id, user_story in zip(story_ids, user_stories)
+        )
+        messages = [
+            SystemMessage(content=self._get_test_case_prompt() + PACKED_STORIES_INSTRUCTIONS),
+            UserMessage(content=stories_text)
+        ]
+        max_tokens = min(settings.packing_output_tokens_per_story * len(user_stories),
+                         settings.packing_max_output_tokens)
+        small_model = settings.azure_ai_small_model if all(map(prefers_small_model, user_stories)) else None
+
+        def parse(content: str) -> Dict[str, Any]:
+            data = json.loads(content)
+            if not isinstance(data, dict):
+                raise ValueError("Packed response is not a JSON object")
+            return data
+
+        try:
+            by_id = await self._complete_parsed(
+                messages, max_tokens=max_tokens, temperature=0.3, parse=parse,
+                subject=None, bypass_cache=bypass_cache, operation="generate_packed", model=small_model
             )
-            
-            return json.loads(response.choices[0].message.content)
-            
+        except Exception as e:
+            logger.warning(f"Packed generation failed, falling back to per-story requests: {e}")
+            by_id = {}
+
+        results: List[Optional[List[TestCase]]] = []
+        for story_id, user_story in zip(story_ids, user_stories):
+            try:
+                test_cases = [TestCase(**tc_data) for tc_data in by_id[story_id]]
+            except Exception:
+                results.append(None)
+                continue
+            if small_model and not test_cases_acceptable(test_cases):
+                record_escalation("generate_packed", "low_score")
+                results.append(None)
+                continue
+            results.append(test_cases)
+            logger.info(f"Generated {len(test_cases)} test cases for story: {user_story.title}")
+
+        missing = [index for index, test_cases in enumerate(results) if test_cases is None]
+        if missing:
+            logger.info(f"Regenerating {len(missing)} of {len(user_stories)} packed stories individually")
+            fallback = await asyncio.gather(
+                *(self.generate_test_cases(user_stories[index], bypass_cache, cascade=False) for index in missing)
+            )
+            for index, test_cases in zip(missing, fallback):
+                results[index] = test_cases
+        return results
+
+    async def generate_test_cases_stream(self, user_story: UserStory, bypass_cache: bool = False,
+                                         cascade: bool = True) -> AsyncIterator[TestCase]:
+        """Yield test cases one by one while the model is still generating.
+
+        The completion is streamed and fed through ``JsonArrayStreamParser``,
+        so each ``TestCase`` is available as soon as its JSON object closes
+        and callers can validate and file it while the rest is generated.
+        A stream cut off by ``max_tokens`` or ending before the array closed
+        is continued, and cases that fail validation are repaired, after
+        the streamed ones; an answer from which no test case was streamed
+        is decoded whole instead. Cached answers are replayed without
+        a request (one that no longer parses is discarded); a fully received
+        answer that needed no recovery is added to the cache.
+
+        Short stories are streamed from the small model when one is
+        configured (``cascade=False`` streams from the large model). Cases
+        already yielded cannot be taken back, so a small-model case is only
+        yielded when it passes the local quality rules. If one does not, or
+        the small deployment fails, the large model supplies the rest: the
+        whole answer when nothing was yielded yet, else the missing cases.
+        """
+        small = cascade and prefers_small_model(user_story)
+        model = settings.azure_ai_small_model if small else settings.azure_ai_model
+        messages = self._build_generation_messages(user_story)
+        max_tokens, temperature = 4000, 0.3
+        key = None
+        if self.cache is not None:
+            key = CompletionCache.make_key(model, messages, temperature, max_tokens, user_story)
+            cached = None if (bypass_cache or settings.llm_cache_bypass) else self.cache.get(key)
+            if cached is not None:
+                try:
+                    test_cases = self._parse_test_cases(cached)
+                except Exception:
+                    # Stale or corrupt entry: drop it and stream a fresh answer
+                    self.cache.delete(key)
+                else:
+                    logger.debug(f"LLM cache hit: {key[:12]}")
+                    for test_case in test_cases:
+                        yield test_case
+                    return
+
+        parser = JsonArrayStreamParser()
+        content: List[str] = []
+        finish_reason = None
+        received: List[TestCase] = []
+        broken: List[Any] = []
+        weak = 0
+        normalized = 0
+        escalation = None
+        started = time.perf_counter()
+        ok = False
+        try:
+            updates = self._stream_completion(messages, max_tokens, temperature, model)
+            try:
+                async for choice in updates:
+                    finish_reason = choice.finish_reason or finish_reason
+                    delta = choice.delta.content if choice.delta else None
+                    if not delta:
+                        continue
+                    content.append(delta)
+                    for tc_data in parser.feed(delta):
+                        if not settings.recovery_enabled:
+                            test_case = TestCase(**tc_data)
+                        else:
+                            try:
+                                test_case, was_normalized = coerce_test_case(tc_data)
+                            except (TypeError, ValueError) as e:
+                                broken.append((tc_data, str(e)))
+                                continue
+                            normalized += was_normalized
+                        if small and score_test_case(test_case)[0] < settings.cascade_min_quality_score:
+                            weak += 1
+                            continue
+                        received.append(test_case)
+                        yield test_case
+                ok = True
+            finally:
+                # Settles the usage now, even if the loop above raised
+                await updates.aclose()
+        except Exception as e:
+            if not small:
+                raise
+            escalation = escalation_reason(e)
+            logger.warning(f"Small model {model} failed for generate_stream ({escalation}): {e}")
+        finally:
+            record_call("azure_ai", "generate_stream", time.perf_counter() - started, ok, model)
+
+        if escalation is None and weak:
+            escalation = "low_score"
+        if escalation is not None:
+            record_escalation("generate_stream", escalation)
+            logger.info(f"Escalating generate_stream to {settings.azure_ai_model} ({escalation})")
+            if received:
+                # Ask the large model for the cases not yet yielded
+                escalated = await self._recover_rest(user_story, received, broken, True, None)
+                for test_case in escalated:
+                    received.append(test_case)
+                    yield test_case
+            else:
+                async for test_case in self.generate_test_cases_stream(user_story, bypass_cache, cascade=False):
+                    received.append(test_case)
+                    yield test_case
+            logger.info(f"Streamed {len(received)} test cases for story: {user_story.title}")
+            return
+
+        truncated = finish_reason == "length" or not parser.complete
+        if not received and settings.recovery_enabled:
+            # No test case came out of the stream (a lone object, whose steps the parser may have taken for
+            # the array, or a stray bracket in prose): decode the whole answer rather than continuing it
+            leftover = salvage_test_cases(''.join(content))
+            truncated = finish_reason == "length" or not leftover.complete
+            broken = []
+        else:
+            leftover = SalvagedAnswer()
+            salvage_rejected(leftover, parser.rejected)
+        if truncated:
+            logger.warning(f"Streamed response for '{user_story.title}' was cut off (finish_reason={finish_reason})")
+        # Answers that needed recovery are not cached: a replay could not parse them
+        needs_recovery = truncated or not received or parser.invalid or broken or normalized
+        if settings.recovery_enabled and needs_recovery:
+            record_recovery("salvaged", len(leftover.test_cases) - leftover.normalized)
+            record_recovery("normalized", normalized + leftover.normalized)
+            recovered = leftover.test_cases + await self._recover_rest(
+                user_story, received + leftover.test_cases, broken + leftover.broken, truncated,
+                model if small else None
+            )
+            for test_case in recovered:
+                received.append(test_case)
+                yield test_case
+            logger.info(f"Recovered {len(recovered)} test cases for story: {user_story.title}")
+        elif key is not None and not needs_recovery:
+            self.cache.put(key, ''.join(content))
+        logger.info(f"Streamed {len(received)} test cases for story: {user_story.title}")
+
+    async def validate_test_case(self, test_case: TestCase, bypass_cache: bool = False,
+                                 cascade: bool = True) -> Dict[str, Any]:
+        """Validate a test case for completeness and quality.
+
+        With a small model configured it reviews first (unless ``cascade``
+        is False) and the large model re-reviews verdicts that are malformed
+        or score below ``cascade_min_quality_score``.
+        """
+        try:
+            if cascade and settings.azure_ai_small_model:
+                return await self._cascade(
+                    "validate", lambda model: self._review(test_case, bypass_cache, model), verdict_acceptable
+                )
+            return await self._review(test_case, bypass_cache)
+
         except Exception as e:
             logger.error(f"Error validating test case: {e}")
-            return {"is_valid": True, "quality_score": 5, "feedback": "Validation failed", "suggestions": []}
+            return dict(FALLBACK_VALIDATION)
+
+    async def _review(self, test_case: TestCase, bypass_cache: bool, model: Optional[str] = None) -> Dict[str, Any]:
+        """Ask ``model`` (the large model by default) for one verdict."""
+        messages = [
+            SystemMessage(content=VALIDATION_PROMPT),
+            UserMessage(content=test_case.model_dump_json(indent=2))
+        ]
+        return await self._complete_parsed(
+            messages, max_tokens=1000, temperature=0.2,
+            parse=parse_verdict, subject=test_case, bypass_cache=bypass_cache,
+            operation="validate", model=model
+        )
+
+    async def validate_test_cases_batch(self, test_cases: List[TestCase],
+                                        bypass_cache: bool = False) -> List[Dict[str, Any]]:
+        """Validate many test cases with one request per token-budgeted chunk.
+
+        Verdicts are matched to cases by the ``index`` the model echoes
+        back; any case without a usable verdict is re-validated on its own.
+        With a small model configured it reviews the batch first and the
+        cases it could not settle are re-reviewed in batches on the large
+        model. Returns verdicts in input order.
+        """
+        small_model = settings.azure_ai_small_model or None
+        verdicts = await self._validate_chunks(test_cases, list(range(len(test_cases))), bypass_cache, small_model)
+        if small_model:
+            escalate = [index for index in range(len(test_cases)) if not verdict_acceptable(verdicts.get(index))]
+            if escalate:
+                for index in escalate:
+                    record_escalation("validate_batch", "low_score" if index in verdicts else "invalid_output")
+                logger.info(f"Escalating {len(escalate)} of {len(test_cases)} reviews to {settings.azure_ai_model}")
+                for index in escalate:
+                    verdicts.pop(index, None)
+                verdicts.update(await self._validate_chunks(test_cases, escalate, bypass_cache, None))
+
+        missing = [index for index in range(len(test_cases)) if index not in verdicts]
+        if missing:
+            logger.info(f"Re-validating {len(missing)} of {len(test_cases)} test cases individually")
+            fallback = await asyncio.gather(
+                *(self.validate_test_case(test_cases[index], bypass_cache, cascade=False) for index in missing)
+            )
+            verdicts.update(zip(missing, fallback))
+        return [verdicts[index] for index in range(len(test_cases))]
+
+    async def _validate_chunks(self, test_cases: List[TestCase], indices: List[int], bypass_cache: bool,
+                               model: Optional[str]) -> Dict[int, Dict[str, Any]]:
+        """Review the cases at ``indices`` on ``model``, one request per chunk."""
+        chunks = plan_validation_chunks([test_cases[index] for index in indices])
+        answers = await asyncio.gather(*(
+            self._validate_chunk([(indices[position], test_cases[indices[position]]) for position in chunk],
+                                 bypass_cache, model)
+            for chunk in chunks
+        ))
+        verdicts: Dict[int, Dict[str, Any]] = {}
+        for answer in answers:
+            verdicts.update(answer)
+        return verdicts
+
+    async def _validate_chunk(self, chunk: List[Any], bypass_cache: bool,
+                              model: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        """Validate ``(index, test_case)`` pairs in one request; {} on failure."""
+        if len(chunk) == 1:
+            index, test_case = chunk[0]
+            try:
+                return {index: await self._review(test_case, bypass_cache, model)}
+            except Exception as e:
+                logger.warning(f"Validation of a test case failed: {e}")
+                return {}
+
+        wanted = {index for index, _ in chunk}
+        payload = json.dumps([{'index': index, **test_case.model_dump(mode='json')}
+                              for index, test_case in chunk], indent=2)
+        messages = [
+            SystemMessage(content=VALIDATION_PROMPT + BATCH_VALIDATION_INSTRUCTIONS),
+            UserMessage(content=payload)
+        ]
+
+        def parse(content: str) -> Dict[int, Dict[str, Any]]:
+            data = json.loads(content)
+            if not isinstance(data, list):
+                raise ValueError("Batched validation response is not a JSON array")
+            return {verdict['index']: verdict for verdict in data
+                    if is_verdict(verdict) and verdict.get('index') in wanted}
+
+        try:
+            verdicts = await self._complete_parsed(
+                messages, max_tokens=min(settings.validation_batch_output_tokens_per_case * len(chunk),
+                                         settings.validation_batch_max_output_tokens),
+                temperature=0.2, parse=parse, bypass_cache=bypass_cache, operation="validate_batch", model=model
+            )
+        except Exception as e:
+            logger.warning(f"Batched validation of {len(chunk)} test cases failed: {e}")
+            return {}
+        # The index is request plumbing, not part of the verdict
+        return {index: {k: v for k, v in verdict.items() if k != 'index'} for index, verdict in verdicts.items()}
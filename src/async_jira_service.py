@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+import aiohttp
+from models import TestCase
+from config import settings
+from jira_service import JIRA_BULK_CREATE_LIMIT, JiraService
+from rate_limiter import call_with_retry_async, get_rate_limiter
+from metrics import track_call
+
+logger = logging.getLogger(__name__)
+
+
+class JiraHTTPError(Exception):
+    """A Jira REST call answered with an error status."""
+
+    def __init__(self, status: int, headers: Any, body: Any):
+        super().__init__(f"Jira returned HTTP {status}: {body}")
+        # ``status`` and ``headers`` are what rate_limiter.classify_error reads
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class AsyncJiraService:
+    """Async counterpart of ``JiraService``'s write operations.
+
+    Requests go through one aiohttp session whose keep-alive connection pool
+    is capped at ``concurrency``, the same number of requests that may be
+    in flight at once. Calls share the ``jira`` rate limiter and retry
+    policy with the synchronous client, and payloads and bulk-result
+    mapping are reused from it, so both produce identical issues.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.base_url = f"{settings.jira_url.rstrip('/')}/rest/api/2"
+        self.concurrency = max(1, concurrency or settings.jira_concurrency)
+        self.rate_limiter = get_rate_limiter("jira")
+        # Created on first use, inside the event loop that will drive them
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, opening it on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30),
+                auth=aiohttp.BasicAuth(settings.jira_email, settings.jira_api_token),
+                timeout=aiohttp.ClientTimeout(total=settings.timeout),
+                headers={'Accept': 'application/json'}
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the pooled session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self) -> "AsyncJiraService":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def _request(self, method: str, path: str, operation: str, idempotent: bool = True,
+                       **kwargs: Any) -> Any:
+        """Send one REST call with rate limiting, retries and metrics.
+
+        Creates pass ``idempotent=False``, as in ``JiraService._call``.
+        """
+        session = self._get_session()
+
+        async def send() -> Any:
+            async with self._semaphore:
+                async with session.request(method, f"{self.base_url}/{path}", **kwargs) as response:
+                    text = await response.text()
+                    body = _decode(text)
+                    if response.status >= 400:
+                        raise JiraHTTPError(response.status, response.headers, body)
+                    return body
+
+        with track_call("jira", operation):
+            return await call_with_retry_async(send, limiter=self.rate_limiter, idempotent=idempotent)
+
+    async def create_test_issue(self, test_case: TestCase, parent_key: Optional[str] = None) -> Optional[str]:
+        """Create a test issue in Jira."""
+        try:
+            issue = await self._request('POST', 'issue', 'create_issue', idempotent=False,
+                                        json={'fields': JiraService._build_issue_fields(test_case, parent_key)})
+            logger.info(f"Created test issue: {issue['key']}")
+            return issue['key']
+        except Exception as e:
+            logger.error(f"Failed to create Jira issue: {e}")
+            return None
+
+    async def create_test_issues_bulk(self, test_cases: List[TestCase], parent_key: Optional[str] = None,
+                                      link_type: Optional[str] = "Tests") -> List[Dict[str, Optional[str]]]:
+        """Create test issues through the bulk endpoint, chunks in parallel.
+
+        Same contract as ``JiraService.create_test_issues_bulk``: one
+        ``{'key': ..., 'error': ...}`` entry per test case, in input order.
+        """
+        chunk_size = max(1, min(settings.jira_bulk_size, JIRA_BULK_CREATE_LIMIT))
+        chunks = await asyncio.gather(*(
+            self._create_issue_chunk(test_cases[start:start + chunk_size], parent_key, link_type)
+            for start in range(0, len(test_cases), chunk_size)
+        ))
+        return [outcome for chunk in chunks for outcome in chunk]
+
+    async def _create_issue_chunk(self, test_cases: List[TestCase], parent_key: Optional[str],
+                                  link_type: Optional[str]) -> List[Dict[str, Optional[str]]]:
+        """Send one bulk-create request and map its response back to the inputs."""
+        payload = {'issueUpdates': JiraService._bulk_issue_updates(test_cases, parent_key, link_type)}
+        try:
+            response = await self._request('POST', 'issue/bulk', 'create_issues', idempotent=False, json=payload)
+        except JiraHTTPError as e:
+            # As with the sync client, a 400 still lists per-element errors
+            if not (isinstance(e.body, dict) and 'errors' in e.body):
+                logger.error(f"Bulk issue creation failed: {e}")
+                return [{'key': None, 'error': str(e)} for _ in test_cases]
+            response = e.body
+        except Exception as e:
+            logger.error(f"Bulk issue creation failed: {e}")
+            return [{'key': None, 'error': str(e)} for _ in test_cases]
+
+        outcomes = JiraService._match_bulk_results(len(test_cases), response or {})
+        created = [outcome['key'] for outcome in outcomes if outcome['key']]
+        logger.info(f"Bulk created {len(created)}/{len(test_cases)} test issues: {', '.join(created)}")
+        return outcomes
+
+    async def link_issues(self, source_key: str, target_key: str, link_type: str = "Tests") -> bool:
+        """Create a link between two Jira issues."""
+        try:
+            await self._request('POST', 'issueLink', 'create_issue_link',
+                                json=JiraService._issue_link(source_key, target_key, link_type))
+            logger.info(f"Linked {source_key} to {target_key}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to link issues: {e}")
+            return False
+
+    async def add_labels(self, issue_key: str, labels: List[str]) -> bool:
+        """Add labels to an issue, keeping the ones it already has."""
+        try:
+            await self._request('PUT', f"issue/{issue_key}", 'edit_issue', params={'notifyUsers': 'false'},
+                                json={'update': {'labels': [{'add': label} for label in labels]}})
+            logger.info(f"Added labels to {issue_key}: {', '.join(labels)}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add labels to {issue_key}: {e}")
+            return False
+
+    async def update_issue(self, issue_key: str, fields: Dict[str, Any]) -> bool:
+        """Update an existing Jira issue."""
+        try:
+            await self._request('PUT', f"issue/{issue_key}", 'update_issue_field', json={'fields': fields})
+            logger.info(f"Updated issue: {issue_key}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to update issue {issue_key}: {e}")
+            return False
+
+    async def find_issues_by_labels(self, labels: List[str]) -> Dict[str, str]:
+        """Map each label to the key of an existing issue carrying it."""
+        wanted = set(labels)
+        chunks = [labels[start:start + JIRA_BULK_CREATE_LIMIT] for start in range(0, len(labels), JIRA_BULK_CREATE_LIMIT)]
+        pages = await asyncio.gather(*(self._search_all(JiraService._labels_jql(chunk), ['labels']) for chunk in chunks))
+        found: Dict[str, str] = {}
+        for issues in pages:
+            for issue in issues:
+                for label in (issue.get('fields') or {}).get('labels') or []:
+                    if label in wanted:
+                        found.setdefault(label, issue['key'])
+        return found
+
+    async def _search_all(self, jql: str, fields: List[str]) -> List[Dict[str, Any]]:
+        """Return every issue matching ``jql`` (for small result sets)."""
+        issues: List[Dict[str, Any]] = []
+        while True:
+            page = await self._request('GET', 'search', 'jql', params={
+                'jql': jql, 'fields': ','.join(fields),
+                'startAt': str(len(issues)), 'maxResults': str(settings.jira_page_size)
+            })
+            batch = page.get('issues', [])
+            issues.extend(batch)
+            if not batch or len(issues) >= page.get('total', 0):
+                return issues
+
+
+def _decode(text: str) -> Any:
+    """Decode a JSON response body, returning raw text if it is not JSON."""
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
@@ -0,0 +1,243 @@
+"""Command line entry point: generate test cases for a JSONL story stream.
+
+Each input line is a batch entry (``{"story": {...}, "parent_key": ...}``)
+or a bare story object. Stories are sharded across worker processes by a
+story field (``epic_link`` by default) so related stories land on the
+same worker; every worker runs its own async pipeline while all of them
+share the global Azure AI and Jira rate limits. Per-story results are
+written as JSON lines, tagged with their input line, as they complete.
+
+With ``--coverage-report`` the project's coverage report is written as
+JSON once every story is done; ``--incremental-coverage`` updates it from
+the previous run's snapshot instead of rescanning the project.
+
+Example:
+    python main.py stories.jsonl --output results.jsonl --workers 8
+    cat stories.jsonl | python main.py - > results.jsonl
+    python main.py stories.jsonl --coverage-report coverage.json --incremental-coverage
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, TextIO, Tuple
+from config import settings
+from rate_limiter import create_shared_limiter_state, install_shared_limiters
+
+logger = logging.getLogger(__name__)
+
+# Seconds between liveness checks while waiting on a worker queue
+QUEUE_POLL_SECONDS = 1.0
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="JSONL file of stories, or '-' for stdin")
+    parser.add_argument('--output', default='-', help="JSONL results file, or '-' for stdout (default)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--shard-by', default='epic_link', help='story field that picks the worker')
+    parser.add_argument('--queue-size', type=int, default=200, help='stories buffered per worker')
+    parser.add_argument('--coverage-report', metavar='PATH', help="write the project's coverage report (JSON) to PATH")
+    parser.add_argument('--incremental-coverage', action='store_true', default=settings.coverage_incremental,
+                        help='build the coverage report from the last snapshot (default: COVERAGE_INCREMENTAL)')
+    return parser.parse_args(argv)
+
+
+def parse_entry(line: str) -> Dict[str, Any]:
+    """Decode an input line into a batch entry."""
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return data if 'story' in data else {'story': data, 'parent_key': data.get('parent_key')}
+
+
+class Sharder:
+    """Pick a worker per story: stable hash of the shard field, else round robin."""
+
+    def __init__(self, workers: int, field: str):
+        self.workers = workers
+        self.field = field
+        self._next = 0
+
+    def __call__(self, entry: Dict[str, Any]) -> int:
+        value = (entry.get('story') or {}).get(self.field)
+        if value:
+            return zlib.crc32(str(value).encode('utf-8')) % self.workers
+        self._next = (self._next + 1) % self.workers
+        return self._next
+
+
+def _worker_export_path(worker_id: int) -> str:
+    """Give each worker its own export file so they never share a handle."""
+    from exporters import EXPORTERS
+    base = settings.export_path or f"test_cases_{settings.output_sink}.{EXPORTERS[settings.output_sink].extension}"
+    root, extension = os.path.splitext(base)
+    return f"{root}.part{worker_id}{extension}"
+
+
+def worker_main(worker_id: int, stories: Any, results: Any, limiter_state: Dict[str, Any]) -> None:
+    """Process entry point: run an async pipeline over this worker's stories."""
+    logging.basicConfig(level=getattr(logging, settings.log_level))
+    install_shared_limiters(limiter_state)
+    if settings.output_sink != 'jira':
+        settings.export_path = _worker_export_path(worker_id)
+    try:
+        asyncio.run(_run_worker(stories, results))
+    finally:
+        # End marker: this worker will send nothing more
+        results.put(worker_id)
+
+
+async def _queued_entries(stories: Any) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(line, entry)`` items from the worker's queue until its end marker."""
+    while True:
+        # The blocking queue read runs off the event loop
+        item = await asyncio.to_thread(stories.get)
+        if item is None:
+            return
+        yield item
+
+
+async def _run_worker(stories: Any, results: Any) -> None:
+    """Run one long-lived pipeline fed straight from the worker's queue.
+
+    The pipeline's bounded queues stop it from reading ahead, so memory
+    stays bounded however long the input is, and a slow story never holds
+    back the stories queued after it.
+    """
+    from test_case_generator import TestCaseGenerator
+
+    async def emit(line: int, result: Dict[str, Any]) -> None:
+        await asyncio.to_thread(results.put, {'line': line, **result})
+
+    async with TestCaseGenerator() as generator:
+        await generator.process_story_stream(_queued_entries(stories), emit)
+
+
+def _put(target: Any, item: Any, process: multiprocessing.Process) -> None:
+    """Put on a bounded queue, failing instead of hanging if its reader died."""
+    while True:
+        try:
+            target.put(item, timeout=QUEUE_POLL_SECONDS)
+            return
+        except queue.Full:
+            if not process.is_alive():
+                raise RuntimeError(f"Worker {process.name} exited with code {process.exitcode}")
+
+
+def _write_results(results: Any, output: TextIO, processes: List[multiprocessing.Process],
+                   summary: Dict[str, int]) -> None:
+    """Write result lines until every worker has signalled completion."""
+    finished = set()
+    while len(finished) < len(processes):
+        exited = {worker_id for worker_id, process in enumerate(processes) if not process.is_alive()}
+        try:
+            result = results.get(timeout=QUEUE_POLL_SECONDS)
+        except queue.Empty:
+            # A worker killed outright never sends its end marker; once it
+            # has exited and the queue stayed empty, nothing more will come
+            finished |= exited
+            continue
+        if isinstance(result, int):
+            finished.add(result)
+            continue
+        summary['stories'] += 1
+        if result.get('errors'):
+            summary['with_errors'] += 1
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+
+
+def run(args: argparse.Namespace, source: TextIO, output: TextIO) -> Dict[str, int]:
+    """Shard ``source`` across worker processes and write their results."""
+    workers = max(1, args.workers)
+    context = multiprocessing.get_context()
+    limiter_state = create_shared_limiter_state(context)
+    story_queues = [context.Queue(maxsize=max(1, args.queue_size)) for _ in range(workers)]
+    results = context.Queue(maxsize=max(1, args.queue_size) * workers)
+    processes = [
+        context.Process(target=worker_main, name=f"worker-{worker_id}", daemon=True,
+                        args=(worker_id, story_queues[worker_id], results, limiter_state))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    summary = {'stories': 0, 'with_errors': 0, 'invalid_lines': 0}
+    writer = threading.Thread(target=_write_results, args=(results, output, processes, summary), daemon=True)
+    writer.start()
+
+    shard = Sharder(workers, args.shard_by)
+    try:
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = parse_entry(line)
+            except ValueError as e:
+                summary['invalid_lines'] += 1
+                logger.error(f"Line {line_number}: invalid story entry: {e}")
+                continue
+            worker_id = shard(entry)
+            _put(story_queues[worker_id], (line_number, entry), processes[worker_id])
+    finally:
+        # One end marker per worker, then wait for them to drain
+        for story_queue, process in zip(story_queues, processes):
+            if process.is_alive():
+                _put(story_queue, None, process)
+        for process in processes:
+            process.join()
+        writer.join()
+
+    failed = [process.name for process in processes if process.exitcode]
+    if failed:
+        logger.error(f"Workers failed: {', '.join(failed)}")
+        summary['failed_workers'] = len(failed)
+    return summary
+
+
+def write_coverage_report(path: str, incremental: bool) -> None:
+    """Write the Jira project's coverage report to ``path`` as JSON."""
+    from test_case_generator import TestCaseGenerator
+
+    generator = TestCaseGenerator()
+    try:
+        report = generator.get_test_coverage_report(settings.jira_project_key, incremental=incremental)
+    finally:
+        asyncio.run(generator.close())
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the CLI and return the process exit code."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    # Logs go to stderr so results can be piped from stdout
+    logging.basicConfig(level=getattr(logging, settings.log_level), stream=sys.stderr)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        summary = run(args, source, output)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    logger.info(f"Processed {summary['stories']} stories ({summary['with_errors']} with errors, "
+                f"{summary['invalid_lines']} invalid lines)")
+    if args.coverage_report:
+        write_coverage_report(args.coverage_report, args.incremental_coverage)
+    return 1 if summary.get('failed_workers') or summary['invalid_lines'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings
 
 load_dotenv()
 
@@ -9,16 +9,131 @@ class Settings(BaseSettings):
     azure_ai_endpoint: str = os.getenv("AZURE_AI_ENDPOINT", "")
     azure_ai_key: str = os.getenv("AZURE_AI_KEY", "")
     azure_ai_model: str = os.getenv("AZURE_AI_MODEL", "gpt-4")
-    
+    # USD per 1K tokens as JSON: {"gpt-4": [prompt_price, completion_price]}
+    azure_ai_pricing: str = os.getenv("AZURE_AI_PRICING", "{}")
+    # Optional small, fast deployment tried first for validation and short
+    # stories; answers that fail to parse, fail the TestCase schema or score
+    # below the quality threshold are redone on AZURE_AI_MODEL ("" disables)
+    azure_ai_small_model: str = os.getenv("AZURE_AI_SMALL_MODEL", "")
+    cascade_short_story_tokens: int = int(os.getenv("CASCADE_SHORT_STORY_TOKENS", "400"))
+    cascade_min_quality_score: int = int(os.getenv("CASCADE_MIN_QUALITY_SCORE", "6"))
+
     # Jira Configuration
     jira_url: str = os.getenv("JIRA_URL", "")
     jira_email: str = os.getenv("JIRA_EMAIL", "")
     jira_api_token: str = os.getenv("JIRA_API_TOKEN", "")
     jira_project_key: str = os.getenv("JIRA_PROJECT_KEY", "TEST")
+    jira_bulk_size: int = int(os.getenv("JIRA_BULK_SIZE", "50"))
+    # Optional "Epic Link" custom field (e.g. customfield_10014) for
+    # company-managed projects that do not use ``parent`` for epics
+    jira_epic_link_field: str = os.getenv("JIRA_EPIC_LINK_FIELD", "")
+    # JQL searches are paged; pages after the first are fetched concurrently
+    jira_page_size: int = int(os.getenv("JIRA_PAGE_SIZE", "100"))
+    jira_page_concurrency: int = int(os.getenv("JIRA_PAGE_CONCURRENCY", "4"))
     
     # Application Settings
-    max_retries: int = 3
-    timeout: int = 30
+    max_retries: int = int(os.getenv("MAX_RETRIES", "3"))
+    timeout: int = int(os.getenv("REQUEST_TIMEOUT", "30"))
     log_level: str = "INFO"
+    # Port for the Prometheus /metrics endpoint (0 disables it); it listens
+    # on localhost unless METRICS_HOST names another interface (e.g. 0.0.0.0)
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))
+    metrics_host: str = os.getenv("METRICS_HOST", "127.0.0.1")
+
+    # Batch Pipeline Settings
+    # Stories generated/validated concurrently, validations in flight per
+    # story, concurrent Jira writers and the size of the bounded queues that
+    # connect the stages (a full queue applies backpressure upstream).
+    story_concurrency: int = int(os.getenv("STORY_CONCURRENCY", "4"))
+    validation_concurrency: int = int(os.getenv("VALIDATION_CONCURRENCY", "4"))
+    jira_writer_concurrency: int = int(os.getenv("JIRA_WRITER_CONCURRENCY", "2"))
+    pipeline_queue_size: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+    # Validate and file each test case while the model is still generating
+    stream_generation: bool = os.getenv("STREAM_GENERATION", "false").lower() == "true"
+    # Recover truncated or malformed generations instead of failing the
+    # story: complete cases are kept, a cut-off array is continued with up
+    # to RECOVERY_MAX_CONTINUATIONS requests and invalid cases are sent
+    # back one at a time (at most RECOVERY_MAX_REPAIRS per answer)
+    recovery_enabled: bool = os.getenv("RECOVERY_ENABLED", "true").lower() == "true"
+    recovery_max_continuations: int = int(os.getenv("RECOVERY_MAX_CONTINUATIONS", "2"))
+    recovery_max_repairs: int = int(os.getenv("RECOVERY_MAX_REPAIRS", "5"))
+    # Pack several small stories into one generation request behind a
+    # shared static prompt (story sizes are estimated at ~4 chars/token)
+    story_packing: bool = os.getenv("STORY_PACKING", "false").lower() == "true"
+    packing_max_stories: int = int(os.getenv("PACKING_MAX_STORIES", "5"))
+    packing_token_budget: int = int(os.getenv("PACKING_TOKEN_BUDGET", "1500"))
+    packing_small_story_tokens: int = int(os.getenv("PACKING_SMALL_STORY_TOKENS", "400"))
+    packing_output_tokens_per_story: int = int(os.getenv("PACKING_OUTPUT_TOKENS_PER_STORY", "1500"))
+    packing_max_output_tokens: int = int(os.getenv("PACKING_MAX_OUTPUT_TOKENS", "8000"))
+    # Review several test cases per validation request (chunked by size)
+    validation_batching: bool = os.getenv("VALIDATION_BATCHING", "false").lower() == "true"
+    validation_batch_max_cases: int = int(os.getenv("VALIDATION_BATCH_MAX_CASES", "10"))
+    validation_batch_token_budget: int = int(os.getenv("VALIDATION_BATCH_TOKEN_BUDGET", "4000"))
+    validation_batch_output_tokens_per_case: int = int(os.getenv("VALIDATION_BATCH_OUTPUT_TOKENS_PER_CASE", "300"))
+    validation_batch_max_output_tokens: int = int(os.getenv("VALIDATION_BATCH_MAX_OUTPUT_TOKENS", "4000"))
+    # Rule-based pre-validation: cases scoring at or above the accept score
+    # or at or below the reject score (1-10) skip the LLM review. By default
+    # a case with at most one minor finding (9) is accepted locally; set the
+    # accept score to 11 to send every well-formed case to the model
+    prevalidation_enabled: bool = os.getenv("PREVALIDATION_ENABLED", "true").lower() == "true"
+    prevalidation_accept_score: int = int(os.getenv("PREVALIDATION_ACCEPT_SCORE", "9"))
+    prevalidation_reject_score: int = int(os.getenv("PREVALIDATION_REJECT_SCORE", "3"))
+    # Near-duplicate detection before filing (MinHash/LSH, needs numpy).
+    # DEDUP_ACTION: skip (don't file), link (link the existing test to the
+    # story) or merge (link it and add the duplicate's labels to it)
+    dedup_enabled: bool = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+    dedup_action: str = os.getenv("DEDUP_ACTION", "link")
+    dedup_threshold: float = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+    dedup_num_perm: int = int(os.getenv("DEDUP_NUM_PERM", "128"))
+    dedup_bands: int = int(os.getenv("DEDUP_BANDS", "16"))
+    dedup_shingle_size: int = int(os.getenv("DEDUP_SHINGLE_SIZE", "3"))
+    dedup_include_existing: bool = os.getenv("DEDUP_INCLUDE_EXISTING", "true").lower() == "true"
+    dedup_wait_seconds: float = float(os.getenv("DEDUP_WAIT_SECONDS", "60"))
+    # Where validated test cases go: "jira" (live API) or a bulk-import
+    # file: jira_csv, xray_csv, zephyr_csv or junit (EXPORT_PATH names it)
+    output_sink: str = os.getenv("OUTPUT_SINK", "jira")
+    export_path: str = os.getenv("EXPORT_PATH", "")
+    # Write issues through a pooled aiohttp session instead of the sync
+    # client; JIRA_CONCURRENCY caps its connections and in-flight requests
+    jira_async: bool = os.getenv("JIRA_ASYNC", "false").lower() == "true"
+    jira_concurrency: int = int(os.getenv("JIRA_CONCURRENCY", "8"))
+    # Opt-in local journal that makes batch runs resumable and Jira writes
+    # idempotent (an SQLite file at JOURNAL_PATH)
+    journal_enabled: bool = os.getenv("JOURNAL_ENABLED", "false").lower() == "true"
+    journal_path: str = os.getenv("JOURNAL_PATH", ".work_journal.sqlite3")
+
+    # Rate Limiting and Retry Settings
+    # Budgets are per minute and act as ceilings; the limiter backs off below
+    # them when the service answers 429. A budget of 0 disables that bucket.
+    azure_ai_requests_per_minute: float = float(os.getenv("AZURE_AI_REQUESTS_PER_MINUTE", "60"))
+    azure_ai_tokens_per_minute: float = float(os.getenv("AZURE_AI_TOKENS_PER_MINUTE", "80000"))
+    jira_requests_per_minute: float = float(os.getenv("JIRA_REQUESTS_PER_MINUTE", "300"))
+    retry_backoff_base: float = float(os.getenv("RETRY_BACKOFF_BASE", "1.0"))
+    retry_backoff_max: float = float(os.getenv("RETRY_BACKOFF_MAX", "60.0"))
+
+    # LLM Completion Cache Settings
+    # Completions are cached on disk keyed by a hash of the full request, so
+    # reruns over unchanged stories do not pay for identical answers again.
+    # Off by default: the file is written to LLM_CACHE_PATH, relative to the
+    # working directory unless an absolute path is given.
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+    llm_cache_bypass: bool = os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+    llm_cache_ttl_seconds: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+    # Incremental Coverage Report Settings
+    # Incremental runs update the index saved by the previous run instead of
+    # rescanning the project. The snapshot is only written by incremental
+    # runs, to .test_coverage_{project_key}.json unless COVERAGE_SNAPSHOT_PATH
+    # is set; setting it also makes full scans write one.
+    coverage_incremental: bool = os.getenv("COVERAGE_INCREMENTAL", "false").lower() == "true"
+    coverage_snapshot_path: str = os.getenv("COVERAGE_SNAPSHOT_PATH", "")
+    coverage_overlap_minutes: int = int(os.getenv("COVERAGE_OVERLAP_MINUTES", "2"))
+    # Deleted issues never match an ``updated`` query, so each incremental
+    # run compares a count of the current issues (a maxResults=0 search)
+    # with the index and, only when they differ, lists the current keys
+    # (issuetype only) to drop removed ones
+    coverage_reconcile_deletions: bool = os.getenv("COVERAGE_RECONCILE_DELETIONS", "true").lower() == "true"
 
 settings = Settings()
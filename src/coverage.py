@@ -0,0 +1,234 @@
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from config import settings
+
+# Epic bucket for stories that do not belong to any epic
+NO_EPIC = "No Epic"
+
+# Field projections for the JQL searches that feed the index
+TEST_COVERAGE_FIELDS = ['issuelinks', 'parent']
+STORY_COVERAGE_FIELDS = ['parent'] + ([settings.jira_epic_link_field] if settings.jira_epic_link_field else [])
+# Incremental updates fetch stories and tests together, so they need both
+# projections plus the issue type to tell them apart
+CHANGED_ISSUE_FIELDS = sorted(set(TEST_COVERAGE_FIELDS + STORY_COVERAGE_FIELDS + ['issuetype']))
+
+# Snapshot file when COVERAGE_SNAPSHOT_PATH is not set
+DEFAULT_SNAPSHOT_PATH = ".test_coverage_{project_key}.json"
+
+
+def linked_issue_keys(issue: Dict[str, Any]) -> Set[str]:
+    """Return the keys an issue points at through ``issuelinks`` or ``parent``."""
+    fields = issue.get('fields') or {}
+    keys = set()
+    for link in fields.get('issuelinks') or []:
+        for direction in ('inwardIssue', 'outwardIssue'):
+            linked = link.get(direction)
+            if linked and linked.get('key'):
+                keys.add(linked['key'])
+    parent = fields.get('parent')
+    if parent and parent.get('key'):
+        keys.add(parent['key'])
+    return keys
+
+
+def epic_key(issue: Dict[str, Any]) -> Optional[str]:
+    """Return the epic a story belongs to, if any.
+
+    Team-managed projects (and current Jira Cloud) model epics as the
+    story's ``parent``; company-managed projects may still use an "Epic
+    Link" custom field, configured through ``JIRA_EPIC_LINK_FIELD``.
+    """
+    fields = issue.get('fields') or {}
+    parent = fields.get('parent') or {}
+    parent_type = ((parent.get('fields') or {}).get('issuetype') or {}).get('name')
+    if parent.get('key') and parent_type in (None, 'Epic'):
+        return parent['key']
+    if settings.jira_epic_link_field:
+        return fields.get(settings.jira_epic_link_field)
+    return None
+
+
+class CoverageIndex:
+    """Story→tests inverted index built in a single pass over test issues.
+
+    Each test contributes its key to the entry of every issue it links to,
+    so coverage for N stories and M tests costs O(N + M) plus the number of
+    links, instead of comparing every story with every test. Links to
+    non-story issues are kept in the index but ignored by the report.
+    """
+
+    def __init__(self):
+        self.story_tests: Dict[str, Set[str]] = defaultdict(set)
+        self.stories: Dict[str, Optional[str]] = {}
+        # Forward index (test -> linked keys) so a changed or deleted test
+        # can be removed from the inverted index without a rescan
+        self.test_links: Dict[str, Set[str]] = {}
+
+    @property
+    def total_tests(self) -> int:
+        """Number of test issues in the index."""
+        return len(self.test_links)
+
+    def add_test(self, issue: Dict[str, Any]) -> None:
+        """Index (or re-index) one test under every issue it is linked to."""
+        self._set_test_links(issue['key'], linked_issue_keys(issue))
+
+    def _set_test_links(self, test_key: str, links: Set[str]) -> None:
+        """Replace the links recorded for a test in both directions."""
+        self._unlink_test(test_key)
+        self.test_links[test_key] = links
+        for key in links:
+            self.story_tests[key].add(test_key)
+
+    def _unlink_test(self, test_key: str) -> None:
+        """Remove a test's previous entries from the inverted index."""
+        for key in self.test_links.pop(test_key, ()):
+            tests = self.story_tests.get(key)
+            if tests is not None:
+                tests.discard(test_key)
+                if not tests:
+                    del self.story_tests[key]
+
+    def remove_issue(self, issue_key: str) -> None:
+        """Forget a story or test that was deleted or changed type."""
+        self.stories.pop(issue_key, None)
+        self._unlink_test(issue_key)
+
+    def apply_change(self, issue: Dict[str, Any]) -> None:
+        """Apply an updated issue of any type to the index."""
+        issue_type = ((issue.get('fields') or {}).get('issuetype') or {}).get('name')
+        self.remove_issue(issue['key'])
+        if issue_type == 'Story':
+            self.add_story(issue)
+        elif issue_type == 'Test':
+            self.add_test(issue)
+
+    def add_story(self, issue: Dict[str, Any]) -> None:
+        """Register a story and the epic it rolls up to."""
+        self.stories[issue['key']] = epic_key(issue)
+
+    def add_tests(self, issues: Iterable[Dict[str, Any]]) -> None:
+        """Index a stream of test issues."""
+        for issue in issues:
+            self.add_test(issue)
+
+    def add_stories(self, issues: Iterable[Dict[str, Any]]) -> None:
+        """Register a stream of story issues."""
+        for issue in issues:
+            self.add_story(issue)
+
+    def tests_for(self, story_key: str) -> Set[str]:
+        """Return the keys of the tests linked to a story."""
+        return self.story_tests.get(story_key, set())
+
+    def report(self, project_key: str) -> Dict[str, Any]:
+        """Build the coverage report with per-story counts and epic rollups."""
+        total_stories = len(self.stories)
+        tests_per_story: Dict[str, int] = {}
+        uncovered: List[str] = []
+        epics: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {'total_stories': 0, 'stories_with_tests': 0, 'linked_tests': 0}
+        )
+
+        for story_key, epic in self.stories.items():
+            count = len(self.tests_for(story_key))
+            tests_per_story[story_key] = count
+            rollup = epics[epic or NO_EPIC]
+            rollup['total_stories'] += 1
+            rollup['linked_tests'] += count
+            if count:
+                rollup['stories_with_tests'] += 1
+            else:
+                uncovered.append(story_key)
+
+        for rollup in epics.values():
+            rollup['coverage_percentage'] = _percentage(rollup['stories_with_tests'], rollup['total_stories'])
+
+        stories_with_tests = total_stories - len(uncovered)
+        return {
+            'project_key': project_key,
+            'total_stories': total_stories,
+            'total_tests': self.total_tests,
+            'stories_with_tests': stories_with_tests,
+            'coverage_percentage': _percentage(stories_with_tests, total_stories),
+            'tests_per_story_avg': round(self.total_tests / total_stories, 2) if total_stories > 0 else 0,
+            'tests_per_story': tests_per_story,
+            'uncovered_stories': sorted(uncovered),
+            'epics': dict(epics)
+        }
+
+    def keys(self) -> Set[str]:
+        """Return the keys of every story and test in the index."""
+        return set(self.stories) | set(self.test_links)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the index for a snapshot (sets become sorted lists)."""
+        return {
+            'stories': self.stories,
+            'tests': {key: sorted(links) for key, links in self.test_links.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CoverageIndex":
+        """Rebuild an index saved with ``to_dict``."""
+        index = cls()
+        index.stories = dict(data.get('stories', {}))
+        for test_key, links in data.get('tests', {}).items():
+            index._set_test_links(test_key, set(links))
+        return index
+
+
+def snapshot_path(project_key: str) -> str:
+    """Return the snapshot file used for a project's incremental reports."""
+    return (settings.coverage_snapshot_path or DEFAULT_SNAPSHOT_PATH).format(project_key=project_key)
+
+
+def load_snapshot(project_key: str) -> Optional[Tuple[CoverageIndex, float]]:
+    """Load the saved index and the time of the run that produced it.
+
+    Returns None when there is no usable snapshot for the project, in
+    which case the caller falls back to a full scan.
+    """
+    path = snapshot_path(project_key)
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            data = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if data.get('project_key') != project_key or 'last_run' not in data:
+        return None
+    return CoverageIndex.from_dict(data.get('index', {})), float(data['last_run'])
+
+
+def save_snapshot(project_key: str, index: CoverageIndex, last_run: float,
+                  report: Dict[str, Any]) -> None:
+    """Persist the index, run time and report, replacing the file atomically."""
+    path = snapshot_path(project_key)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as snapshot_file:
+        json.dump({
+            'project_key': project_key,
+            'last_run': last_run,
+            'index': index.to_dict(),
+            'report': report
+        }, snapshot_file)
+    os.replace(temp_path, path)
+
+
+def updated_since_clause(last_run: float) -> str:
+    """Return a JQL ``updated`` clause covering everything since ``last_run``.
+
+    A relative duration ("-15m") sidesteps the Jira user's timezone, which
+    absolute JQL dates are interpreted in. JQL works at minute precision,
+    so a safety margin is added; re-applying an unchanged issue is harmless.
+    """
+    elapsed_minutes = int((time.time() - last_run) // 60) + 1 + settings.coverage_overlap_minutes
+    return f'updated >= "-{elapsed_minutes}m"'
+
+
+def _percentage(part: int, whole: int) -> float:
+    """Return ``part`` as a percentage of ``whole`` rounded to two places."""
+    return round(part / whole * 100, 2) if whole > 0 else 0
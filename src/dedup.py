@@ -0,0 +1,179 @@
+import re
+import threading
+import zlib
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+# Universal hashing modulo a Mersenne prime. Shingle hashes and the
+# coefficients are below 2**32, so a * h + b never overflows uint64.
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+# Rows of the (shingles x permutations) matrix hashed at once
+SIGNATURE_CHUNK_ROWS = 8192
+
+_STEPS_SECTION = re.compile(r'\*Test Steps:\*(.*?)(?:\*Expected Outcome:\*|$)', re.S)
+_STEP_MARKUP = re.compile(r'_Expected Result:_|^\s*\d+\.\s', re.M)
+
+
+def issue_text(summary: str, description: str) -> str:
+    """Return the text compared for duplicates: the title plus its steps.
+
+    ``description`` is in the format ``JiraService`` files test cases with;
+    the steps section is extracted and its markup dropped so the shared
+    boilerplate does not make every case look alike. Descriptions without
+    a steps section (e.g. issues written by hand) are used whole.
+    """
+    match = _STEPS_SECTION.search(description or '')
+    steps = match.group(1) if match else (description or '')
+    return f"{summary}\n{_STEP_MARKUP.sub(' ', steps)}"
+
+
+def shingle_text(text: str, size: int) -> List[str]:
+    """Return the word ``size``-shingles of ``text`` (lowercased, alphanumeric)."""
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    if len(words) <= size:
+        return [' '.join(words)]
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class DuplicateEntry:
+    """An indexed text whose Jira key may still be on its way.
+
+    Entries are claimed before their issue is created so concurrent writers
+    see them; ``wait`` blocks until the creating writer calls ``resolve``.
+    """
+
+    def __init__(self, signature: np.ndarray, key: Optional[str] = None):
+        self.signature = signature
+        self.key = key
+        # Issues the entry is known to be linked to, to avoid relinking
+        self.linked_keys: Set[str] = set()
+        self._resolved = threading.Event()
+        if key is not None:
+            self._resolved.set()
+
+    def resolve(self, key: Optional[str]) -> None:
+        """Set the Jira key (None if creation failed) and wake waiters."""
+        self.key = key
+        self._resolved.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Return the Jira key once known, or None on failure or timeout."""
+        self._resolved.wait(timeout)
+        return self.key
+
+
+class DuplicateDetector:
+    """Near-duplicate lookup with MinHash signatures and LSH banding.
+
+    Each text becomes a set of word shingles whose MinHash signature is
+    computed for a whole batch at once with NumPy. Signatures are split
+    into ``bands`` bands and hashed into buckets, so a lookup only compares
+    against texts sharing at least one band instead of every indexed text.
+    Candidates count as duplicates when their estimated Jaccard similarity
+    is at least ``threshold``. Safe to use from several threads.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._buckets: List[dict] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Return the ``(len(texts), num_perm)`` MinHash signature matrix."""
+        hashes = [np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingle_text(text, self.shingle_size)),
+                              dtype=np.uint64) for text in texts]
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        start = 0
+        while start < len(texts):
+            # Hash as many texts as fit in one chunk (at least one)
+            end, rows = start, 0
+            while end < len(texts) and (end == start or rows + len(hashes[end]) <= SIGNATURE_CHUNK_ROWS):
+                rows += len(hashes[end])
+                end += 1
+            flat = np.concatenate(hashes[start:end])
+            offsets = np.cumsum([0] + [len(h) for h in hashes[start:end - 1]])
+            permuted = (np.outer(flat, self._a) + self._b) % MERSENNE_PRIME
+            result[start:end] = np.minimum.reduceat(permuted, offsets, axis=0)
+            start = end
+        return result
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Return the bucket key of each band of a signature."""
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _best_match(self, signature: np.ndarray, band_keys: List[bytes]) -> Optional[DuplicateEntry]:
+        """Return the most similar indexed entry above the threshold (lock held)."""
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for band, band_key in enumerate(band_keys):
+            for entry in self._buckets[band].get(band_key, ()):
+                if id(entry) in seen:
+                    continue
+                seen.add(id(entry))
+                similarity = float(np.mean(entry.signature == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+        return best
+
+    def _insert(self, entry: DuplicateEntry, band_keys: List[bytes]) -> None:
+        """Add an entry to every band bucket (lock held)."""
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, []).append(entry)
+        self.size += 1
+
+    def add(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Index ``(key, text)`` pairs of already-filed issues."""
+        items = list(items)
+        if not items:
+            return
+        signatures = self.signatures([text for _, text in items])
+        with self._lock:
+            for (key, _), signature in zip(items, signatures):
+                self._insert(DuplicateEntry(signature, key), self._band_keys(signature))
+
+    def claim(self, texts: Sequence[str]) -> List[Tuple[bool, DuplicateEntry]]:
+        """Look up each text, indexing the ones that are not duplicates.
+
+        Returns ``(is_duplicate, entry)`` per text: the matching entry for a
+        duplicate, otherwise a new unresolved entry the caller must
+        ``resolve`` (or ``release``) once its issue is created. Texts are
+        also checked against earlier texts of the same call.
+        """
+        signatures = self.signatures(texts)
+        claims = []
+        with self._lock:
+            for signature in signatures:
+                band_keys = self._band_keys(signature)
+                match = self._best_match(signature, band_keys)
+                if match is not None:
+                    claims.append((True, match))
+                    continue
+                entry = DuplicateEntry(signature)
+                self._insert(entry, band_keys)
+                claims.append((False, entry))
+        return claims
+
+    def release(self, entry: DuplicateEntry) -> None:
+        """Remove a claimed entry whose issue was not created."""
+        band_keys = self._band_keys(entry.signature)
+        removed = False
+        with self._lock:
+            for band, band_key in enumerate(band_keys):
+                bucket = self._buckets[band].get(band_key, [])
+                if entry in bucket:
+                    bucket.remove(entry)
+                    removed = True
+            if removed:
+                self.size -= 1
+        entry.resolve(None)
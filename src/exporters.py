@@ -0,0 +1,195 @@
+import csv
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, TextIO
+from xml.sax.saxutils import escape, quoteattr
+from models import TestCase
+from formatting import format_test_case_description
+
+logger = logging.getLogger(__name__)
+
+
+class TestCaseExporter(ABC):
+    """Base class for sinks that stream test cases to a file for bulk import.
+
+    Test cases are written as soon as they are handed over and nothing is
+    kept in memory, so exports of any size run in constant memory. Writes
+    are serialised with a lock because pipeline writers run in threads.
+    """
+
+    extension = 'csv'
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._file: TextIO = open(path, 'w', encoding='utf-8', newline='')
+        self._start()
+
+    def _start(self) -> None:
+        """Write the file header."""
+
+    @abstractmethod
+    def _write_case(self, test_case: TestCase, parent_key: Optional[str]) -> None:
+        """Write one test case."""
+
+    def _finish(self) -> None:
+        """Write the file trailer."""
+
+    def write(self, test_cases: List[TestCase], parent_key: Optional[str] = None) -> List[Dict[str, Optional[str]]]:
+        """Append test cases and return one outcome per case, in order."""
+        outcomes = []
+        with self._lock:
+            for test_case in test_cases:
+                try:
+                    self._write_case(test_case, parent_key)
+                    self.rows += 1
+                    outcomes.append({'key': None, 'error': None, 'exported': f"{self.path}#{self.rows}"})
+                except Exception as e:
+                    outcomes.append({'key': None, 'error': str(e)})
+            self._file.flush()
+        return outcomes
+
+    def close(self) -> None:
+        """Write the trailer and close the file."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._finish()
+            self._file.close()
+        logger.info(f"Exported {self.rows} test cases to {self.path}")
+
+
+class JiraCsvExporter(TestCaseExporter):
+    """Jira's CSV importer format, one issue per row.
+
+    The description is the same wiki markup ``JiraService`` files, labels
+    are space separated (Jira labels cannot contain spaces) and the parent
+    story is mapped through an outward "Tests" issue link column.
+    """
+
+    HEADER = ['Summary', 'Issue Type', 'Priority', 'Description', 'Labels', 'Outward issue link (Tests)']
+
+    def _start(self) -> None:
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+
+    def _write_case(self, test_case: TestCase, parent_key: Optional[str]) -> None:
+        self._writer.writerow([
+            test_case.title, 'Test', test_case.priority.value, format_test_case_description(test_case),
+            ' '.join(test_case.labels), parent_key or ''
+        ])
+
+
+class XrayCsvExporter(TestCaseExporter):
+    """Xray test case importer CSV: a test's first row carries its fields and
+    every step gets a row of its own, grouped by the ``TCID`` column."""
+
+    HEADER = ['TCID', 'Summary', 'Description', 'Priority', 'Labels', 'Test Type',
+              'Action', 'Data', 'Expected Result', 'Requirement']
+
+    def _start(self) -> None:
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+
+    def _write_case(self, test_case: TestCase, parent_key: Optional[str]) -> None:
+        tcid = self.rows + 1
+        fields = [test_case.title, _summary_text(test_case), test_case.priority.value,
+                  ' '.join(test_case.labels), 'Manual']
+        steps = test_case.test_steps or [None]
+        for position, step in enumerate(steps):
+            self._writer.writerow(
+                [tcid] + (fields if position == 0 else [''] * len(fields)) + [
+                    step.action if step else '',
+                    (test_case.test_data or '') if position == 0 else '',
+                    step.expected_result if step else test_case.expected_outcome,
+                    (parent_key or '') if position == 0 else ''
+                ]
+            )
+
+
+class ZephyrCsvExporter(TestCaseExporter):
+    """Zephyr Scale test case import CSV, one row per step with the test's
+    fields on its first row."""
+
+    HEADER = ['Name', 'Objective', 'Precondition', 'Priority', 'Labels',
+              'Step', 'Test Data', 'Expected Result', 'Coverage (Issues)']
+
+    def _start(self) -> None:
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+
+    def _write_case(self, test_case: TestCase, parent_key: Optional[str]) -> None:
+        fields = [test_case.title, test_case.description, '\n'.join(test_case.preconditions),
+                  test_case.priority.value, ','.join(test_case.labels)]
+        steps = test_case.test_steps or [None]
+        for position, step in enumerate(steps):
+            self._writer.writerow(
+                (fields if position == 0 else [''] * len(fields)) + [
+                    step.action if step else '',
+                    (test_case.test_data or '') if position == 0 else '',
+                    step.expected_result if step else test_case.expected_outcome,
+                    (parent_key or '') if position == 0 else ''
+                ]
+            )
+
+
+class JUnitXmlExporter(TestCaseExporter):
+    """JUnit-style XML skeleton: one skipped ``testcase`` per test case.
+
+    Cases go into a single suite, classed by their parent story, with the
+    Jira description as ``system-out`` so automation can be written against
+    it. Suite totals are left out because they are unknown while streaming.
+    """
+
+    extension = 'xml'
+
+    def _start(self) -> None:
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n'
+                         '  <testsuite name="Generated test cases">\n')
+
+    def _write_case(self, test_case: TestCase, parent_key: Optional[str]) -> None:
+        properties = ''.join(
+            f'        <property name={quoteattr(name)} value={quoteattr(value)}/>\n'
+            for name, value in [('priority', test_case.priority.value), ('test_type', test_case.test_type.value)]
+            + [('label', label) for label in test_case.labels]
+        )
+        self._file.write(
+            f'    <testcase classname={quoteattr(parent_key or "unlinked")} name={quoteattr(test_case.title)}>\n'
+            f'      <properties>\n{properties}      </properties>\n'
+            f'      <skipped message="Not yet automated"/>\n'
+            f'      <system-out>{escape(format_test_case_description(test_case))}</system-out>\n'
+            f'    </testcase>\n'
+        )
+
+    def _finish(self) -> None:
+        self._file.write('  </testsuite>\n</testsuites>\n')
+
+
+def _summary_text(test_case: TestCase) -> str:
+    """Return the description with preconditions, for formats with separate steps."""
+    if not test_case.preconditions:
+        return test_case.description
+    return test_case.description + '\n\nPreconditions:\n' + '\n'.join(f"- {p}" for p in test_case.preconditions)
+
+
+EXPORTERS = {
+    'jira_csv': JiraCsvExporter,
+    'xray_csv': XrayCsvExporter,
+    'zephyr_csv': ZephyrCsvExporter,
+    'junit': JUnitXmlExporter,
+}
+
+
+def create_exporter(sink: str, path: str = '') -> Optional[TestCaseExporter]:
+    """Return the exporter for an output sink, or None for the live Jira API.
+
+    Without a ``path`` the file is named ``test_cases_<sink>.<extension>``.
+    """
+    if sink == 'jira':
+        return None
+    if sink not in EXPORTERS:
+        raise ValueError(f"Unknown output sink '{sink}'; expected jira or one of {', '.join(EXPORTERS)}")
+    exporter_class = EXPORTERS[sink]
+    return exporter_class(path or f"test_cases_{sink}.{exporter_class.extension}")
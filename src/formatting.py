@@ -0,0 +1,28 @@
+from models import TestCase
+
+
+def format_test_case_description(test_case: TestCase) -> str:
+    """Format test case as Jira description."""
+    description = f"*Description:* {test_case.description}\n\n"
+    
+    if test_case.preconditions:
+        description += "*Preconditions:*\n"
+        for precondition in test_case.preconditions:
+            description += f"• {precondition}\n"
+        description += "\n"
+    
+    if test_case.test_steps:
+        description += "*Test Steps:*\n"
+        for step in test_case.test_steps:
+            description += f"{step.step_number}. {step.action}\n"
+            description += f"   _Expected Result:_ {step.expected_result}\n\n"
+    
+    description += f"*Expected Outcome:* {test_case.expected_outcome}\n\n"
+    
+    if test_case.test_data:
+        description += f"*Test Data:* {test_case.test_data}\n\n"
+    
+    description += f"*Test Type:* {test_case.test_type.value}\n"
+    description += f"*Priority:* {test_case.priority.value}"
+    
+    return description
@@ -1,8 +1,19 @@
+import itertools
 import logging
-from typing import List, Optional, Dict, Any
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, TypeVar
 from atlassian import Jira
-from models import TestCase, JiraIssue
+from models import TestCase
 from config import settings
+from rate_limiter import call_with_retry, get_rate_limiter
+from metrics import track_call
+from formatting import format_test_case_description
+
+T = TypeVar("T")
+
+# Maximum number of issues Jira accepts in a single bulk-create request
+JIRA_BULK_CREATE_LIMIT = 50
 
 logger = logging.getLogger(__name__)
 
@@ -12,53 +23,44 @@ class JiraService:
             url=settings.jira_url,
             username=settings.jira_email,
             password=settings.jira_api_token,
-            cloud=True
+            cloud=True,
+            timeout=settings.timeout
         )
-        
-    def _format_test_case_description(self, test_case: TestCase) -> str:
-        """Format test case as Jira description."""
-        description = f"*Description:* {test_case.description}\n\n"
-        
-        if test_case.preconditions:
-            description += "*Preconditions:*\n"
-            for precondition in test_case.preconditions:
-                description += f"• {precondition}\n"
-            description += "\n"
-        
-        if test_case.test_steps:
-            description += "*Test Steps:*\n"
-            for step in test_case.test_steps:
-                description += f"{step.step_number}. {step.action}\n"
-                description += f"   _Expected Result:_ {step.expected_result}\n\n"
-        
-        description += f"*Expected Outcome:* {test_case.expected_outcome}\n\n"
-        
-        if test_case.test_data:
-            description += f"*Test Data:* {test_case.test_data}\n\n"
-        
-        description += f"*Test Type:* {test_case.test_type.value}\n"
-        description += f"*Priority:* {test_case.priority.value}"
-        
-        return description
+        self.rate_limiter = get_rate_limiter("jira")
+
+    def _call(self, func: Callable[..., T], *args: Any, idempotent: bool = True, **kwargs: Any) -> T:
+        """Invoke a Jira client method under the shared rate limiter with retries.
+
+        Creates pass ``idempotent=False`` so a timeout or 5xx, after which
+        Jira may already have created the issues, is not replayed.
+        """
+        with track_call("jira", func.__name__):
+            return call_with_retry(func, *args, limiter=self.rate_limiter, idempotent=idempotent, **kwargs)
+
+    @staticmethod
+    def _build_issue_fields(test_case: TestCase, parent_key: Optional[str] = None) -> Dict[str, Any]:
+        """Build the Jira ``fields`` payload for a test case."""
+        issue_data = {
+            'project': {'key': settings.jira_project_key},
+            'summary': test_case.title,
+            'description': format_test_case_description(test_case),
+            'issuetype': {'name': 'Test'},
+            'priority': {'name': test_case.priority.value},
+        }
+
+        if test_case.labels:
+            issue_data['labels'] = test_case.labels
+
+        if parent_key:
+            issue_data['parent'] = {'key': parent_key}
+
+        return issue_data
 
     def create_test_issue(self, test_case: TestCase, parent_key: Optional[str] = None) -> Optional[str]:
         """Create a test issue in Jira."""
         try:
-            issue_data = {
-                'project': {'key': settings.jira_project_key},
-                'summary': test_case.title,
-                'description': self._format_test_case_description(test_case),
-                'issuetype': {'name': 'Test'},
-                'priority': {'name': test_case.priority.value},
-            }
-            
-            if test_case.labels:
-                issue_data['labels'] = test_case.labels
-            
-            if parent_key:
-                issue_data['parent'] = {'key': parent_key}
-            
-            issue = self.jira.create_issue(fields=issue_data)
+            issue_data = self._build_issue_fields(test_case, parent_key)
+            issue = self._call(self.jira.create_issue, fields=issue_data, idempotent=False)
             issue_key = issue['key']
             
             logger.info(f"Created test issue: {issue_key}")
@@ -68,33 +70,220 @@ class JiraService:
             logger.error(f"Failed to create Jira issue: {e}")
             return None
 
+    def create_test_issues_bulk(self, test_cases: List[TestCase], parent_key: Optional[str] = None,
+                                link_type: Optional[str] = "Tests") -> List[Dict[str, Optional[str]]]:
+        """Create test issues through Jira's bulk-create endpoint.
+
+        Cases are sent in chunks of up to ``JIRA_BULK_CREATE_LIMIT``. When
+        ``parent_key`` and ``link_type`` are given, the link to the parent is
+        added in the same request via the ``update.issuelinks`` block, so a
+        story costs one round-trip per chunk instead of two per test case.
+
+        Returns one ``{'key': ..., 'error': ...}`` entry per input test case,
+        in input order; exactly one of the two values is set.
+        """
+        chunk_size = max(1, min(settings.jira_bulk_size, JIRA_BULK_CREATE_LIMIT))
+        outcomes: List[Dict[str, Optional[str]]] = []
+        for start in range(0, len(test_cases), chunk_size):
+            chunk = test_cases[start:start + chunk_size]
+            outcomes.extend(self._create_issue_chunk(chunk, parent_key, link_type))
+        return outcomes
+
+    def _create_issue_chunk(self, test_cases: List[TestCase], parent_key: Optional[str],
+                            link_type: Optional[str]) -> List[Dict[str, Optional[str]]]:
+        """Send one bulk-create request and map its response back to the inputs."""
+        try:
+            response = self._call(self.jira.create_issues, self._bulk_issue_updates(test_cases, parent_key, link_type),
+                                  idempotent=False)
+        except Exception as e:
+            # Jira answers 400 when every element fails, but the body still
+            # carries the per-element errors; anything else fails the chunk.
+            # Such a failure is not retried here: part of the chunk may have
+            # been created, and the journal's fingerprint labels let the next
+            # run find those issues instead of filing them twice.
+            response = self._error_response_body(e)
+            if response is None:
+                logger.error(f"Bulk issue creation failed: {e}")
+                return [{'key': None, 'error': str(e)} for _ in test_cases]
+
+        outcomes = self._match_bulk_results(len(test_cases), response or {})
+        created = [outcome['key'] for outcome in outcomes if outcome['key']]
+        logger.info(f"Bulk created {len(created)}/{len(test_cases)} test issues: {', '.join(created)}")
+        return outcomes
+
+    @classmethod
+    def _bulk_issue_updates(cls, test_cases: List[TestCase], parent_key: Optional[str],
+                            link_type: Optional[str]) -> List[Dict[str, Any]]:
+        """Build the ``issueUpdates`` of a bulk-create request."""
+        issue_updates = []
+        for test_case in test_cases:
+            issue_update: Dict[str, Any] = {'fields': cls._build_issue_fields(test_case, parent_key)}
+            if parent_key and link_type:
+                issue_update['update'] = {'issuelinks': [{'add': {
+                    'type': {'name': link_type},
+                    'outwardIssue': {'key': parent_key}
+                }}]}
+            issue_updates.append(issue_update)
+        return issue_updates
+
+    @staticmethod
+    def _issue_link(source_key: str, target_key: str, link_type: str) -> Dict[str, Any]:
+        """Build the payload linking ``source_key`` (inward) to ``target_key``."""
+        return {
+            'type': {'name': link_type},
+            'inwardIssue': {'key': source_key},
+            'outwardIssue': {'key': target_key}
+        }
+
+    @staticmethod
+    def _labels_jql(labels: List[str]) -> str:
+        """Return the JQL finding project issues that carry any of ``labels``."""
+        quoted = ', '.join(f'"{label}"' for label in labels)
+        return f"project = {settings.jira_project_key} AND labels in ({quoted}) ORDER BY key"
+
+    @staticmethod
+    def _error_response_body(error: Exception) -> Optional[Dict[str, Any]]:
+        """Return the JSON body of a failed bulk request if it lists element errors."""
+        response = getattr(error, 'response', None)
+        try:
+            body = response.json() if response is not None else None
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) and 'errors' in body else None
+
+    @staticmethod
+    def _match_bulk_results(count: int, response: Dict[str, Any]) -> List[Dict[str, Optional[str]]]:
+        """Pair a bulk-create response with the submitted elements.
+
+        Failures are reported by ``failedElementNumber``; the ``issues`` list
+        holds the successes in submission order, so walking the inputs and
+        skipping failed indices recovers which key belongs to which case.
+        """
+        errors: Dict[int, str] = {}
+        for error in response.get('errors', []):
+            element_errors = error.get('elementErrors', {})
+            messages = list(element_errors.get('errorMessages', []))
+            messages += [f"{field}: {message}" for field, message in element_errors.get('errors', {}).items()]
+            errors[error.get('failedElementNumber', -1)] = '; '.join(messages) or f"HTTP {error.get('status')}"
+
+        created = iter(response.get('issues', []))
+        outcomes: List[Dict[str, Optional[str]]] = []
+        for index in range(count):
+            if index in errors:
+                outcomes.append({'key': None, 'error': errors[index]})
+                continue
+            issue = next(created, None)
+            if issue:
+                outcomes.append({'key': issue['key'], 'error': None})
+            else:
+                outcomes.append({'key': None, 'error': "Missing from bulk create response"})
+        return outcomes
+
     def link_issues(self, source_key: str, target_key: str, link_type: str = "Tests") -> bool:
         """Create a link between two Jira issues."""
         try:
-            self.jira.create_issue_link(
-                type=link_type,
-                inwardIssue=source_key,
-                outwardIssue=target_key
-            )
+            self._call(self.jira.create_issue_link, self._issue_link(source_key, target_key, link_type))
             logger.info(f"Linked {source_key} to {target_key}")
             return True
         except Exception as e:
             logger.error(f"Failed to link issues: {e}")
             return False
 
-    def get_project_issues(self, jql: str) -> List[Dict[str, Any]]:
-        """Retrieve issues from Jira using JQL."""
+    def _fetch_page(self, jql: str, fields: Optional[List[str]], start: int, limit: int) -> Dict[str, Any]:
+        """Fetch one page of JQL search results."""
+        return self._call(
+            self.jira.jql, jql,
+            fields=','.join(fields) if fields else '*all',
+            start=start, limit=limit
+        )
+
+    def iter_issues(self, jql: str, fields: Optional[List[str]] = None,
+                    page_size: Optional[int] = None, max_workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream every issue matching ``jql``, page by page.
+
+        The first page is fetched on its own to learn ``total``; the
+        remaining pages are then fetched by up to ``max_workers`` threads.
+        Only that many pages are ever in flight or buffered, and issues are
+        yielded in result order, so memory stays bounded by
+        ``max_workers * page_size`` regardless of project size. Pass
+        ``fields`` to download only the fields the caller needs. Offset
+        pagination assumes a stable order, so include an ``ORDER BY``.
+        """
+        limit = page_size or settings.jira_page_size
+        workers = max(1, max_workers or settings.jira_page_concurrency)
+
+        first_page = self._fetch_page(jql, fields, 0, limit)
+        issues = first_page.get('issues', [])
+        yield from issues
+
+        # Jira may cap maxResults below the requested size, so step by the
+        # page size it actually returned.
+        step = len(issues)
+        total = first_page.get('total', step)
+        if not step or step >= total:
+            return
+        starts = iter(range(step, total, step))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            window: Deque[Future] = deque(
+                executor.submit(self._fetch_page, jql, fields, start, step)
+                for start in itertools.islice(starts, workers)
+            )
+            try:
+                while window:
+                    page = window.popleft().result()
+                    next_start = next(starts, None)
+                    if next_start is not None:
+                        window.append(executor.submit(self._fetch_page, jql, fields, next_start, step))
+                    yield from page.get('issues', [])
+            finally:
+                # Consumer stopped early or a page failed: drop queued pages
+                for future in window:
+                    future.cancel()
+
+    def count_issues(self, jql: str) -> int:
+        """Return how many issues match ``jql`` without downloading any.
+
+        A ``maxResults=0`` search answers with ``total`` alone.
+        """
+        return int(self._call(self.jira.jql, jql, fields='key', start=0, limit=0).get('total', 0))
+
+    def get_project_issues(self, jql: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Retrieve all issues matching a JQL query (every page)."""
         try:
-            issues = self.jira.jql(jql)
-            return issues.get('issues', [])
+            return list(self.iter_issues(jql, fields))
         except Exception as e:
             logger.error(f"Failed to retrieve issues: {e}")
             return []
 
+    def find_issues_by_labels(self, labels: List[str]) -> Dict[str, str]:
+        """Map each label to the key of an existing issue carrying it."""
+        found: Dict[str, str] = {}
+        wanted = set(labels)
+        # Keep each JQL query to a manageable length
+        for start in range(0, len(labels), JIRA_BULK_CREATE_LIMIT):
+            chunk = labels[start:start + JIRA_BULK_CREATE_LIMIT]
+            for issue in self.iter_issues(self._labels_jql(chunk), fields=['labels']):
+                for label in (issue.get('fields') or {}).get('labels') or []:
+                    if label in wanted:
+                        found.setdefault(label, issue['key'])
+        return found
+
+    def add_labels(self, issue_key: str, labels: List[str]) -> bool:
+        """Add labels to an issue, keeping the ones it already has."""
+        try:
+            self._call(self.jira.edit_issue, issue_key, {'labels': [{'add': label} for label in labels]},
+                       notify_users=False)
+            logger.info(f"Added labels to {issue_key}: {', '.join(labels)}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add labels to {issue_key}: {e}")
+            return False
+
     def update_issue(self, issue_key: str, fields: Dict[str, Any]) -> bool:
         """Update an existing Jira issue."""
         try:
-            self.jira.update_issue_field(issue_key, fields)
+            self._call(self.jira.update_issue_field, issue_key, fields)
             logger.info(f"Updated issue: {issue_key}")
             return True
         except Exception as e:
@@ -0,0 +1,85 @@
+import json
+from typing import Any, Dict, List
+
+
+class JsonArrayStreamParser:
+    """Incrementally extract the objects of a JSON array from text chunks.
+
+    Model output arrives a few characters at a time, so this scans each chunk
+    once with a tiny state machine (nesting depth, inside-string, escape) and
+    decodes an element as soon as its closing brace is seen. Text before the
+    opening ``[`` (prose, a ```json fence) is skipped, as are non-object
+    elements. Only a ``[`` followed, after optional whitespace, by ``{`` or
+    ``]`` opens the array, so a bracket in the prose is not mistaken for it. Objects that fail to decode are counted in ``invalid`` and
+    kept in ``rejected`` for repair rather than aborting the stream.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.complete = False
+        self._bracket = False
+        self.invalid = 0
+        self.rejected: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current: List[str] = []
+
+    @property
+    def pending(self) -> str:
+        """Text of the object currently being received (empty between objects)."""
+        return ''.join(self._current)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk and return the objects it completed, in order."""
+        objects: List[Dict[str, Any]] = []
+        for char in chunk:
+            if self.complete:
+                break
+            if not self.started:
+                if self._bracket and char.isspace():
+                    continue
+                if not (self._bracket and char in '{]'):
+                    # Still in the preamble; remember a '[' that may open the array
+                    self._bracket = char == '['
+                    continue
+                self.started = True
+            if self._depth == 0:
+                # Between elements of the top-level array
+                if char == '{':
+                    self._depth = 1
+                    self._current = [char]
+                elif char == ']':
+                    self.complete = True
+                continue
+
+            self._current.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(objects)
+        return objects
+
+    def _emit(self, objects: List[Dict[str, Any]]) -> None:
+        """Decode the finished element and reset the capture buffer."""
+        text = ''.join(self._current)
+        self._current = []
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            self.invalid += 1
+            self.rejected.append(text)
+            return
+        if isinstance(value, dict):
+            objects.append(value)
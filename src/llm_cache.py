@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCache:
+    """Disk-backed, content-addressed cache for chat completion outputs.
+
+    Entries live in a single SQLite file keyed by a SHA-256 of everything
+    that determines the model's answer. Each entry expires after
+    ``ttl_seconds`` and the table is trimmed to ``max_entries`` by evicting
+    the least recently read rows, so the file stays bounded however many
+    stories are processed. SQLite lookups take well under a millisecond, so
+    they are run inline rather than in a worker thread.
+
+    The cache is optional, so a failed read or write (e.g. "database is
+    locked" when several worker processes share the file) is logged and
+    treated as a miss rather than failing a completion already paid for.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+
+    @staticmethod
+    def make_key(model: str, messages: List[Any], temperature: float, max_tokens: int,
+                 subject: Optional[BaseModel] = None) -> str:
+        """Hash the request parameters, prompt text and serialized subject."""
+        payload = {
+            'model': model,
+            'messages': [[getattr(m, 'role', type(m).__name__), m.content] for m in messages],
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'subject': subject.model_dump(mode='json') if subject is not None else None,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None when missing, expired or unreadable."""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value, created FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, created = row
+                if self.ttl_seconds and now - created > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    return None
+                self._conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+                return value
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache read failed, treating as a miss: {e}")
+                return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value and evict least recently used rows beyond the limit."""
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO completions (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._evict()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache write failed, answer not cached: {e}")
+
+    def delete(self, key: str) -> None:
+        """Drop a single entry, e.g. one whose content no longer parses."""
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache delete failed: {e}")
+
+    def _evict(self) -> None:
+        """Remove expired rows, then the oldest-read rows over ``max_entries``."""
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries > 0:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM completions WHERE key IN "
+                    "(SELECT key FROM completions ORDER BY accessed ASC LIMIT ?)", (excess,)
+                )
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
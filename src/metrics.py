@@ -0,0 +1,373 @@
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Counter:
+    """Monotonic counter with labels, safe to update from any thread."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add ``amount`` to the series identified by ``labels``."""
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        """Return ``(suffix, label values, value)`` for every series."""
+        with self._lock:
+            return [('', key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: per-bucket counts (+Inf last), sum and count
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for the series identified by ``labels``."""
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        """Return bucket, sum and count samples for every series."""
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    samples.append(('_bucket', key + (le,), cumulative))
+                samples.append(('_sum', key, total))
+                samples.append(('_count', key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """In-process collection of metrics with a Prometheus text exporter."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the named counter, creating it on first use."""
+        return self._register(name, lambda: Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Return the named histogram, creating it on first use."""
+        return self._register(name, lambda: Histogram(name, help_text, labelnames, buckets))
+
+    def _register(self, name: str, factory: Any) -> Any:
+        """Return an existing metric or register the one ``factory`` builds."""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def export_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, values, value in metric.samples():
+                names = metric.labelnames + (('le',) if suffix == '_bucket' else ())
+                label_text = ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+                lines.append(f"{metric.name}{suffix}{{{label_text}}} {value:g}" if label_text
+                             else f"{metric.name}{suffix} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+CALLS = registry.counter('tcg_calls_total', 'Service calls by outcome', ('service', 'operation', 'outcome'))
+CALL_SECONDS = registry.histogram('tcg_call_duration_seconds', 'Service call wall time', ('service', 'operation'))
+RETRIES = registry.counter('tcg_retries_total', 'Retried service calls', ('service',))
+TOKENS = registry.counter('tcg_tokens_total', 'LLM tokens used', ('model', 'kind'))
+COST = registry.counter('tcg_cost_usd_total', 'Estimated LLM cost in USD', ('model',))
+LLM_CALL_SECONDS = registry.histogram('tcg_llm_call_duration_seconds', 'LLM completion wall time per model',
+                                      ('model', 'operation'))
+ESCALATIONS = registry.counter('tcg_model_escalations_total',
+                               'Requests re-run on the large model after the small one', ('operation', 'reason'))
+RECOVERED_TEST_CASES = registry.counter('tcg_recovered_test_cases_total',
+                                        'Test cases recovered from truncated or malformed answers', ('method',))
+VALIDATIONS_SKIPPED = registry.counter('tcg_llm_validations_skipped_total',
+                                       'Validations decided by local rules instead of the LLM', ('decision',))
+STORY_SECONDS = registry.histogram('tcg_story_duration_seconds', 'End-to-end wall time per story', ())
+
+
+def _load_pricing() -> Dict[str, Tuple[float, float]]:
+    """Parse ``AZURE_AI_PRICING``: {"model": [prompt_usd_per_1k, completion_usd_per_1k]}."""
+    try:
+        return {model: (float(p[0]), float(p[1])) for model, p in json.loads(settings.azure_ai_pricing).items()}
+    except (ValueError, TypeError, IndexError, AttributeError):
+        logger.warning("Ignoring invalid AZURE_AI_PRICING setting")
+        return {}
+
+
+PRICING = _load_pricing()
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Return the estimated USD cost of a completion (0 for unpriced models)."""
+    prompt_price, completion_price = PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000.0
+
+
+class RunSummary:
+    """Per-story roll-up of calls, time, retries, tokens and cost."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.tokens = {'prompt': 0, 'completion': 0}
+        self.cost_usd = 0.0
+        # Per model: calls, seconds, tokens and cost
+        self.models: Dict[str, Dict[str, float]] = {}
+        self.escalations = 0
+        self.validations_skipped = 0
+        self._lock = threading.Lock()
+
+    def _stage(self, stage: str) -> Dict[str, float]:
+        """Return the counters for a stage (caller holds the lock)."""
+        return self.stages.setdefault(stage, {'calls': 0, 'errors': 0, 'retries': 0, 'seconds': 0.0})
+
+    def record_call(self, stage: str, seconds: float, ok: bool) -> None:
+        """Add one finished call to a stage."""
+        with self._lock:
+            entry = self._stage(stage)
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            if not ok:
+                entry['errors'] += 1
+
+    def _model(self, model: str) -> Dict[str, float]:
+        """Return the counters for a model (caller holds the lock)."""
+        return self.models.setdefault(model, {'calls': 0, 'seconds': 0.0, 'prompt_tokens': 0,
+                                              'completion_tokens': 0, 'cost_usd': 0.0})
+
+    def record_model_call(self, model: str, seconds: float) -> None:
+        """Add one finished completion to a model's counters."""
+        with self._lock:
+            entry = self._model(model)
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+
+    def record_retry(self, stage: str) -> None:
+        """Count a retried attempt against a stage."""
+        with self._lock:
+            self._stage(stage)['retries'] += 1
+
+    def record_usage(self, prompt_tokens: int, completion_tokens: int, cost: float,
+                     model: Optional[str] = None) -> None:
+        """Add token usage and its cost, also per model when ``model`` is given."""
+        with self._lock:
+            self.tokens['prompt'] += prompt_tokens
+            self.tokens['completion'] += completion_tokens
+            self.cost_usd += cost
+            if model is not None:
+                entry = self._model(model)
+                entry['prompt_tokens'] += prompt_tokens
+                entry['completion_tokens'] += completion_tokens
+                entry['cost_usd'] += cost
+
+    def record_escalation(self) -> None:
+        """Count a request re-run on the large model."""
+        with self._lock:
+            self.escalations += 1
+
+    def record_validation_skipped(self) -> None:
+        """Count a validation decided without an LLM call."""
+        with self._lock:
+            self.validations_skipped += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable summary of the run so far."""
+        with self._lock:
+            stages = {name: {**entry, 'seconds': round(entry['seconds'], 3)} for name, entry in self.stages.items()}
+            models = {name: {**entry, 'seconds': round(entry['seconds'], 3), 'cost_usd': round(entry['cost_usd'], 6)}
+                      for name, entry in self.models.items()}
+            return {
+                'wall_time_seconds': round(time.perf_counter() - self.started, 3),
+                'stages': stages,
+                'tokens': dict(self.tokens),
+                'cost_usd': round(self.cost_usd, 6),
+                'models': models,
+                'model_escalations': self.escalations,
+                'llm_validations_skipped': self.validations_skipped
+            }
+
+
+def finish_story(summary: RunSummary) -> Dict[str, Any]:
+    """Record a finished story's wall time and return its summary dict."""
+    result = summary.to_dict()
+    STORY_SECONDS.observe(result['wall_time_seconds'])
+    return result
+
+
+# The summary of the story being processed. Context variables follow
+# asyncio tasks and are copied into asyncio.to_thread workers, so service
+# calls made on behalf of a story are attributed to it wherever they run.
+_current_summary: contextvars.ContextVar[Optional[RunSummary]] = contextvars.ContextVar(
+    'current_summary', default=None
+)
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar('current_stage', default='')
+
+
+@contextmanager
+def story_scope(summary: RunSummary) -> Iterator[RunSummary]:
+    """Attribute the calls made inside the block to ``summary``."""
+    token = _current_summary.set(summary)
+    try:
+        yield summary
+    finally:
+        _current_summary.reset(token)
+
+
+@contextmanager
+def track_call(service: str, operation: str, model: Optional[str] = None) -> Iterator[None]:
+    """Time a service call and record its outcome globally and per story.
+
+    LLM calls pass the ``model`` that served them so latency is also
+    tracked per model.
+    """
+    stage = f"{service}.{operation}"
+    stage_token = _current_stage.set(stage)
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        _current_stage.reset(stage_token)
+        record_call(service, operation, time.perf_counter() - started, ok, model)
+
+
+def record_call(service: str, operation: str, seconds: float, ok: bool, model: Optional[str] = None) -> None:
+    """Record a finished call that was timed by the caller."""
+    CALLS.inc(service=service, operation=operation, outcome='success' if ok else 'error')
+    CALL_SECONDS.observe(seconds, service=service, operation=operation)
+    if model is not None:
+        LLM_CALL_SECONDS.observe(seconds, model=model, operation=operation)
+    summary = _current_summary.get()
+    if summary is not None:
+        summary.record_call(f"{service}.{operation}", seconds, ok)
+        if model is not None:
+            summary.record_model_call(model, seconds)
+
+
+def record_retry(service: str) -> None:
+    """Count a retry against the service and the call in progress."""
+    RETRIES.inc(service=service)
+    summary = _current_summary.get()
+    if summary is not None:
+        summary.record_retry(_current_stage.get() or service)
+
+
+def record_usage(model: str, usage: Any) -> None:
+    """Record the ``usage`` block of a completion response."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    cost = token_cost(model, prompt_tokens, completion_tokens)
+    TOKENS.inc(prompt_tokens, model=model, kind='prompt')
+    TOKENS.inc(completion_tokens, model=model, kind='completion')
+    COST.inc(cost, model=model)
+    summary = _current_summary.get()
+    if summary is not None:
+        summary.record_usage(prompt_tokens, completion_tokens, cost, model)
+
+
+def record_escalation(operation: str, reason: str) -> None:
+    """Count a request the small model could not settle (``invalid_output``,
+    ``low_score`` or ``error``) and that was re-run on the large model."""
+    ESCALATIONS.inc(operation=operation, reason=reason)
+    summary = _current_summary.get()
+    if summary is not None:
+        summary.record_escalation()
+
+
+def record_validation_skipped(decision: str) -> None:
+    """Count a validation that local rules decided (``accept`` or ``reject``)."""
+    VALIDATIONS_SKIPPED.inc(decision=decision)
+    summary = _current_summary.get()
+    if summary is not None:
+        summary.record_validation_skipped()
+
+
+def record_recovery(method: str, count: int = 1) -> None:
+    """Count test cases recovered by ``method`` (``salvaged``, ``normalized``,
+    ``continued`` or ``re_requested``) instead of regenerating the story."""
+    if count:
+        RECOVERED_TEST_CASES.inc(count, method=method)
+
+
+def serve_prometheus(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread and return the server.
+
+    Binds to localhost by default; pass ``host`` to expose it further.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = registry.export_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # Scrapes are frequent; keep them out of the application log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on {host}:{port}/metrics")
+    return server
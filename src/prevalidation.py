@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Tuple
+from models import Priority, TestCase, TestType
+
+# Deduction per finding. Structural defects make a case unusable on their
+# own; the smaller ones mark a thin case that deserves a model review.
+DEFECT_PENALTIES = {
+    'no_steps': 7,
+    'missing_expected_outcome': 5,
+    'blank_action': 3,
+    'blank_expected_result': 3,
+    'non_sequential_steps': 2,
+    'duplicate_steps': 2,
+    'conflicting_labels': 1,
+    'blank_label': 1,
+    'single_step': 1,
+    'short_description': 1,
+}
+
+FINDING_MESSAGES = {
+    'no_steps': "Test case has no test steps",
+    'missing_expected_outcome': "Expected outcome is missing",
+    'blank_action': "A test step has no action",
+    'blank_expected_result': "A test step has no expected result",
+    'non_sequential_steps': "Step numbers are not sequential from 1",
+    'duplicate_steps': "Test steps are duplicated",
+    'conflicting_labels': "Labels name a priority or test type that contradicts the fields",
+    'blank_label': "A label is blank",
+    'single_step': "Test case has a single step",
+    'short_description': "Description is very short",
+}
+
+_PRIORITY_NAMES = {priority.value.lower() for priority in Priority}
+_TEST_TYPE_NAMES = {test_type.value.lower() for test_type in TestType}
+
+
+def _enum_value(value: Any) -> str:
+    """Return an enum member's value, or the raw value as text."""
+    return str(getattr(value, 'value', value))
+
+
+def find_defects(test_case: TestCase) -> List[str]:
+    """Return the rule findings for a test case, most severe first."""
+    findings: List[str] = []
+    steps = test_case.test_steps
+    if not steps:
+        findings.append('no_steps')
+    if not test_case.expected_outcome.strip():
+        findings.append('missing_expected_outcome')
+    if any(not step.action.strip() for step in steps):
+        findings.append('blank_action')
+    if any(not step.expected_result.strip() for step in steps):
+        findings.append('blank_expected_result')
+    if [step.step_number for step in steps] != list(range(1, len(steps) + 1)):
+        findings.append('non_sequential_steps')
+    step_texts = [(step.action.strip().lower(), step.expected_result.strip().lower()) for step in steps]
+    if len(set(step_texts)) < len(step_texts):
+        findings.append('duplicate_steps')
+
+    # ``TestCase`` already rejects unknown priorities and test types, so
+    # only labels that contradict them are worth checking
+    priority = _enum_value(test_case.priority).lower()
+    test_type = _enum_value(test_case.test_type).lower()
+    labels = [label.strip().lower() for label in test_case.labels]
+    if any((label in _PRIORITY_NAMES and label != priority)
+           or (label in _TEST_TYPE_NAMES and label != test_type) for label in labels):
+        findings.append('conflicting_labels')
+    if any(not label for label in labels):
+        findings.append('blank_label')
+
+    if len(steps) == 1:
+        findings.append('single_step')
+    if len(test_case.description.strip()) < 20:
+        findings.append('short_description')
+    return findings
+
+
+def score_test_case(test_case: TestCase) -> Tuple[int, List[str]]:
+    """Score a test case 1-10 from its rule findings."""
+    findings = find_defects(test_case)
+    score = 10 - sum(DEFECT_PENALTIES[finding] for finding in findings)
+    return max(1, score), findings
+
+
+def local_verdict(test_case: TestCase, accept_score: int, reject_score: int) -> Optional[Dict[str, Any]]:
+    """Decide clear-cut cases without the model.
+
+    Returns a verdict in the same shape as ``validate_test_case`` when the
+    rule score is at least ``accept_score`` or at most ``reject_score``,
+    and None for borderline cases that still need an LLM review. The rules
+    only see structure, so an ``accept_score`` above 10 keeps every
+    well-formed case in the content review and only rejects locally.
+    """
+    score, findings = score_test_case(test_case)
+    if reject_score < score < accept_score:
+        return None
+    messages = [FINDING_MESSAGES[finding] for finding in findings]
+    return {
+        'is_valid': score >= accept_score,
+        'quality_score': score,
+        'feedback': '; '.join(messages) if messages else "Passed local structural checks",
+        'suggestions': messages,
+        'source': 'rules'
+    }
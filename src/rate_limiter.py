@@ -0,0 +1,395 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from config import settings
+from metrics import record_retry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: throttling, timeouts and transient 5xx errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Transport-level failures raised by azure-core, requests and aiohttp. They are
+# matched by class name so this module does not import any of those clients.
+RETRYABLE_EXCEPTION_NAMES = {
+    "ServiceRequestError",
+    "ServiceResponseError",
+    "ConnectionError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "Timeout",
+    "TimeoutError",
+    "ClientConnectionError",
+    "ServerDisconnectedError",
+}
+
+# Failures that happen before a request reaches the server. Only these and
+# throttled (429) responses are retried for non-idempotent calls: after a
+# timeout or 5xx the server may already have applied the request.
+NOT_SENT_EXCEPTION_NAMES = {
+    "ConnectTimeout",
+    "NewConnectionError",
+    "ClientConnectorError",
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket measured in units per minute.
+
+    Callers reserve units up front and the balance may go negative; the
+    returned wait is how long the caller must sleep for its reservation to be
+    covered. Reserving instead of polling keeps callers in FIFO order and lets
+    the same bucket serve threads (Jira) and coroutines (Azure AI).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add the units accrued since the last update (caller holds the lock)."""
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Reserve ``amount`` units and return the seconds to wait before use."""
+        if self.rate_per_minute <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * 60.0 / self.rate_per_minute
+
+    def adjust(self, delta: float) -> None:
+        """Consume (positive) or refund (negative) units after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """Change the refill rate, keeping the accrued balance."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate_per_minute = float(rate_per_minute)
+
+
+class SharedTokenBucket(TokenBucket):
+    """``TokenBucket`` whose state lives in shared memory.
+
+    The balance, last refill time, rate and capacity are kept in a
+    ``multiprocessing.Array`` created by the parent, so every worker process
+    draws on one budget. ``time.monotonic`` is system-wide, which keeps the
+    refill arithmetic valid across processes.
+    """
+
+    def __init__(self, state: Any):
+        self._state = state
+        self._lock = state.get_lock()
+
+    @staticmethod
+    def allocate(context: Any, rate_per_minute: float, capacity: Optional[float] = None) -> Any:
+        """Create the shared state for a bucket (in the parent process)."""
+        capacity = float(capacity if capacity is not None else rate_per_minute)
+        return context.Array('d', [capacity, time.monotonic(), float(rate_per_minute), capacity])
+
+    @property
+    def _tokens(self) -> float:
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value: float) -> None:
+        self._state[0] = value
+
+    @property
+    def _updated(self) -> float:
+        return self._state[1]
+
+    @_updated.setter
+    def _updated(self, value: float) -> None:
+        self._state[1] = value
+
+    @property
+    def rate_per_minute(self) -> float:
+        return self._state[2]
+
+    @rate_per_minute.setter
+    def rate_per_minute(self, value: float) -> None:
+        self._state[2] = value
+
+    @property
+    def capacity(self) -> float:
+        return self._state[3]
+
+
+class RateLimiter:
+    """Per-endpoint request and token budgets with AIMD adaptation.
+
+    The request rate starts at the configured ceiling. Each throttled response
+    halves it (multiplicative decrease) and each success adds back a small
+    fraction of the ceiling (additive increase), so the limiter settles just
+    under the real quota instead of a fixed, conservative pace. A
+    ``Retry-After`` hint pauses every caller sharing the limiter.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float,
+                 tokens_per_minute: Optional[float] = None,
+                 min_requests_per_minute: float = 1.0):
+        self.name = name
+        self.max_requests_per_minute = float(requests_per_minute)
+        self.min_requests_per_minute = min(float(min_requests_per_minute), self.max_requests_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Reserve one request plus ``tokens`` and return the required wait."""
+        wait = self.requests.reserve(1)
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._lock:
+            pause = self._paused_until - time.monotonic()
+        return max(wait, pause, 0.0)
+
+    def acquire(self, tokens: float = 0) -> None:
+        """Block the current thread until the budget allows another call."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 0) -> None:
+        """Wait on the event loop until the budget allows another call."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_tokens(self, reserved: float, actual: Optional[float]) -> None:
+        """Reconcile a token reservation with the usage the service reported."""
+        if self.tokens is not None and actual is not None:
+            self.tokens.adjust(actual - reserved)
+
+    def on_success(self) -> None:
+        """Additively raise the request rate back towards the ceiling."""
+        current = self.requests.rate_per_minute
+        if current < self.max_requests_per_minute:
+            step = max(1.0, self.max_requests_per_minute * 0.05)
+            self.requests.set_rate(min(self.max_requests_per_minute, current + step))
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Halve the request rate and honour the server's ``Retry-After``."""
+        new_rate = max(self.min_requests_per_minute, self.requests.rate_per_minute / 2)
+        self.requests.set_rate(new_rate)
+        if retry_after:
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        logger.warning(f"{self.name} throttled; rate now {new_rate:.1f} req/min"
+                       + (f", pausing {retry_after:.1f}s" if retry_after else ""))
+
+
+class SharedRateLimiter(RateLimiter):
+    """``RateLimiter`` over shared buckets and a shared ``Retry-After`` pause."""
+
+    def __init__(self, name: str, state: Dict[str, Any], min_requests_per_minute: float = 1.0):
+        self.name = name
+        self.requests = SharedTokenBucket(state['requests'])
+        self.tokens = SharedTokenBucket(state['tokens']) if state['tokens'] is not None else None
+        self.max_requests_per_minute = self.requests.capacity
+        self.min_requests_per_minute = min(float(min_requests_per_minute), self.max_requests_per_minute)
+        self._pause = state['paused_until']
+        self._lock = self._pause.get_lock()
+
+    @property
+    def _paused_until(self) -> float:
+        return self._pause.value
+
+    @_paused_until.setter
+    def _paused_until(self, value: float) -> None:
+        self._pause.value = value
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _build_limiter(name: str) -> RateLimiter:
+    """Create a limiter for a known endpoint from the application settings."""
+    requests_per_minute, tokens_per_minute = _limiter_budgets(name)
+    return RateLimiter(name, requests_per_minute, tokens_per_minute)
+
+
+def _limiter_budgets(name: str) -> Tuple[float, Optional[float]]:
+    """Return the configured ``(requests, tokens)`` per minute of an endpoint."""
+    if name == "azure_ai":
+        return settings.azure_ai_requests_per_minute, settings.azure_ai_tokens_per_minute
+    if name == "jira":
+        return settings.jira_requests_per_minute, None
+    raise ValueError(f"Unknown rate limiter: {name}")
+
+
+def create_shared_limiter_state(context: Any) -> Dict[str, Dict[str, Any]]:
+    """Allocate shared-memory budgets for every endpoint (in the parent).
+
+    Pass the result to ``install_shared_limiters`` in each worker process
+    (e.g. as a pool initializer argument) so the workers share global
+    request and token rates instead of each getting the full budget.
+    """
+    state = {}
+    for name in ("azure_ai", "jira"):
+        requests_per_minute, tokens_per_minute = _limiter_budgets(name)
+        state[name] = {
+            'requests': SharedTokenBucket.allocate(context, requests_per_minute),
+            'tokens': SharedTokenBucket.allocate(context, tokens_per_minute) if tokens_per_minute else None,
+            'paused_until': context.Value('d', 0.0)
+        }
+    return state
+
+
+def install_shared_limiters(state: Dict[str, Dict[str, Any]]) -> None:
+    """Make this process's limiters draw on the shared budgets in ``state``."""
+    with _limiters_lock:
+        for name, limiter_state in state.items():
+            _limiters[name] = SharedRateLimiter(name, limiter_state)
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Return the process-wide limiter shared by every client of an endpoint."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = _build_limiter(name)
+        return _limiters[name]
+
+
+def _error_status_and_headers(error: BaseException) -> Tuple[Optional[int], Any]:
+    """Extract the HTTP status and headers from an azure/requests/aiohttp error."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+    return status, headers
+
+
+def retry_after_seconds(headers: Any) -> Optional[float]:
+    """Parse ``Retry-After`` (seconds or HTTP date) and the ``*-ms`` variants."""
+    if not headers:
+        return None
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) / 1000.0
+            except ValueError:
+                pass
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def classify_error(error: BaseException) -> Tuple[bool, bool, Optional[float]]:
+    """Return ``(retryable, throttled, retry_after)`` for a failed call."""
+    status, headers = _error_status_and_headers(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES, status == 429, retry_after_seconds(headers)
+    retryable = isinstance(error, (asyncio.TimeoutError, ConnectionError)) or \
+        type(error).__name__ in RETRYABLE_EXCEPTION_NAMES
+    return retryable, False, None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than ``retry_after``.
+
+    Randomising over the whole window spreads out clients that were throttled
+    at the same moment so they do not retry in lock-step.
+    """
+    ceiling = min(settings.retry_backoff_max, settings.retry_backoff_base * (2 ** attempt))
+    return max(retry_after or 0.0, random.uniform(0, ceiling))
+
+
+def _handle_failure(error: BaseException, limiter: RateLimiter, attempt: int,
+                    max_retries: int, idempotent: bool = True) -> float:
+    """Update the limiter for a failed attempt and return the retry delay.
+
+    Re-raises ``error`` when it is not retryable or retries are exhausted.
+    For non-``idempotent`` calls only failures that prove the request was
+    not applied (throttling, no connection) are retryable.
+    """
+    retryable, throttled, retry_after = classify_error(error)
+    if throttled:
+        limiter.on_throttle(retry_after)
+    if not idempotent:
+        retryable = throttled or type(error).__name__ in NOT_SENT_EXCEPTION_NAMES
+    if not retryable or attempt >= max_retries:
+        raise error
+    delay = backoff_delay(attempt, retry_after)
+    record_retry(limiter.name)
+    logger.info(f"{limiter.name} call failed ({error}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+    return delay
+
+
+def call_with_retry(func: Callable[..., T], *args: Any, limiter: RateLimiter,
+                    tokens: float = 0, max_retries: Optional[int] = None,
+                    idempotent: bool = True, **kwargs: Any) -> T:
+    """Call a blocking function under ``limiter`` with jittered retries.
+
+    Pass ``idempotent=False`` for calls that must not be replayed after an
+    ambiguous failure (e.g. creating issues).
+    """
+    retries = settings.max_retries if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        limiter.acquire(tokens)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            # A failed call did not spend its token reservation
+            limiter.record_tokens(tokens, 0)
+            time.sleep(_handle_failure(e, limiter, attempt, retries, idempotent))
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
+
+
+async def call_with_retry_async(func: Callable[..., Awaitable[T]], *args: Any,
+                                limiter: RateLimiter, tokens: float = 0,
+                                max_retries: Optional[int] = None, idempotent: bool = True,
+                                **kwargs: Any) -> T:
+    """Await a coroutine function under ``limiter`` with jittered retries.
+
+    ``idempotent`` works as in ``call_with_retry``.
+    """
+    retries = settings.max_retries if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        await limiter.acquire_async(tokens)
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            # A failed call did not spend its token reservation
+            limiter.record_tokens(tokens, 0)
+            await asyncio.sleep(_handle_failure(e, limiter, attempt, retries, idempotent))
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
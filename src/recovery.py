@@ -0,0 +1,143 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+from models import Priority, TestCase, TestType
+from json_stream import JsonArrayStreamParser
+
+_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_LABEL_SEPARATORS = re.compile(r'[,\s]+')
+
+
+class SalvagedAnswer:
+    """What could be recovered from a generation answer that failed to parse.
+
+    ``test_cases`` are the usable cases (``normalized`` of them needed local
+    fixes), ``broken`` holds ``(data or raw text, error)`` for cases only the
+    model can repair, and ``complete`` tells whether the array was closed.
+    """
+
+    def __init__(self):
+        self.test_cases: List[TestCase] = []
+        self.broken: List[Tuple[Any, str]] = []
+        self.normalized = 0
+        self.complete = False
+
+    def add(self, data: Any) -> None:
+        """Convert one decoded element, sorting it into usable or broken."""
+        try:
+            test_case, normalized = coerce_test_case(data)
+        except (TypeError, ValueError) as e:
+            self.broken.append((data, str(e)))
+            return
+        self.test_cases.append(test_case)
+        self.normalized += normalized
+
+
+def strip_fence(content: str) -> str:
+    """Drop a Markdown code fence around a JSON answer."""
+    return _FENCE.sub('', content or '')
+
+
+def decode_lenient(text: str) -> Any:
+    """Decode JSON, retrying once with trailing commas removed."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r'\1', text))
+
+
+def _enum_member(enum_class: Any, value: Any) -> Any:
+    """Match an enum value case- and separator-insensitively, or None."""
+    wanted = re.sub(r'[\s_-]+', '', str(value)).lower()
+    for member in enum_class:
+        if re.sub(r'[\s_-]+', '', member.value).lower() == wanted:
+            return member.value
+    return None
+
+
+def normalize_test_case_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fix the shape mistakes models commonly make in a test case object.
+
+    Only types are coerced (strings to lists, plain-text steps to step
+    objects, enum spellings); no content is invented, so a case missing a
+    required field still fails validation and goes back to the model.
+    """
+    data = {key: value for key, value in data.items() if value is not None}
+    if isinstance(data.get('preconditions'), str):
+        data['preconditions'] = [data['preconditions']] if data['preconditions'].strip() else []
+    if isinstance(data.get('labels'), str):
+        # Jira labels cannot contain spaces, so "smoke, login" is two labels
+        data['labels'] = [label for label in _LABEL_SEPARATORS.split(data['labels']) if label]
+    steps = data.get('test_steps')
+    if isinstance(steps, list):
+        data['test_steps'] = [
+            {'step_number': number, 'action': step, 'expected_result': ''} if isinstance(step, str)
+            else {**step, 'step_number': step.get('step_number', number)} if isinstance(step, dict)
+            else step
+            for number, step in enumerate(steps, 1)
+        ]
+    if 'test_data' in data and not isinstance(data['test_data'], str):
+        data['test_data'] = json.dumps(data['test_data'])
+    for field, enum_class in (('priority', Priority), ('test_type', TestType)):
+        if field in data:
+            member = _enum_member(enum_class, data[field])
+            if member is None:
+                # An unknown value falls back to the model default
+                del data[field]
+            else:
+                data[field] = member
+    return data
+
+
+def coerce_test_case(data: Any) -> Tuple[TestCase, bool]:
+    """Build a ``TestCase``, normalizing the data if it fails as given.
+
+    Returns the case and whether normalization was needed; raises
+    ``ValueError`` (pydantic's ``ValidationError``) or ``TypeError`` when
+    the data cannot be used.
+    """
+    if not isinstance(data, dict):
+        raise TypeError(f"Expected a test case object, got {type(data).__name__}")
+    try:
+        return TestCase(**data), False
+    except ValueError:
+        return TestCase(**normalize_test_case_data(data)), True
+
+
+def salvage_rejected(answer: SalvagedAnswer, rejected: List[str]) -> None:
+    """Add the elements a stream parser could not decode to ``answer``."""
+    for text in rejected:
+        try:
+            answer.add(decode_lenient(text))
+        except json.JSONDecodeError as e:
+            answer.broken.append((text, f"Invalid JSON: {e}"))
+
+
+def salvage_test_cases(content: str) -> SalvagedAnswer:
+    """Recover every usable test case from a model answer.
+
+    The whole answer is decoded first, leniently and without a code fence,
+    which also accepts a single object or an object wrapping the array.
+    Otherwise ``JsonArrayStreamParser`` pulls out each complete element of
+    a truncated or malformed array.
+    """
+    answer = SalvagedAnswer()
+    try:
+        data = decode_lenient(strip_fence(content))
+    except json.JSONDecodeError:
+        parser = JsonArrayStreamParser()
+        for element in parser.feed(content or ''):
+            answer.add(element)
+        salvage_rejected(answer, parser.rejected)
+        answer.complete = parser.complete
+        return answer
+
+    if isinstance(data, dict):
+        wrapped = [value for value in data.values() if isinstance(value, list)]
+        data = [data] if 'title' in data or not wrapped else wrapped[0]
+    if isinstance(data, list):
+        for element in data:
+            answer.add(element)
+    answer.complete = True
+    return answer
@@ -1,147 +1,748 @@
 import asyncio
+import inspect
 import logging
-from typing import List, Optional, Dict, Any
-from ai_service import AzureAIService
-from jira_service import JiraService
-from models import UserStory, TestCase, JiraIssue
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from models import UserStory, TestCase
 from config import settings
+from metrics import RunSummary, finish_story, record_validation_skipped, story_scope
+from prevalidation import local_verdict
+from formatting import format_test_case_description
+from exporters import TestCaseExporter, create_exporter
+from work_journal import WorkJournal, fingerprint_label, story_fingerprint
+from coverage import (
+    CHANGED_ISSUE_FIELDS, STORY_COVERAGE_FIELDS, TEST_COVERAGE_FIELDS,
+    CoverageIndex, load_snapshot, save_snapshot, updated_since_clause
+)
+
+if TYPE_CHECKING:
+    from ai_service import AzureAIService
+    from dedup import DuplicateDetector, DuplicateEntry
+    from jira_service import JiraService
 
 logger = logging.getLogger(__name__)
 
+# Existing issues hashed per signature batch when seeding the duplicate index
+DEDUP_INDEX_BATCH = 1000
+
 class TestCaseGenerator:
     def __init__(self):
-        self.ai_service = AzureAIService()
-        self.jira_service = JiraService()
-        
-    async def process_user_story(self, user_story: UserStory, parent_story_key: Optional[str] = None) -> Dict[str, Any]:
-        """Process a user story and generate test cases in Jira."""
-        results = {
-            'user_story': user_story.title,
+        # Service clients (and their SDKs) and the export file are created on
+        # first use, so a coverage report never loads the Azure SDK, a file
+        # export never loads the Jira client and only filing opens the file
+        self._ai_service: Optional["AzureAIService"] = None
+        self._jira_service: Optional["JiraService"] = None
+        self._jira_writer: Optional[Any] = None
+        self._services_lock = threading.Lock()
+        self.journal: Optional[WorkJournal] = WorkJournal(settings.journal_path) if settings.journal_enabled else None
+        self._exporter: Optional[TestCaseExporter] = None
+        self._exporter_loaded = False
+        # Near-duplicate index, built by the first writer that needs it
+        self._duplicates = None
+        self._duplicates_loaded = False
+        self._duplicates_lock = threading.Lock()
+
+    @property
+    def ai_service(self) -> "AzureAIService":
+        """The Azure AI client, created on first use."""
+        with self._services_lock:
+            if self._ai_service is None:
+                from ai_service import AzureAIService
+                self._ai_service = AzureAIService()
+            return self._ai_service
+
+    @property
+    def jira_service(self) -> "JiraService":
+        """The synchronous Jira client, created on first use."""
+        with self._services_lock:
+            if self._jira_service is None:
+                from jira_service import JiraService
+                self._jira_service = JiraService()
+            return self._jira_service
+
+    @property
+    def exporter(self) -> Optional[TestCaseExporter]:
+        """The bulk-import file replacing the Jira API as the output sink.
+
+        Opened (and truncated) on first use; None for the ``jira`` sink.
+        """
+        with self._services_lock:
+            if not self._exporter_loaded:
+                self._exporter = create_exporter(settings.output_sink, settings.export_path)
+                self._exporter_loaded = True
+            return self._exporter
+
+    @property
+    def jira_writer(self) -> Any:
+        """The client issues are written through.
+
+        The pooled ``AsyncJiraService`` when ``jira_async`` is set, else
+        the synchronous client; reads (coverage, duplicate seeding) always
+        use the synchronous one.
+        """
+        if self._jira_writer is None:
+            if settings.jira_async:
+                from async_jira_service import AsyncJiraService
+                self._jira_writer = AsyncJiraService()
+            else:
+                self._jira_writer = self.jira_service
+        return self._jira_writer
+
+    async def close(self) -> None:
+        """Release the network resources held by the underlying services."""
+        if self._ai_service is not None:
+            await self._ai_service.close()
+        if self._jira_writer is not None and self._jira_writer is not self._jira_service:
+            await self._jira_writer.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self._exporter is not None:
+            self._exporter.close()
+
+    async def __aenter__(self) -> "TestCaseGenerator":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def _new_result(self, story_title: str) -> Dict[str, Any]:
+        """Return an empty per-story result record."""
+        return {
+            'user_story': story_title,
             'generated_test_cases': 0,
             'created_jira_issues': 0,
+            'existing_jira_issues': 0,
             'failed_issues': 0,
             'test_case_keys': [],
+            'duplicate_test_cases': [],
+            'exported_test_cases': 0,
             'errors': []
         }
-        
+
+    def _story_fingerprint(self, user_story: UserStory, parent_story_key: Optional[str]) -> Optional[str]:
+        """Return the journal fingerprint for a story, or None without a journal."""
+        return story_fingerprint(user_story, parent_story_key) if self.journal is not None else None
+
+    async def _validate_test_cases(self, test_cases: List[TestCase], concurrency: Optional[int] = None,
+                                   story_fp: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Validate test cases in parallel, returning verdicts in input order.
+
+        Verdicts already in the journal are reused instead of re-validating,
+        and cases the local rules can decide never reach the model. With
+        ``validation_batching`` enabled the remaining cases are reviewed in a
+        few batched requests rather than one request per case.
+        """
+        recorded = self.journal.get_validations(story_fp) if story_fp else {}
+        if settings.validation_batching:
+            # Settle the clear-cut cases first so only the rest share a batch
+            pending = []
+            for index, test_case in enumerate(test_cases):
+                if index in recorded:
+                    continue
+                validation = self._local_validation(test_case)
+                if validation is not None:
+                    recorded[index] = self._accept_validation(test_case, validation, story_fp, index)
+                else:
+                    pending.append(index)
+            if len(pending) > 1:
+                verdicts = await self.ai_service.validate_test_cases_batch([test_cases[i] for i in pending])
+                for index, validation in zip(pending, verdicts):
+                    recorded[index] = self._accept_validation(test_cases[index], validation, story_fp, index)
+                return [recorded[index] for index in range(len(test_cases))]
+
+        semaphore = asyncio.Semaphore(concurrency or settings.validation_concurrency)
+
+        async def validate(index: int, test_case: TestCase) -> Dict[str, Any]:
+            if index in recorded:
+                return recorded[index]
+            return await self._validate_one(test_case, semaphore, story_fp, index)
+
+        # gather() preserves argument order, so verdicts line up with cases
+        return await asyncio.gather(*(validate(i, tc) for i, tc in enumerate(test_cases)))
+
+    async def _validate_one(self, test_case: TestCase, semaphore: asyncio.Semaphore,
+                            story_fp: Optional[str] = None, index: int = 0) -> Dict[str, Any]:
+        """Validate one test case: by the local rules when they can decide it,
+        else by the model under ``semaphore``; the verdict is logged and
+        journalled by ``_accept_validation``."""
+        validation = self._local_validation(test_case)
+        if validation is None:
+            async with semaphore:
+                validation = await self.ai_service.validate_test_case(test_case)
+        return self._accept_validation(test_case, validation, story_fp, index)
+
+    def _local_validation(self, test_case: TestCase) -> Optional[Dict[str, Any]]:
+        """Return the rule-based verdict for a clear-cut case, else None."""
+        if not settings.prevalidation_enabled:
+            return None
+        validation = local_verdict(test_case, settings.prevalidation_accept_score,
+                                   settings.prevalidation_reject_score)
+        if validation is not None:
+            record_validation_skipped('accept' if validation['is_valid'] else 'reject')
+        return validation
+
+    def _accept_validation(self, test_case: TestCase, validation: Dict[str, Any],
+                           story_fp: Optional[str] = None, index: int = 0) -> Dict[str, Any]:
+        """Log a low-quality verdict and record it in the journal."""
+        if validation.get('quality_score', 0) < 6:
+            logger.warning(f"Low quality test case: {test_case.title}")
+            logger.warning(f"Feedback: {validation.get('feedback')}")
+        if story_fp:
+            self.journal.record_validation(story_fp, index, validation)
+        return validation
+
+    async def _generate_and_validate(self, user_story: UserStory, results: Dict[str, Any],
+                                     validation_concurrency: Optional[int] = None,
+                                     story_fp: Optional[str] = None,
+                                     generated: Optional[List[TestCase]] = None) -> List[TestCase]:
+        """Run the AI stages for a story; returns an empty list on failure.
+
+        When the journal already holds the story's test cases they are reused
+        and only the steps that did not finish are repeated. ``generated``
+        supplies test cases already produced by a packed request.
+        """
         try:
-            # Generate test cases using AI
-            logger.info(f"Generating test cases for: {user_story.title}")
-            test_cases = await self.ai_service.generate_test_cases(user_story)
+            test_cases = self.journal.get_test_cases(story_fp) if story_fp else None
+            if test_cases is not None:
+                logger.info(f"Resuming from journal: {user_story.title}")
+            elif generated is not None:
+                test_cases = generated
+                if story_fp:
+                    self.journal.record_test_cases(story_fp, user_story.title, test_cases)
+            else:
+                logger.info(f"Generating test cases for: {user_story.title}")
+                test_cases = await self.ai_service.generate_test_cases(user_story)
+                if story_fp:
+                    self.journal.record_test_cases(story_fp, user_story.title, test_cases)
             results['generated_test_cases'] = len(test_cases)
-            
+
             if not test_cases:
                 results['errors'].append("No test cases generated")
-                return results
-            
-            # Create Jira issues for each test case
-            for test_case in test_cases:
+                return []
+
+            await self._validate_test_cases(test_cases, validation_concurrency, story_fp)
+            return test_cases
+
+        except Exception as e:
+            results['errors'].append(f"Error processing user story: {str(e)}")
+            logger.error(f"Error processing user story: {e}")
+            return []
+
+    async def _jira(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Call a Jira writer method, awaiting it or running it in a thread.
+
+        ``AsyncJiraService`` methods are coroutines; the synchronous
+        ``JiraService`` ones block, so they go to a worker thread to keep
+        the event loop free for other stories.
+        """
+        func = getattr(self.jira_writer, method)
+        if inspect.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def _file_test_cases(self, test_cases: List[TestCase], parent_story_key: Optional[str],
+                               story_fp: Optional[str] = None, start_index: int = 0) -> List[Dict[str, Optional[str]]]:
+        """Create Jira issues for test cases, skipping ones that already exist.
+
+        With a journal, each case is tagged with its fingerprint label and
+        its slot is marked attempted before the create. Slots with a recorded
+        key, or attempted slots whose label is already on an issue in Jira
+        (the run died before recording the key), are reported as
+        ``existing`` instead of being created again; only those attempted
+        slots cost a search. Returns one outcome per test case, in order.
+
+        With an export sink the cases are appended to the export file
+        instead; Jira is not contacted.
+        """
+        if self.exporter is not None:
+            return await asyncio.to_thread(self.exporter.write, test_cases, parent_story_key)
+        if not story_fp:
+            return await self._create_unique_issues(test_cases, parent_story_key)
+
+        indices = range(start_index, start_index + len(test_cases))
+        labels = {index: fingerprint_label(story_fp, index) for index in indices}
+        existing = self.journal.get_jira_keys(story_fp)
+
+        attempted = self.journal.get_unconfirmed_attempts(story_fp)
+        pending = [index for index in indices if index in attempted]
+        if pending:
+            found = await self._jira('find_issues_by_labels', [labels[index] for index in pending])
+            for index in pending:
+                if labels[index] in found:
+                    existing[index] = found[labels[index]]
+                    self.journal.record_jira_key(story_fp, index, existing[index])
+
+        to_create = [index for index in indices if index not in existing]
+        if len(to_create) < len(test_cases):
+            logger.info(f"Skipping {len(test_cases) - len(to_create)} test cases already filed in Jira")
+
+        created: Dict[int, Dict[str, Optional[str]]] = {}
+        if to_create:
+            labelled = [
+                test_cases[index - start_index].model_copy(
+                    update={'labels': test_cases[index - start_index].labels + [labels[index]]}
+                )
+                for index in to_create
+            ]
+            self.journal.mark_attempted(story_fp, to_create)
+            outcomes = await self._create_unique_issues(labelled, parent_story_key)
+            for index, outcome in zip(to_create, outcomes):
+                created[index] = outcome
+                if outcome['key']:
+                    self.journal.record_jira_key(story_fp, index, outcome['key'])
+
+        return [
+            created[index] if index in created else {'key': existing[index], 'error': None, 'existing': True}
+            for index in indices
+        ]
+
+    async def _create_unique_issues(self, test_cases: List[TestCase], parent_story_key: Optional[str],
+                                    refile: bool = True) -> List[Dict[str, Optional[str]]]:
+        """Bulk-create test issues, diverting near-duplicates first.
+
+        Cases close to one already filed in the project, in this run or
+        earlier in the same batch are not created. Depending on
+        ``dedup_action`` they are skipped, or the existing test is linked
+        to the parent story (``link``) and also given the duplicate's labels
+        (``merge``). Their outcome carries ``duplicate_of`` instead of a key.
+
+        A duplicate whose original could not be filed is claimed again once
+        (``refile``), so it is filed itself or matched to another issue; if
+        that fails too it is reported as a failure rather than dropped.
+        """
+        # Seeding the index pages through the project and hashing is CPU work
+        detector = await asyncio.to_thread(self._duplicate_detector) if settings.dedup_enabled else None
+        if detector is None:
+            return await self._jira('create_test_issues_bulk', test_cases, parent_story_key, "Tests")
+
+        from dedup import issue_text
+        claims = await asyncio.to_thread(detector.claim, [
+            issue_text(test_case.title, format_test_case_description(test_case))
+            for test_case in test_cases
+        ])
+        unique = [index for index, (duplicate, _) in enumerate(claims) if not duplicate]
+        outcomes: List[Optional[Dict[str, Optional[str]]]] = [None] * len(test_cases)
+        try:
+            created = await self._jira(
+                'create_test_issues_bulk', [test_cases[index] for index in unique], parent_story_key, "Tests"
+            ) if unique else []
+        except Exception:
+            for index in unique:
+                detector.release(claims[index][1])
+            raise
+        for index, outcome in zip(unique, created):
+            outcomes[index] = outcome
+            entry = claims[index][1]
+            if outcome['key']:
+                if parent_story_key:
+                    entry.linked_keys.add(parent_story_key)
+                entry.resolve(outcome['key'])
+            else:
+                detector.release(entry)
+
+        duplicates = [index for index, (duplicate, _) in enumerate(claims) if duplicate]
+        if duplicates:
+            logger.info(f"Found {len(duplicates)} near-duplicate test cases ({settings.dedup_action})")
+        orphaned = []
+        for index in duplicates:
+            outcomes[index] = await self._handle_duplicate(test_cases[index], claims[index][1], parent_story_key)
+            if outcomes[index] is None:
+                orphaned.append(index)
+
+        if orphaned and refile:
+            logger.info(f"Refiling {len(orphaned)} near-duplicates whose original was not filed")
+            refiled = await self._create_unique_issues([test_cases[index] for index in orphaned],
+                                                       parent_story_key, refile=False)
+            for index, outcome in zip(orphaned, refiled):
+                outcomes[index] = outcome
+        elif orphaned:
+            for index in orphaned:
+                outcomes[index] = {'key': None, 'error': "Near-duplicate of a test case that was not filed"}
+        return outcomes
+
+    async def _handle_duplicate(self, test_case: TestCase, entry: "DuplicateEntry",
+                                parent_story_key: Optional[str]) -> Optional[Dict[str, Optional[str]]]:
+        """Apply ``dedup_action`` to a duplicate of ``entry``'s issue.
+
+        Returns None when the original was not filed (its create failed or
+        did not finish within ``dedup_wait_seconds``).
+        """
+        # The original may still be being created by another writer
+        key = await asyncio.to_thread(entry.wait, settings.dedup_wait_seconds)
+        if key is None:
+            return None
+        action = settings.dedup_action
+        if action in ('link', 'merge'):
+            if parent_story_key and parent_story_key not in entry.linked_keys:
+                entry.linked_keys.add(parent_story_key)
+                await self._jira('link_issues', key, parent_story_key, "Tests")
+            if action == 'merge' and test_case.labels:
+                await self._jira('add_labels', key, test_case.labels)
+        return {'key': None, 'error': None, 'duplicate_of': key}
+
+    def _duplicate_detector(self) -> Optional["DuplicateDetector"]:
+        """Return the shared near-duplicate index, building it on first use.
+
+        The index is seeded with the project's existing Test issues when
+        ``dedup_include_existing`` is set. Returns None when detection is
+        disabled or NumPy is not installed.
+        """
+        if not settings.dedup_enabled:
+            return None
+        with self._duplicates_lock:
+            if self._duplicates_loaded:
+                return self._duplicates
+            self._duplicates_loaded = True
+            try:
+                # numpy is only needed when detection is enabled
+                from dedup import DuplicateDetector, issue_text
+            except ImportError:
+                logger.warning("Near-duplicate detection needs numpy; filing without it")
+                return None
+
+            detector = DuplicateDetector(settings.dedup_threshold, settings.dedup_num_perm,
+                                         settings.dedup_bands, settings.dedup_shingle_size)
+            if settings.dedup_include_existing:
+                jql = f"project = {settings.jira_project_key} AND issuetype = Test ORDER BY key"
+                batch = []
                 try:
-                    # Validate test case quality
-                    validation = await self.ai_service.validate_test_case(test_case)
-                    
-                    if validation.get('quality_score', 0) < 6:
-                        logger.warning(f"Low quality test case: {test_case.title}")
-                        logger.warning(f"Feedback: {validation.get('feedback')}")
-                    
-                    # Create Jira issue
-                    issue_key = self.jira_service.create_test_issue(test_case, parent_story_key)
-                    
-                    if issue_key:
-                        results['test_case_keys'].append(issue_key)
-                        results['created_jira_issues'] += 1
-                        
-                        # Link to parent story if provided
-                        if parent_story_key:
-                            self.jira_service.link_issues(issue_key, parent_story_key, "Tests")
-                            
-                    else:
-                        results['failed_issues'] += 1
-                        results['errors'].append(f"Failed to create issue for: {test_case.title}")
-                        
+                    for issue in self.jira_service.iter_issues(jql, fields=['summary', 'description']):
+                        fields = issue.get('fields') or {}
+                        batch.append((issue['key'], issue_text(fields.get('summary') or '',
+                                                               fields.get('description') or '')))
+                        if len(batch) >= DEDUP_INDEX_BATCH:
+                            detector.add(batch)
+                            batch = []
+                    detector.add(batch)
                 except Exception as e:
-                    results['failed_issues'] += 1
-                    results['errors'].append(f"Error processing test case '{test_case.title}': {str(e)}")
-                    
-            logger.info(f"Completed processing. Created {results['created_jira_issues']} test issues.")
-            
+                    logger.warning(f"Could not load existing test issues for duplicate detection: {e}")
+                logger.info(f"Indexed {detector.size} existing test issues for duplicate detection")
+            self._duplicates = detector
+            return detector
+
+    async def _write_test_cases(self, test_cases: List[TestCase], parent_story_key: Optional[str],
+                                results: Dict[str, Any], story_fp: Optional[str] = None) -> None:
+        """Create (and link) Jira issues for validated test cases.
+
+        Issues and their links to the parent story are created through the
+        bulk endpoint, without blocking the event loop (see ``_jira``).
+        """
+        try:
+            outcomes = await self._file_test_cases(test_cases, parent_story_key, story_fp)
+        except Exception as e:
+            results['failed_issues'] += len(test_cases)
+            results['errors'].append(f"Error creating test issues: {str(e)}")
+            return
+
+        self._record_outcomes(test_cases, outcomes, results)
+        logger.info(f"Completed processing. Created {results['created_jira_issues']} test issues.")
+
+    def _record_outcomes(self, test_cases: List[TestCase], outcomes: List[Dict[str, Optional[str]]],
+                         results: Dict[str, Any]) -> None:
+        """Add per-test-case Jira creation outcomes to a story's results."""
+        for test_case, outcome in zip(test_cases, outcomes):
+            if outcome.get('exported'):
+                results['exported_test_cases'] += 1
+            elif 'duplicate_of' in outcome:
+                results['duplicate_test_cases'].append({'title': test_case.title,
+                                                        'duplicate_of': outcome['duplicate_of']})
+            elif outcome['key']:
+                results['test_case_keys'].append(outcome['key'])
+                results['existing_jira_issues' if outcome.get('existing') else 'created_jira_issues'] += 1
+            else:
+                results['failed_issues'] += 1
+                results['errors'].append(f"Failed to create issue for: {test_case.title} ({outcome['error']})")
+
+    async def process_user_story(self, user_story: UserStory, parent_story_key: Optional[str] = None,
+                                 stream: Optional[bool] = None) -> Dict[str, Any]:
+        """Process a user story and generate test cases in Jira.
+
+        With ``stream`` (default: the ``STREAM_GENERATION`` setting) each test
+        case is validated and filed as soon as the model has emitted it. A
+        story whose generation is already in the journal is resumed from
+        there rather than streamed again.
+
+        The result's ``metrics`` entry summarises wall time, calls, retries,
+        tokens and cost per stage for this story.
+        """
+        results = self._new_result(user_story.title)
+        story_fp = self._story_fingerprint(user_story, parent_story_key)
+        resumable = story_fp is not None and self.journal.get_test_cases(story_fp) is not None
+        summary = RunSummary()
+        with story_scope(summary):
+            if (settings.stream_generation if stream is None else stream) and not resumable:
+                await self._process_user_story_streaming(user_story, parent_story_key, results, story_fp)
+            else:
+                test_cases = await self._generate_and_validate(user_story, results, story_fp=story_fp)
+                if test_cases:
+                    await self._write_test_cases(test_cases, parent_story_key, results, story_fp)
+        results['metrics'] = finish_story(summary)
+        return results
+
+    async def _process_user_story_streaming(self, user_story: UserStory, parent_story_key: Optional[str],
+                                            results: Dict[str, Any], story_fp: Optional[str] = None) -> None:
+        """Validate and file each streamed test case while generation continues."""
+        semaphore = asyncio.Semaphore(settings.validation_concurrency)
+
+        async def validate_and_write(index: int, test_case: TestCase) -> Dict[str, Optional[str]]:
+            await self._validate_one(test_case, semaphore, story_fp, index)
+            # A one-element bulk request still creates the parent link in the
+            # same round-trip
+            outcomes = await self._file_test_cases([test_case], parent_story_key, story_fp, index)
+            return outcomes[0]
+
+        test_cases: List[TestCase] = []
+        tasks: List[asyncio.Task] = []
+        try:
+            logger.info(f"Streaming test cases for: {user_story.title}")
+            async for test_case in self.ai_service.generate_test_cases_stream(user_story):
+                if story_fp:
+                    self.journal.record_test_case(story_fp, user_story.title, len(test_cases), test_case)
+                tasks.append(asyncio.create_task(validate_and_write(len(test_cases), test_case)))
+                test_cases.append(test_case)
+            if story_fp:
+                self.journal.mark_generation_complete(story_fp, user_story.title)
         except Exception as e:
+            # Cases already received are still filed below
             results['errors'].append(f"Error processing user story: {str(e)}")
             logger.error(f"Error processing user story: {e}")
-            
+
+        results['generated_test_cases'] = len(test_cases)
+        if not test_cases:
+            if not results['errors']:
+                results['errors'].append("No test cases generated")
+            return
+
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        self._record_outcomes(test_cases, [
+            outcome if isinstance(outcome, dict) else {'key': None, 'error': str(outcome)}
+            for outcome in outcomes
+        ], results)
+        logger.info(f"Completed processing. Created {results['created_jira_issues']} test issues.")
+
+    async def batch_process_stories(self, stories_data: List[Dict[str, Any]],
+                                    story_concurrency: Optional[int] = None,
+                                    validation_concurrency: Optional[int] = None,
+                                    jira_writer_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Process multiple user stories through a bounded-concurrency pipeline.
+
+        See ``process_story_stream`` for the pipeline. Results are returned
+        in the same order as ``stories_data``.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(stories_data)
+
+        async def entries() -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+            for entry in enumerate(stories_data):
+                yield entry
+
+        async def collect(index: int, story_results: Dict[str, Any]) -> None:
+            results[index] = story_results
+
+        await self.process_story_stream(entries(), collect, story_concurrency,
+                                        validation_concurrency, jira_writer_concurrency)
         return results
 
-    async def batch_process_stories(self, stories_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Process multiple user stories in batch."""
-        results = []
-        
-        for story_data in stories_data:
-            try:
-                user_story = UserStory(**story_data['story'])
-                parent_key = story_data.get('parent_key')
-                
-                result = await self.process_user_story(user_story, parent_key)
-                results.append(result)
-                
-                # Add delay to avoid rate limiting
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                error_result = {
-                    'user_story': story_data.get('story', {}).get('title', 'Unknown'),
-                    'errors': [f"Failed to process story: {str(e)}"],
-                    'generated_test_cases': 0,
-                    'created_jira_issues': 0,
-                    'failed_issues': 0,
-                    'test_case_keys': []
-                }
-                results.append(error_result)
-                
+    async def process_story_stream(self, entries: AsyncIterator[Tuple[Any, Dict[str, Any]]],
+                                   on_result: Callable[[Any, Dict[str, Any]], Awaitable[None]],
+                                   story_concurrency: Optional[int] = None,
+                                   validation_concurrency: Optional[int] = None,
+                                   jira_writer_concurrency: Optional[int] = None) -> None:
+        """Run the batch pipeline over a stream of ``(tag, story_data)`` entries.
+
+        Stage 1 (``story_concurrency`` workers) generates and validates test
+        cases, with up to ``validation_concurrency`` validations in flight per
+        story. Stage 2 (``jira_writer_concurrency`` workers) files the cases in
+        Jira. The stages are connected by bounded queues, so a slow Jira stage
+        stalls generation (and reading ``entries``) instead of buffering
+        unbounded work in memory. With ``story_packing`` enabled, consecutive
+        small stories are handed to a stage 1 worker together and generated
+        in a single request. ``on_result`` is awaited with each story's tag
+        and result as soon as the story is finished, in completion order. If
+        reading ``entries``, a stage or ``on_result`` raises, the rest of the
+        pipeline is cancelled and that first error is re-raised.
+        """
+        story_workers = max(1, story_concurrency or settings.story_concurrency)
+        writer_workers = max(1, jira_writer_concurrency or settings.jira_writer_concurrency)
+        queue_size = max(1, settings.pipeline_queue_size)
+
+        story_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        async def feed() -> None:
+            packer = None
+            if settings.story_packing:
+                from ai_service import StoryPacker
+                packer = StoryPacker()
+            async for tag, story_data in entries:
+                try:
+                    entry = (tag, UserStory(**story_data['story']), story_data.get('parent_key'))
+                except Exception as e:
+                    await on_result(tag, self._story_error_result(story_data, e))
+                    continue
+                for pack in packer.add(entry, entry[1]) if packer else [[entry]]:
+                    await story_queue.put(pack)
+            for pack in packer.flush() if packer else []:
+                await story_queue.put(pack)
+            # One sentinel per worker signals the end of the input
+            for _ in range(story_workers):
+                await story_queue.put(None)
+
+        async def process(tag: Any, user_story: UserStory, parent_key: Optional[str],
+                          story_fp: Optional[str], generated: Optional[List[TestCase]]) -> None:
+            story_results = self._new_result(user_story.title)
+            summary = RunSummary()
+            with story_scope(summary):
+                test_cases = await self._generate_and_validate(
+                    user_story, story_results, validation_concurrency, story_fp, generated
+                )
+            if test_cases:
+                await write_queue.put((tag, test_cases, parent_key, story_results, story_fp, summary))
+            else:
+                story_results['metrics'] = finish_story(summary)
+                await on_result(tag, story_results)
+
+        async def story_worker() -> None:
+            while True:
+                pack = await story_queue.get()
+                if pack is None:
+                    return
+                fingerprints = [self._story_fingerprint(user_story, parent_key)
+                                for _, user_story, parent_key in pack]
+                generated = await self._generate_pack([user_story for _, user_story, _ in pack], fingerprints)
+                await asyncio.gather(*(
+                    process(tag, user_story, parent_key, story_fp, story_generated)
+                    for (tag, user_story, parent_key), story_fp, story_generated
+                    in zip(pack, fingerprints, generated)
+                ))
+
+        async def writer_worker() -> None:
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    return
+                tag, test_cases, parent_key, story_results, story_fp, summary = item
+                with story_scope(summary):
+                    await self._write_test_cases(test_cases, parent_key, story_results, story_fp)
+                story_results['metrics'] = finish_story(summary)
+                await on_result(tag, story_results)
+
+        story_tasks = [asyncio.create_task(feed())] + [asyncio.create_task(story_worker())
+                                                       for _ in range(story_workers)]
+
+        async def close_writers() -> None:
+            await asyncio.gather(*story_tasks)
+            for _ in range(writer_workers):
+                await write_queue.put(None)
+
+        tasks = story_tasks + [asyncio.create_task(writer_worker()) for _ in range(writer_workers)]
+        tasks.append(asyncio.create_task(close_writers()))
+        try:
+            # The stages are supervised as one group: the first failure (e.g.
+            # ``on_result`` raising) cancels the rest, so no task is left
+            # blocked on a queue that nobody drains, and is re-raised
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _generate_pack(self, user_stories: List[UserStory],
+                             fingerprints: List[Optional[str]]) -> List[Optional[List[TestCase]]]:
+        """Generate a pack's test cases in one request where that helps.
+
+        Returns one entry per story: its test cases, or None when the story
+        should be generated on its own (single stories, journaled stories, or
+        a failed packed request). The packed call runs outside any story
+        scope, so its tokens count towards the global metrics only.
+        """
+        generated: List[Optional[List[TestCase]]] = [None] * len(user_stories)
+        pending = [position for position, story_fp in enumerate(fingerprints)
+                   if not (story_fp and self.journal.get_test_cases(story_fp) is not None)]
+        if len(pending) < 2:
+            return generated
+        logger.info(f"Generating test cases for {len(pending)} packed stories")
+        try:
+            packed = await self.ai_service.generate_test_cases_packed([user_stories[p] for p in pending])
+        except Exception as e:
+            logger.warning(f"Packed generation failed, generating stories individually: {e}")
+            return generated
+        for position, test_cases in zip(pending, packed):
+            generated[position] = test_cases
+        return generated
+
+    def _story_error_result(self, story_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Build the result record for a story that could not be processed."""
+        results = self._new_result(story_data.get('story', {}).get('title', 'Unknown'))
+        results['errors'].append(f"Failed to process story: {str(error)}")
         return results
 
-    def get_test_coverage_report(self, project_key: str) -> Dict[str, Any]:
-        """Generate a test coverage report for a project."""
+    def get_test_coverage_report(self, project_key: str, incremental: bool = False) -> Dict[str, Any]:
+        """Generate a test coverage report for a project.
+
+        Coverage is derived from each test's ``issuelinks`` and ``parent``
+        fields in one pass; see ``CoverageIndex``. With ``incremental=True``
+        the index saved by the previous run is loaded and only issues updated
+        since then are fetched; without a snapshot a full scan is done. The
+        fresh snapshot for the next incremental run is saved by incremental
+        runs, and by full scans only when ``coverage_snapshot_path`` is set.
+        """
         try:
-            # Get all stories in the project
-            stories_jql = f"project = {project_key} AND issuetype = Story"
-            stories = self.jira_service.get_project_issues(stories_jql)
-            
-            # Get all test issues
-            tests_jql = f"project = {project_key} AND issuetype = Test"
-            tests = self.jira_service.get_project_issues(tests_jql)
-            
-            # Calculate coverage metrics
-            total_stories = len(stories)
-            total_tests = len(tests)
-            
-            # Count stories with linked tests
-            stories_with_tests = 0
-            for story in stories:
-                story_key = story['key']
-                linked_tests = [t for t in tests if self._is_linked(story_key, t)]
-                if linked_tests:
-                    stories_with_tests += 1
-            
-            coverage_percentage = (stories_with_tests / total_stories * 100) if total_stories > 0 else 0
-            
-            report = {
-                'project_key': project_key,
-                'total_stories': total_stories,
-                'total_tests': total_tests,
-                'stories_with_tests': stories_with_tests,
-                'coverage_percentage': round(coverage_percentage, 2),
-                'tests_per_story_avg': round(total_tests / total_stories, 2) if total_stories > 0 else 0
-            }
-            
+            run_started = time.time()
+            snapshot = load_snapshot(project_key) if incremental else None
+            if snapshot is None:
+                index = self._build_coverage_index(project_key)
+            else:
+                index, last_run = snapshot
+                self._update_coverage_index(index, project_key, last_run)
+
+            report = index.report(project_key)
+            if incremental or settings.coverage_snapshot_path:
+                try:
+                    save_snapshot(project_key, index, run_started, report)
+                except OSError as e:
+                    logger.warning(f"Could not save coverage snapshot: {e}")
             return report
             
         except Exception as e:
             logger.error(f"Error generating coverage report: {e}")
             return {}
 
-    def _is_linked(self, story_key: str, test_issue: Dict[str, Any]) -> bool:
-        """Check if a test issue is linked to a story."""
-        # This is a simplified check - in practice, you'd check issue links
-        # For now, we'll check if the story key is mentioned in test description
-        description = test_issue.get('fields', {}).get('description', '')
-        return story_key in description
+    def _build_coverage_index(self, project_key: str) -> CoverageIndex:
+        """Build the coverage index from a full scan of stories and tests."""
+        index = CoverageIndex()
+
+        # Stream stories and tests page by page, downloading only the
+        # fields the index needs
+        stories_jql = f"project = {project_key} AND issuetype = Story ORDER BY key"
+        index.add_stories(self.jira_service.iter_issues(stories_jql, fields=STORY_COVERAGE_FIELDS))
+
+        tests_jql = f"project = {project_key} AND issuetype = Test ORDER BY key"
+        index.add_tests(self.jira_service.iter_issues(tests_jql, fields=TEST_COVERAGE_FIELDS))
+
+        return index
+
+    def _update_coverage_index(self, index: CoverageIndex, project_key: str, last_run: float) -> None:
+        """Apply changes made since ``last_run`` to a snapshot's index."""
+        scope = f"project = {project_key} AND issuetype in (Story, Test)"
+
+        changed_jql = f"{scope} AND {updated_since_clause(last_run)} ORDER BY key"
+        changed = 0
+        for issue in self.jira_service.iter_issues(changed_jql, fields=CHANGED_ISSUE_FIELDS):
+            index.apply_change(issue)
+            changed += 1
+
+        removed = 0
+        # A cheap count tells whether anything left the scope; only then
+        # are the current keys listed to find which issues were removed
+        if settings.coverage_reconcile_deletions and self.jira_service.count_issues(scope) != len(index.keys()):
+            live_keys = {issue['key'] for issue in
+                         self.jira_service.iter_issues(f"{scope} ORDER BY key", fields=['issuetype'])}
+            for key in index.keys() - live_keys:
+                index.remove_issue(key)
+                removed += 1
+
+        logger.info(f"Incremental coverage update: {changed} changed, {removed} removed issues")
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+from models import TestCase, UserStory
+
+# Prefix of the fingerprint labels put on every Test issue the tool creates
+FINGERPRINT_LABEL_PREFIX = "tcg"
+
+
+def story_fingerprint(user_story: UserStory, parent_key: Optional[str] = None) -> str:
+    """Return a stable fingerprint of a story's content and parent issue."""
+    payload = json.dumps({'story': user_story.model_dump(mode='json'), 'parent_key': parent_key},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint_label(story_fp: str, index: int) -> str:
+    """Return the Jira label identifying the ``index``-th test case of a story.
+
+    The label is derived from the story, not the generated text, so a rerun
+    recognises the slot even if the model would word the case differently.
+    """
+    return f"{FINGERPRINT_LABEL_PREFIX}-{story_fp}-{index}"
+
+
+class WorkJournal:
+    """Local SQLite journal of batch progress, used to resume failed runs.
+
+    For each story fingerprint it records the generated test cases, each
+    case's validation verdict and the Jira key it was filed under. A slot
+    is marked ``attempted`` before its issue is created, so only slots whose
+    create may have landed without the key being recorded need a Jira
+    search on rerun. Every step is committed as soon as it finishes, so a
+    rerun skips completed LLM calls and never files the same slot twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stories ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " generation_complete INTEGER NOT NULL DEFAULT 0,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS test_cases ("
+            " story_fingerprint TEXT NOT NULL,"
+            " idx INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " validation TEXT,"
+            " jira_key TEXT,"
+            " attempted INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (story_fingerprint, idx))"
+        )
+
+    def get_test_cases(self, story_fp: str) -> Optional[List[TestCase]]:
+        """Return a story's generated test cases if generation finished."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation_complete FROM stories WHERE fingerprint = ?", (story_fp,)
+            ).fetchone()
+            if not row or not row[0]:
+                return None
+            rows = self._conn.execute(
+                "SELECT data FROM test_cases WHERE story_fingerprint = ? ORDER BY idx", (story_fp,)
+            ).fetchall()
+        return [TestCase.model_validate_json(data) for (data,) in rows]
+
+    def record_test_case(self, story_fp: str, title: str, index: int, test_case: TestCase) -> None:
+        """Record one generated test case (keeping any verdict or key for the slot)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO stories (fingerprint, title, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET updated = excluded.updated",
+                (story_fp, title, time.time())
+            )
+            self._conn.execute(
+                "INSERT INTO test_cases (story_fingerprint, idx, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(story_fingerprint, idx) DO UPDATE SET data = excluded.data",
+                (story_fp, index, test_case.model_dump_json())
+            )
+
+    def record_test_cases(self, story_fp: str, title: str, test_cases: List[TestCase]) -> None:
+        """Record a story's complete generation output."""
+        for index, test_case in enumerate(test_cases):
+            self.record_test_case(story_fp, title, index, test_case)
+        self.mark_generation_complete(story_fp, title)
+
+    def mark_generation_complete(self, story_fp: str, title: str) -> None:
+        """Flag that every test case for the story has been recorded."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO stories (fingerprint, title, generation_complete, updated) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET generation_complete = 1, updated = excluded.updated",
+                (story_fp, title, time.time())
+            )
+
+    def get_validations(self, story_fp: str) -> Dict[int, Dict[str, Any]]:
+        """Return the recorded validation verdicts by test case index."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, validation FROM test_cases WHERE story_fingerprint = ? AND validation IS NOT NULL",
+                (story_fp,)
+            ).fetchall()
+        return {index: json.loads(validation) for index, validation in rows}
+
+    def record_validation(self, story_fp: str, index: int, validation: Dict[str, Any]) -> None:
+        """Record the validation verdict for a test case."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE test_cases SET validation = ? WHERE story_fingerprint = ? AND idx = ?",
+                (json.dumps(validation), story_fp, index)
+            )
+
+    def get_jira_keys(self, story_fp: str) -> Dict[int, str]:
+        """Return the Jira keys already filed for a story, by test case index."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, jira_key FROM test_cases WHERE story_fingerprint = ? AND jira_key IS NOT NULL",
+                (story_fp,)
+            ).fetchall()
+        return dict(rows)
+
+    def get_unconfirmed_attempts(self, story_fp: str) -> Set[int]:
+        """Return the slots whose create was attempted but has no recorded key."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx FROM test_cases WHERE story_fingerprint = ? AND attempted = 1 AND jira_key IS NULL",
+                (story_fp,)
+            ).fetchall()
+        return {index for (index,) in rows}
+
+    def mark_attempted(self, story_fp: str, indices: Iterable[int]) -> None:
+        """Record that issues are about to be created for these slots."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE test_cases SET attempted = 1 WHERE story_fingerprint = ? AND idx = ?",
+                [(story_fp, index) for index in indices]
+            )
+
+    def record_jira_key(self, story_fp: str, index: int, jira_key: str) -> None:
+        """Record the Jira issue created for a test case."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE test_cases SET jira_key = ? WHERE story_fingerprint = ? AND idx = ?",
+                (jira_key, story_fp, index)
+            )
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,238 @@
+"""Shared pytest setup: make the flat ``src`` modules and the benchmark fake
+servers importable and provide test case, story, Jira and chat completion
+fakes used across the test modules."""
+import os
+import sys
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+import pytest
+import models
+from config import settings
+from fake_servers import FaultProfile
+
+# Fault profile for fake servers that answer at once and never fail
+INSTANT = FaultProfile(latency_ms=0.0, jitter_ms=0.0)
+
+
+def build_test_case_data(title: str = 'Login with valid credentials', steps: int = 2,
+                         **overrides: Any) -> Dict[str, Any]:
+    """Return a test case payload that passes every local quality rule.
+
+    Steps are numbered ``Action n``/``Result n``; ``overrides`` replace
+    any field, including ``test_steps``.
+    """
+    data: Dict[str, Any] = {
+        'title': title,
+        'description': 'A registered user signs in with a correct password.',
+        'preconditions': ['User account exists'],
+        'test_steps': [{'step_number': n, 'action': f"Action {n}", 'expected_result': f"Result {n}"}
+                       for n in range(1, steps + 1)],
+        'expected_outcome': 'The dashboard is shown',
+        'test_data': 'user=alice',
+        'priority': 'High',
+        'test_type': 'Functional',
+        'labels': ['smoke', 'auth'],
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.fixture
+def make_test_case_data() -> Callable[..., Dict[str, Any]]:
+    """Factory for raw test case payloads; see ``build_test_case_data``."""
+    return build_test_case_data
+
+
+@pytest.fixture
+def make_test_case() -> Callable[..., models.TestCase]:
+    """Factory for ``TestCase`` objects built from ``build_test_case_data``."""
+    def make(title: str = 'Login with valid credentials', steps: int = 2, **overrides: Any) -> models.TestCase:
+        return models.TestCase(**build_test_case_data(title, steps, **overrides))
+    return make
+
+
+@pytest.fixture
+def make_story() -> Callable[..., models.UserStory]:
+    """Factory for ``UserStory`` objects with ``overrides`` applied."""
+    def make(title: str = 'User login', **overrides: Any) -> models.UserStory:
+        data: Dict[str, Any] = {'title': title, 'description': 'As a user I want to sign in'}
+        data.update(overrides)
+        return models.UserStory(**data)
+    return make
+
+
+class FakeJira:
+    """In-memory stand-in for the ``JiraService`` calls the generator makes.
+
+    Created issues get sequential ``TEST-n`` keys; ``labelled`` maps
+    labels to the keys ``find_issues_by_labels`` reports, and the next
+    ``failing_creates`` bulk requests fail every element.
+    """
+
+    def __init__(self):
+        self.labelled: Dict[str, str] = {}
+        self.failing_creates = 0
+        self.created: List[str] = []
+        self.bulk_calls: List[List[str]] = []
+        self.searches: List[List[str]] = []
+        self.links: List[tuple] = []
+
+    def create_test_issues_bulk(self, test_cases: List[models.TestCase], parent_key: Optional[str] = None,
+                                link_type: Optional[str] = "Tests") -> List[Dict[str, Optional[str]]]:
+        titles = [test_case.title for test_case in test_cases]
+        self.bulk_calls.append(titles)
+        if self.failing_creates:
+            self.failing_creates -= 1
+            return [{'key': None, 'error': 'HTTP 500'} for _ in titles]
+        outcomes = []
+        for title in titles:
+            self.created.append(title)
+            outcomes.append({'key': f"TEST-{len(self.created)}", 'error': None})
+        return outcomes
+
+    def find_issues_by_labels(self, labels: List[str]) -> Dict[str, str]:
+        self.searches.append(list(labels))
+        return {label: key for label, key in self.labelled.items() if label in labels}
+
+    def link_issues(self, source_key: str, target_key: str, link_type: str = "Tests") -> bool:
+        self.links.append((source_key, target_key, link_type))
+        return True
+
+    def add_labels(self, issue_key: str, labels: List[str]) -> bool:
+        return True
+
+
+@pytest.fixture
+def fake_jira(monkeypatch: Any) -> FakeJira:
+    """Make generators write to a ``FakeJira`` through the synchronous client."""
+    import jira_service
+    fake = FakeJira()
+    monkeypatch.setattr(jira_service, 'JiraService', lambda: fake)
+    monkeypatch.setattr(settings, 'jira_async', False)
+    monkeypatch.setattr(settings, 'output_sink', 'jira')
+    return fake
+
+
+@dataclass
+class FakeAnswer:
+    """A scripted completion: its text, ``finish_reason`` and, for streams,
+    an optional ``ConnectionError`` after ``fail_after`` characters and
+    whether the last update reports ``usage``."""
+
+    content: str
+    finish_reason: str = 'stop'
+    fail_after: Optional[int] = None
+    stream_usage: bool = False
+
+
+def fake_usage(content: str) -> SimpleNamespace:
+    """Return the ``usage`` block the fake reports: 100 prompt tokens plus the answer."""
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=len(content) // 4)
+    usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+    return usage
+
+
+class FakeStream:
+    """Async iterator of streamed chat completion updates for one answer."""
+
+    def __init__(self, answer: FakeAnswer, chunk_size: int = 16):
+        self.answer = answer
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        content = self.answer.content
+        end = len(content) if self.answer.fail_after is None else self.answer.fail_after
+        for start in range(0, end, self.chunk_size):
+            piece = content[start:min(start + self.chunk_size, end)]
+            last = start + self.chunk_size >= len(content)
+            usage = fake_usage(content) if last and self.answer.stream_usage else None
+            yield SimpleNamespace(usage=usage, choices=[SimpleNamespace(
+                delta=SimpleNamespace(content=piece), finish_reason=self.answer.finish_reason if last else None
+            )])
+        if self.answer.fail_after is not None:
+            raise ConnectionError("stream interrupted")
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class FakeChatClient:
+    """Stands in for ``ChatCompletionsClient`` with answers scripted per model.
+
+    Each entry in ``answers[model]`` is used once, in order: a string or
+    ``FakeAnswer`` is returned (streamed when requested) and an exception
+    is raised. Every request is kept in ``requests``.
+    """
+
+    def __init__(self):
+        self.answers: Dict[str, List[Any]] = {}
+        self.requests: List[Dict[str, Any]] = []
+
+    def script(self, model: str, *answers: Any) -> None:
+        """Queue ``answers`` for ``model``."""
+        self.answers.setdefault(model, []).extend(answers)
+
+    @property
+    def models(self) -> List[str]:
+        """The model of every request so far, in order."""
+        return [request['model'] for request in self.requests]
+
+    async def complete(self, messages: List[Any], model: str, stream: bool = False, **kwargs: Any) -> Any:
+        self.requests.append({'messages': messages, 'model': model, 'stream': stream, **kwargs})
+        answer = self.answers[model].pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        if isinstance(answer, str):
+            answer = FakeAnswer(answer)
+        if stream:
+            return FakeStream(answer)
+        return SimpleNamespace(usage=fake_usage(answer.content), choices=[SimpleNamespace(
+            message=SimpleNamespace(content=answer.content), finish_reason=answer.finish_reason
+        )])
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def ai_service(monkeypatch: Any) -> Any:
+    """An ``AzureAIService`` on a ``FakeChatClient``, without cache or rate limits.
+
+    The large model is ``large`` and the small one ``small``.
+    """
+    from ai_service import AzureAIService
+    from rate_limiter import RateLimiter
+    monkeypatch.setattr(settings, 'llm_cache_enabled', False)
+    monkeypatch.setattr(settings, 'azure_ai_model', 'large')
+    monkeypatch.setattr(settings, 'azure_ai_small_model', 'small')
+    service = AzureAIService()
+    service.client = FakeChatClient()
+    service.rate_limiter = RateLimiter('azure_ai', 0)
+    return service
+
+
+@pytest.fixture
+def start_server() -> Iterator[Callable[..., str]]:
+    """Start ``fake_servers`` stand-ins for the test and shut them down after.
+
+    Call it with a ``start_fake_*`` function and that function's arguments;
+    it returns the server's base URL.
+    """
+    servers = []
+
+    def start(starter: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        server, url = starter(*args, **kwargs)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
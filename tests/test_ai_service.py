@@ -0,0 +1,233 @@
+"""Unit tests for ``ai_service``: request planning helpers and the small
+model cascade, run against a scripted chat client."""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List
+import pytest
+from ai_service import StoryPacker, parse_verdict, plan_story_packs, plan_validation_chunks
+from config import settings
+from conftest import FakeAnswer, build_test_case_data
+from metrics import ESCALATIONS
+import models
+
+
+@pytest.fixture
+def story(make_story: Callable[..., models.UserStory]) -> Callable[[int], models.UserStory]:
+    """Factory for stories whose description is about ``size`` tokens long."""
+    return lambda size: make_story(description='x' * (size * 4))
+
+
+@pytest.fixture
+def case(make_test_case: Callable[..., models.TestCase]) -> Callable[[int], models.TestCase]:
+    """Factory for test cases whose JSON is at least ``size`` tokens long."""
+    return lambda size: make_test_case(description='x' * (size * 4))
+
+
+@pytest.fixture
+def packing(monkeypatch: Any) -> None:
+    """Pack up to three stories of at most 100 tokens within 250 tokens."""
+    monkeypatch.setattr(settings, 'packing_small_story_tokens', 100)
+    monkeypatch.setattr(settings, 'packing_token_budget', 250)
+    monkeypatch.setattr(settings, 'packing_max_stories', 3)
+
+
+def test_small_stories_are_packed_up_to_the_story_limit(packing: None,
+                                                        story: Callable[[int], models.UserStory]) -> None:
+    """Consecutive small stories share a pack until the count limit."""
+    assert plan_story_packs([story(10) for _ in range(5)]) == [[0, 1, 2], [3, 4]]
+
+
+def test_large_story_gets_its_own_request(packing: None, story: Callable[[int], models.UserStory]) -> None:
+    """A story over the small-story size is never packed."""
+    stories = [story(10), story(500), story(10)]
+    assert plan_story_packs(stories) == [[1], [0, 2]]
+
+
+def test_pack_is_closed_at_the_token_budget(packing: None, story: Callable[[int], models.UserStory]) -> None:
+    """A story that would overflow the budget starts a new pack."""
+    assert plan_story_packs([story(80), story(80), story(80)]) == [[0, 1], [2]]
+
+
+def test_every_story_is_planned_exactly_once(packing: None, story: Callable[[int], models.UserStory]) -> None:
+    """The plan is a partition of the input indices."""
+    stories = [story(size) for size in (5, 300, 80, 80, 80, 10, 700, 1)]
+    planned = sorted(index for pack in plan_story_packs(stories) for index in pack)
+    assert planned == list(range(len(stories)))
+
+
+def test_packer_hands_out_packs_as_soon_as_they_close(packing: None, story: Callable[[int], models.UserStory]) -> None:
+    """Streamed stories never wait behind a full pack or a large story."""
+    packer = StoryPacker()
+    assert packer.add('a', story(10)) == []
+    assert packer.add('big', story(500)) == [['big']]
+    assert packer.add('b', story(10)) == []
+    assert packer.add('c', story(10)) == [['a', 'b', 'c']]
+    assert packer.add('d', story(10)) == []
+    assert packer.flush() == [['d']]
+    assert packer.flush() == []
+
+
+@pytest.fixture
+def chunking(monkeypatch: Any) -> None:
+    """Review up to three cases within 1000 tokens per request."""
+    monkeypatch.setattr(settings, 'validation_batch_max_cases', 3)
+    monkeypatch.setattr(settings, 'validation_batch_token_budget', 1000)
+
+
+def test_validation_chunks_respect_the_case_limit(chunking: None, case: Callable[[int], models.TestCase]) -> None:
+    """Small cases are grouped in order, at most the case limit per chunk."""
+    assert plan_validation_chunks([case(10) for _ in range(7)]) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_validation_chunks_respect_the_token_budget(chunking: None, case: Callable[[int], models.TestCase]) -> None:
+    """A case that would overflow the budget starts a new chunk."""
+    assert plan_validation_chunks([case(300), case(300), case(300)]) == [[0, 1], [2]]
+
+
+def test_oversized_case_gets_a_chunk_of_its_own(chunking: None, case: Callable[[int], models.TestCase]) -> None:
+    """A case larger than the whole budget is still reviewed, alone."""
+    assert plan_validation_chunks([case(10), case(2000), case(10)]) == [[0], [1], [2]]
+
+
+def test_parse_verdict_accepts_a_scored_object() -> None:
+    """A JSON object with a numeric score is returned as is."""
+    assert parse_verdict('{"is_valid": true, "quality_score": 7.5}')['quality_score'] == 7.5
+
+
+@pytest.mark.parametrize('content', [
+    '[{"quality_score": 8}]',
+    '{"quality_score": "8"}',
+    '{"quality_score": true}',
+    '{"is_valid": true}',
+])
+def test_parse_verdict_rejects_non_verdicts(content: str) -> None:
+    """Anything without a numeric ``quality_score`` is a parse failure."""
+    with pytest.raises(ValueError):
+        parse_verdict(content)
+
+
+def test_parse_verdict_rejects_invalid_json() -> None:
+    """Malformed JSON raises (``JSONDecodeError`` is a ``ValueError``)."""
+    with pytest.raises(ValueError):
+        parse_verdict('{"quality_score": 8')
+
+
+def _escalations(operation: str, reason: str) -> float:
+    """Return the escalation counter for ``operation`` and ``reason``."""
+    return {labels: value for _, labels, value in ESCALATIONS.samples()}.get((operation, reason), 0)
+
+
+def _titles(test_cases: List[models.TestCase]) -> List[str]:
+    """Return the titles of ``test_cases`` in order."""
+    return [test_case.title for test_case in test_cases]
+
+
+async def _collect(stream: AsyncIterator[models.TestCase]) -> List[models.TestCase]:
+    """Drain a test case stream."""
+    return [test_case async for test_case in stream]
+
+
+CASES = [build_test_case_data('A'), build_test_case_data('B'), build_test_case_data('C')]
+
+
+@pytest.mark.parametrize('small_answer, reason', [
+    ('[{"title": "No steps", "description": "d", "expected_outcome": "ok"}]', 'low_score'),
+    ('Sorry, I cannot help with that', 'invalid_output'),
+    ('["not an object"]', 'invalid_output'),
+    (RuntimeError('deployment unavailable'), 'error'),
+], ids=['low_score', 'not_json', 'not_an_object', 'error'])
+def test_generation_escalates_to_the_large_model(ai_service: Any, make_story: Callable[..., models.UserStory],
+                                                 monkeypatch: Any, small_answer: Any, reason: str) -> None:
+    """The large model redoes a short story the small one could not settle."""
+    # Without recovery an unusable answer fails at once instead of being repaired
+    monkeypatch.setattr(settings, 'recovery_enabled', False)
+    ai_service.client.script('small', small_answer)
+    ai_service.client.script('large', json.dumps(CASES))
+    before = _escalations('generate', reason)
+
+    test_cases = asyncio.run(ai_service.generate_test_cases(make_story()))
+    assert _titles(test_cases) == ['A', 'B', 'C']
+    assert ai_service.client.models == ['small', 'large']
+    assert _escalations('generate', reason) == before + 1
+
+
+def test_acceptable_small_model_answer_is_kept(ai_service: Any, make_story: Callable[..., models.UserStory]) -> None:
+    """Cases that pass the local quality rules never reach the large model."""
+    ai_service.client.script('small', json.dumps(CASES))
+    assert _titles(asyncio.run(ai_service.generate_test_cases(make_story()))) == ['A', 'B', 'C']
+    assert ai_service.client.models == ['small']
+
+
+def test_low_score_verdict_is_reviewed_again(ai_service: Any, make_test_case: Callable[..., models.TestCase]) -> None:
+    """A small-model verdict below the threshold is replaced by the large model's."""
+    ai_service.client.script('small', '{"is_valid": false, "quality_score": 2}')
+    ai_service.client.script('large', '{"is_valid": true, "quality_score": 8}')
+    verdict: Dict[str, Any] = asyncio.run(ai_service.validate_test_case(make_test_case()))
+    assert verdict['quality_score'] == 8
+    assert ai_service.client.models == ['small', 'large']
+
+
+# Interrupted while the model was writing case B
+INTERRUPTED_AFTER_A = FakeAnswer(json.dumps(CASES), fail_after=len(json.dumps(CASES[:1])) + 10)
+
+
+@pytest.mark.parametrize('small_answer, reason, yielded', [
+    (json.dumps([CASES[0], build_test_case_data('B', test_steps=[]), CASES[2]]), 'low_score', ['A', 'C']),
+    (INTERRUPTED_AFTER_A, 'error', ['A']),
+    (RuntimeError('deployment unavailable'), 'error', []),
+], ids=['weak_case', 'interrupted', 'failed'])
+def test_stream_escalation_completes_the_yielded_cases(ai_service: Any, make_story: Callable[..., models.UserStory],
+                                                       small_answer: Any, reason: str, yielded: List[str]) -> None:
+    """After escalating, the large model supplies exactly the cases not yet yielded."""
+    ai_service.client.script('small', small_answer)
+    ai_service.client.script('large', json.dumps(CASES))
+    before = _escalations('generate_stream', reason)
+
+    titles = _titles(asyncio.run(_collect(ai_service.generate_test_cases_stream(make_story()))))
+    assert titles[:len(yielded)] == yielded
+    assert sorted(titles) == ['A', 'B', 'C']
+    assert _escalations('generate_stream', reason) == before + 1
+    large = ai_service.client.requests[-1]
+    assert large['model'] == 'large'
+    if yielded:
+        # The large model is asked only for the rest of the answer
+        assert not large['stream']
+        assert all(f"- {title}" in large['messages'][1].content for title in yielded)
+    else:
+        assert large['stream']
+
+
+def test_stream_without_an_array_is_decoded_whole(ai_service: Any, make_story: Callable[..., models.UserStory],
+                                                  tmp_path: Any) -> None:
+    """A lone object, whose steps look like the array, is salvaged rather than continued or cached."""
+    from llm_cache import CompletionCache
+    ai_service.cache = CompletionCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=0, max_entries=0)
+    story = make_story()
+    ai_service.client.script('large', '```json\n' + json.dumps(CASES[0]) + '\n```')
+
+    stream = ai_service.generate_test_cases_stream(story, cascade=False)
+    assert _titles(asyncio.run(_collect(stream))) == ['A']
+    assert len(ai_service.client.requests) == 1
+    key = CompletionCache.make_key('large', ai_service._build_generation_messages(story), 0.3, 4000, story)
+    assert ai_service.cache.get(key) is None
+    ai_service.cache.close()
+
+
+def test_unparseable_cached_stream_is_replaced(ai_service: Any, make_story: Callable[..., models.UserStory],
+                                               tmp_path: Any) -> None:
+    """A cached answer that no longer parses is dropped and streamed afresh."""
+    from llm_cache import CompletionCache
+    ai_service.cache = CompletionCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=0, max_entries=0)
+    story = make_story()
+    key = CompletionCache.make_key('large', ai_service._build_generation_messages(story), 0.3, 4000, story)
+    ai_service.cache.put(key, '[{"title": "stale schema"}]')
+    ai_service.client.script('large', json.dumps(CASES))
+
+    stream = ai_service.generate_test_cases_stream(story, cascade=False)
+    assert _titles(asyncio.run(_collect(stream))) == ['A', 'B', 'C']
+    assert json.loads(ai_service.cache.get(key)) == CASES
+    # The fresh answer is replayed without another request
+    stream = ai_service.generate_test_cases_stream(story, cascade=False)
+    assert _titles(asyncio.run(_collect(stream))) == ['A', 'B', 'C']
+    assert len(ai_service.client.requests) == 1
+    ai_service.cache.close()
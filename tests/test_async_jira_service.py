@@ -0,0 +1,134 @@
+"""Tests for the pooled async Jira client against the fake Jira server."""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pytest
+import models
+from async_jira_service import AsyncJiraService
+from config import settings
+from conftest import INSTANT
+from fake_servers import FaultProfile, JiraStore, start_fake_jira
+from rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def jira_settings(monkeypatch: Any) -> Callable[[str], None]:
+    """Point the Jira settings at a fake server URL, one issue per bulk request."""
+    def configure(url: str) -> None:
+        for name, value in {'jira_url': url, 'jira_email': 'test@example.com', 'jira_api_token': 'test',
+                            'jira_bulk_size': 1, 'max_retries': 2, 'retry_backoff_base': 0.001}.items():
+            monkeypatch.setattr(settings, name, value)
+    return configure
+
+
+def _service(concurrency: int = 4) -> AsyncJiraService:
+    """Return a client without rate limits."""
+    service = AsyncJiraService(concurrency)
+    service.rate_limiter = RateLimiter('jira', 0)
+    return service
+
+
+async def _create(service: AsyncJiraService, test_cases: List[models.TestCase]) -> List[Dict[str, Optional[str]]]:
+    """Bulk-create ``test_cases`` and close the session."""
+    async with service:
+        return await service.create_test_issues_bulk(test_cases)
+
+
+class SlowStore(JiraStore):
+    """Holds each create for a moment and records the most seen at once."""
+
+    def __init__(self):
+        super().__init__('TEST')
+        self.in_flight = 0
+        self.peak = 0
+        self._count_lock = threading.Lock()
+
+    def create(self, update: Dict[str, Any]) -> Dict[str, str]:
+        with self._count_lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.05)
+        with self._count_lock:
+            self.in_flight -= 1
+        return super().create(update)
+
+
+def test_concurrent_requests_are_capped(start_server: Callable[..., str], jira_settings: Callable[[str], None],
+                                        make_test_case: Callable[..., models.TestCase]) -> None:
+    """No more than ``concurrency`` requests reach Jira at once."""
+    store = SlowStore()
+    jira_settings(start_server(start_fake_jira, INSTANT, store))
+    test_cases = [make_test_case(f"Case {n}") for n in range(8)]
+
+    async def create() -> Tuple[List[Dict[str, Optional[str]]], int]:
+        async with _service(concurrency=2) as service:
+            outcomes = await service.create_test_issues_bulk(test_cases)
+            return outcomes, service._get_session().connector.limit
+
+    outcomes, pool_size = asyncio.run(create())
+    assert sorted(outcome['key'] for outcome in outcomes) == sorted(f"TEST-{n}" for n in range(1, 9))
+    assert (store.peak, pool_size) == (2, 2)
+
+
+def test_rejected_elements_become_per_item_errors(start_server: Callable[..., str],
+                                                  jira_settings: Callable[[str], None],
+                                                  make_test_case: Callable[..., models.TestCase],
+                                                  monkeypatch: Any) -> None:
+    """A 400 listing element errors fails only the rejected cases."""
+    store = JiraStore('TEST', priorities={'High'})
+    jira_settings(start_server(start_fake_jira, INSTANT, store))
+    monkeypatch.setattr(settings, 'jira_bulk_size', 3)
+    test_cases = [make_test_case('A', priority='Low'), make_test_case('B'), make_test_case('C', priority='Low')]
+
+    outcomes = asyncio.run(_create(_service(), test_cases))
+    error = "priority: Priority name 'Low' is not valid"
+    assert outcomes == [{'key': None, 'error': error}, {'key': 'TEST-1', 'error': None},
+                        {'key': None, 'error': error}]
+    # Every element rejected: Jira answers 400, still with element errors
+    outcomes = asyncio.run(_create(_service(), [make_test_case('D', priority='Low')]))
+    assert outcomes == [{'key': None, 'error': error}]
+
+
+@dataclass
+class FailingProfile(FaultProfile):
+    """Answers every request with ``status`` and records each request."""
+
+    status: int = 503
+    requests: List[Tuple[int, Dict[str, str]]] = field(default_factory=list)
+
+    def fault(self) -> Optional[Tuple[int, Dict[str, str]]]:
+        fault = (self.status, {'Retry-After': '0'} if self.status == 429 else {})
+        self.requests.append(fault)
+        return fault
+
+
+def test_creates_are_not_retried_after_a_response(start_server: Callable[..., str],
+                                                  jira_settings: Callable[[str], None],
+                                                  make_test_case: Callable[..., models.TestCase]) -> None:
+    """A 5xx to a create may hide a created issue, so only idempotent calls retry."""
+    profile = FailingProfile(latency_ms=0.0, jitter_ms=0.0)
+    jira_settings(start_server(start_fake_jira, profile, JiraStore('TEST')))
+
+    outcomes = asyncio.run(_create(_service(), [make_test_case()]))
+    assert outcomes[0]['key'] is None and 'HTTP 503' in outcomes[0]['error']
+    assert len(profile.requests) == 1
+
+    async def add_labels() -> bool:
+        async with _service() as service:
+            return await service.add_labels('TEST-1', ['smoke'])
+
+    assert asyncio.run(add_labels()) is False
+    assert len(profile.requests) == 1 + 3
+
+
+def test_throttled_creates_are_retried(start_server: Callable[..., str], jira_settings: Callable[[str], None],
+                                       make_test_case: Callable[..., models.TestCase]) -> None:
+    """A 429 proves nothing was created, so a create may retry it."""
+    profile = FailingProfile(latency_ms=0.0, jitter_ms=0.0, status=429)
+    jira_settings(start_server(start_fake_jira, profile, JiraStore('TEST')))
+
+    outcomes = asyncio.run(_create(_service(), [make_test_case()]))
+    assert 'HTTP 429' in outcomes[0]['error']
+    assert len(profile.requests) == 3
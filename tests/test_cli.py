@@ -0,0 +1,114 @@
+"""Unit tests for the JSONL command line: parsing, sharding and a worker run."""
+import io
+import json
+import queue
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+import pytest
+import cli
+import test_case_generator
+from config import settings
+from conftest import INSTANT
+from fake_servers import start_fake_azure_ai
+
+
+def test_parse_entry_accepts_entries_and_bare_stories() -> None:
+    """An entry is kept as is; a bare story is wrapped with its ``parent_key``."""
+    entry = {'story': {'title': 'Login'}, 'parent_key': 'TEST-1'}
+    assert cli.parse_entry(json.dumps(entry)) == entry
+    story = {'title': 'Login', 'parent_key': 'TEST-2'}
+    assert cli.parse_entry(json.dumps(story)) == {'story': story, 'parent_key': 'TEST-2'}
+    assert cli.parse_entry('{"title": "Login"}') == {'story': {'title': 'Login'}, 'parent_key': None}
+
+
+@pytest.mark.parametrize('line', ['[1, 2]', '"story"', '{"title": '])
+def test_parse_entry_rejects_non_objects(line: str) -> None:
+    """Anything but a JSON object is a ``ValueError``."""
+    with pytest.raises(ValueError):
+        cli.parse_entry(line)
+
+
+def _entry(**story: Any) -> Dict[str, Any]:
+    """Return a batch entry for a story with the given fields."""
+    return {'story': story, 'parent_key': None}
+
+
+def test_sharder_is_stable_per_epic() -> None:
+    """Stories of one epic always go to the same worker, whatever came before."""
+    shard = cli.Sharder(4, 'epic_link')
+    first = [shard(_entry(epic_link=f"EPIC-{n}")) for n in range(20)]
+    shard(_entry(title='No epic'))
+    again = [shard(_entry(epic_link=f"EPIC-{n}")) for n in range(20)]
+    assert first == again
+    assert cli.Sharder(4, 'epic_link')(_entry(epic_link='EPIC-7')) == first[7]
+    assert len(set(first)) > 1
+
+
+def test_sharder_round_robins_without_the_field() -> None:
+    """Stories without the shard field are spread evenly."""
+    shard = cli.Sharder(3, 'epic_link')
+    assert [shard(_entry(title=str(n), epic_link='')) for n in range(6)] == [1, 2, 0, 1, 2, 0]
+    assert shard({'story': None}) == 1
+
+
+def test_write_results_stops_when_every_worker_is_done(monkeypatch: Any) -> None:
+    """Results are written until each worker sent its end marker or exited."""
+    monkeypatch.setattr(cli, 'QUEUE_POLL_SECONDS', 0.01)
+    results: queue.Queue = queue.Queue()
+    results.put({'line': 1, 'errors': []})
+    results.put({'line': 3, 'errors': ['Failed to process story: boom']})
+    results.put(0)
+    # Worker 1 was killed and never sends its end marker
+    processes: List[Any] = [SimpleNamespace(is_alive=lambda: True), SimpleNamespace(is_alive=lambda: False)]
+    output = io.StringIO()
+    summary = {'stories': 0, 'with_errors': 0}
+
+    cli._write_results(results, output, processes, summary)
+    assert [json.loads(line)['line'] for line in output.getvalue().splitlines()] == [1, 3]
+    assert summary == {'stories': 2, 'with_errors': 1}
+
+
+def test_coverage_report_is_written_in_the_requested_mode(tmp_path: Any, monkeypatch: Any) -> None:
+    """``--incremental-coverage`` is passed through to the coverage report."""
+    calls: List[Any] = []
+
+    def report(self: Any, project_key: str, incremental: bool = False) -> Dict[str, Any]:
+        calls.append((project_key, incremental))
+        return {'total_tests': 1}
+
+    monkeypatch.setattr(settings, 'journal_enabled', False)
+    monkeypatch.setattr(settings, 'jira_project_key', 'TEST')
+    monkeypatch.setattr(test_case_generator.TestCaseGenerator, 'get_test_coverage_report', report)
+    path = tmp_path / 'coverage.json'
+    for argv, incremental in ((['-'], False), (['-', '--incremental-coverage'], True)):
+        args = cli.parse_args(argv + ['--coverage-report', str(path)])
+        cli.write_coverage_report(args.coverage_report, args.incremental_coverage)
+        assert calls.pop() == ('TEST', incremental)
+        assert json.loads(path.read_text(encoding='utf-8')) == {'total_tests': 1}
+
+
+def test_run_with_one_worker(start_server: Callable[..., str], tmp_path: Any, monkeypatch: Any) -> None:
+    """A worker process files every valid line to its own export part."""
+    url = start_server(start_fake_azure_ai, INSTANT, test_cases_per_story=2, steps_per_test_case=2)
+    for name, value in {'azure_ai_endpoint': url, 'azure_ai_key': 'test',
+                        'azure_ai_requests_per_minute': 100000.0, 'azure_ai_tokens_per_minute': 0.0,
+                        'output_sink': 'jira_csv', 'export_path': str(tmp_path / 'cases.csv'),
+                        'journal_enabled': False, 'llm_cache_enabled': False}.items():
+        monkeypatch.setattr(settings, name, value)
+    source = io.StringIO('\n'.join([
+        json.dumps({'story': {'title': 'Login', 'description': 'As a user I want to sign in'},
+                    'parent_key': None}),
+        json.dumps({'title': 'Logout', 'description': 'As a user I want to sign out', 'epic_link': 'EPIC-1'}),
+        '',
+        '[1, 2]',
+        '{"title": ',
+    ]) + '\n')
+    output = io.StringIO()
+
+    summary = cli.run(cli.parse_args(['-', '--workers', '1']), source, output)
+    results = {result['line']: result for result in map(json.loads, output.getvalue().splitlines())}
+    assert summary == {'stories': 2, 'with_errors': 0, 'invalid_lines': 2}
+    assert sorted(results) == [1, 2]
+    assert (results[1]['user_story'], results[2]['user_story']) == ('Login', 'Logout')
+    assert all(result['exported_test_cases'] == 2 for result in results.values())
+    assert [path.name for path in tmp_path.iterdir()] == ['cases.part0.csv']
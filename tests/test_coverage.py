@@ -0,0 +1,154 @@
+"""Unit tests for the coverage index and its incremental snapshots."""
+from typing import Any, Dict, Iterator, List, Optional, Set
+import coverage
+import test_case_generator
+from config import settings
+from coverage import CoverageIndex, NO_EPIC, load_snapshot, save_snapshot
+
+
+def _story(key: str, epic: Optional[str] = None) -> Dict[str, Any]:
+    """Return a story issue as the search API reports it."""
+    fields: Dict[str, Any] = {'issuetype': {'name': 'Story'}}
+    if epic:
+        fields['parent'] = {'key': epic, 'fields': {'issuetype': {'name': 'Epic'}}}
+    return {'key': key, 'fields': fields}
+
+
+def _test(key: str, linked: List[str]) -> Dict[str, Any]:
+    """Return a test issue linked (outward) to every key in ``linked``."""
+    links = [{'outwardIssue': {'key': target}} for target in linked]
+    return {'key': key, 'fields': {'issuetype': {'name': 'Test'}, 'issuelinks': links}}
+
+
+def _index() -> CoverageIndex:
+    """Build a small index: two covered stories, one uncovered."""
+    index = CoverageIndex()
+    index.add_stories([_story('TEST-1', 'TEST-100'), _story('TEST-2', 'TEST-100'), _story('TEST-3')])
+    index.add_tests([_test('TEST-10', ['TEST-1']), _test('TEST-11', ['TEST-1', 'TEST-2'])])
+    return index
+
+
+def test_report_counts_and_epic_rollups() -> None:
+    """The report counts linked tests per story and rolls them up by epic."""
+    report = _index().report('TEST')
+    assert report['total_stories'] == 3
+    assert report['total_tests'] == 2
+    assert report['tests_per_story'] == {'TEST-1': 2, 'TEST-2': 1, 'TEST-3': 0}
+    assert report['uncovered_stories'] == ['TEST-3']
+    assert report['epics']['TEST-100']['stories_with_tests'] == 2
+    assert report['epics'][NO_EPIC]['coverage_percentage'] == 0
+
+
+def test_apply_change_relinks_and_removes() -> None:
+    """An updated test moves between stories and a deleted one disappears."""
+    index = _index()
+    index.apply_change(_test('TEST-10', ['TEST-3']))
+    assert index.tests_for('TEST-1') == {'TEST-11'}
+    assert index.tests_for('TEST-3') == {'TEST-10'}
+    index.remove_issue('TEST-11')
+    assert index.tests_for('TEST-2') == set()
+    assert index.total_tests == 1
+
+
+def test_snapshot_round_trip(tmp_path: Any, monkeypatch: Any) -> None:
+    """A saved snapshot reloads into an index with the same report."""
+    monkeypatch.setattr(settings, 'coverage_snapshot_path', str(tmp_path / 'coverage_{project_key}.json'))
+    index = _index()
+    report = index.report('TEST')
+    save_snapshot('TEST', index, 1234.5, report)
+
+    loaded = load_snapshot('TEST')
+    assert loaded is not None
+    restored, last_run = loaded
+    assert last_run == 1234.5
+    assert restored.report('TEST') == report
+    assert restored.keys() == index.keys()
+
+
+def test_snapshot_of_another_project_is_ignored(tmp_path: Any, monkeypatch: Any) -> None:
+    """A snapshot is only used for the project that wrote it."""
+    path = tmp_path / 'coverage.json'
+    monkeypatch.setattr(settings, 'coverage_snapshot_path', str(path))
+    save_snapshot('OTHER', _index(), 1.0, {})
+    assert load_snapshot('TEST') is None
+    path.write_text('not json', encoding='utf-8')
+    assert load_snapshot('OTHER') is None
+
+
+def test_updated_since_clause_adds_overlap(monkeypatch: Any) -> None:
+    """The relative window covers the elapsed minutes plus the overlap."""
+    monkeypatch.setattr(settings, 'coverage_overlap_minutes', 2)
+    monkeypatch.setattr(coverage.time, 'time', lambda: 10 * 60.0)
+    assert coverage.updated_since_clause(5 * 60.0) == 'updated >= "-8m"'
+
+
+class FakeCoverageJira:
+    """Answers the coverage searches from ``issues``; keys in ``updated``
+    match the incremental ``updated`` query. Full key listings are counted."""
+
+    def __init__(self, issues: List[Dict[str, Any]]):
+        self.issues = {issue['key']: issue for issue in issues}
+        self.updated: Set[str] = set()
+        self.listings = 0
+
+    def _type(self, key: str) -> str:
+        return self.issues[key]['fields']['issuetype']['name']
+
+    def iter_issues(self, jql: str, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        keys = sorted(self.issues)
+        if 'updated >=' in jql:
+            keys = [key for key in keys if key in self.updated]
+        elif 'issuetype in' in jql:
+            self.listings += 1
+        else:
+            keys = [key for key in keys if f"issuetype = {self._type(key)}" in jql]
+        return iter([self.issues[key] for key in keys])
+
+    def count_issues(self, jql: str) -> int:
+        return len(self.issues)
+
+
+def test_incremental_report_drops_deleted_issue(tmp_path: Any, monkeypatch: Any) -> None:
+    """Keys are only listed when the live count shows an issue was removed."""
+    monkeypatch.setattr(settings, 'coverage_snapshot_path', str(tmp_path / 'coverage_{project_key}.json'))
+    monkeypatch.setattr(settings, 'coverage_reconcile_deletions', True)
+    monkeypatch.setattr(settings, 'journal_enabled', False)
+    jira = FakeCoverageJira([_story('TEST-1'), _story('TEST-2'), _story('TEST-3'),
+                             _test('TEST-10', ['TEST-1']), _test('TEST-11', ['TEST-2'])])
+    generator = test_case_generator.TestCaseGenerator()
+    generator._jira_service = jira
+    assert generator.get_test_coverage_report('TEST')['total_tests'] == 2
+
+    # An updated test only: counts match, so no listing
+    jira.issues['TEST-10'] = _test('TEST-10', ['TEST-3'])
+    jira.updated = {'TEST-10'}
+    report = generator.get_test_coverage_report('TEST', incremental=True)
+    assert report['tests_per_story'] == {'TEST-1': 0, 'TEST-2': 1, 'TEST-3': 1}
+    assert jira.listings == 0
+
+    # A deleted test and a new one: the count differs, so keys are listed
+    del jira.issues['TEST-11']
+    jira.issues['TEST-12'] = _test('TEST-12', ['TEST-1'])
+    jira.updated = {'TEST-12'}
+    report = generator.get_test_coverage_report('TEST', incremental=True)
+    assert report['tests_per_story'] == {'TEST-1': 1, 'TEST-2': 0, 'TEST-3': 1}
+    assert report['total_tests'] == 2
+    assert jira.listings == 1
+
+
+def test_snapshot_is_only_saved_when_wanted(tmp_path: Any, monkeypatch: Any) -> None:
+    """A full scan leaves no file behind unless a snapshot path is configured."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, 'coverage_snapshot_path', '')
+    monkeypatch.setattr(settings, 'journal_enabled', False)
+    generator = test_case_generator.TestCaseGenerator()
+    generator._jira_service = FakeCoverageJira([_story('TEST-1'), _test('TEST-10', ['TEST-1'])])
+
+    assert generator.get_test_coverage_report('TEST')['total_tests'] == 1
+    assert list(tmp_path.iterdir()) == []
+    assert generator.get_test_coverage_report('TEST', incremental=True)['total_tests'] == 1
+    assert [path.name for path in tmp_path.iterdir()] == ['.test_coverage_TEST.json']
+
+    monkeypatch.setattr(settings, 'coverage_snapshot_path', str(tmp_path / 'full_{project_key}.json'))
+    generator.get_test_coverage_report('TEST')
+    assert (tmp_path / 'full_TEST.json').exists()
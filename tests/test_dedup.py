@@ -0,0 +1,80 @@
+"""Unit tests for near-duplicate detection and its claim/release protocol."""
+import asyncio
+from typing import Any, Callable, Dict, List
+import pytest
+import models
+import test_case_generator
+from config import settings
+from conftest import FakeJira
+from dedup import DuplicateDetector, issue_text
+
+LOGIN = "Login with valid credentials\nopen the login page enter a valid user name and password and submit the form"
+LOGIN_AGAIN = LOGIN + " again"
+SEARCH = "Search the catalogue\ntype a product name into the search box and check the matching results list"
+
+
+def test_issue_text_keeps_title_and_steps_only() -> None:
+    """Description boilerplate outside the steps section is not compared."""
+    description = ("*Description:*\nBoilerplate\n\n*Test Steps:*\n1. Open the page\n"
+                   "   _Expected Result:_ Page shown\n\n*Expected Outcome:*\nDone")
+    text = issue_text('Title', description)
+    assert 'Open the page' in text and 'Page shown' in text
+    assert 'Boilerplate' not in text and 'Expected Result' not in text
+
+
+def test_claim_finds_duplicates_within_one_call() -> None:
+    """A near-identical text matches the entry claimed earlier in the batch."""
+    detector = DuplicateDetector(threshold=0.7)
+    claims = detector.claim([LOGIN, SEARCH, LOGIN_AGAIN])
+    assert [duplicate for duplicate, _ in claims] == [False, False, True]
+    assert claims[2][1] is claims[0][1]
+    assert detector.size == 2
+
+
+def test_claim_matches_indexed_issues() -> None:
+    """Texts already filed in Jira are found with their key."""
+    detector = DuplicateDetector(threshold=0.7)
+    detector.add([('TEST-1', LOGIN)])
+    (duplicate, entry), = detector.claim([LOGIN_AGAIN])
+    assert duplicate and entry.wait(0) == 'TEST-1'
+
+
+def test_release_forgets_the_entry_once() -> None:
+    """A released claim no longer matches, and releasing again is harmless."""
+    detector = DuplicateDetector(threshold=0.7)
+    (_, entry), = detector.claim([LOGIN])
+    detector.release(entry)
+    detector.release(entry)
+    assert detector.size == 0
+    assert entry.wait(0) is None
+    assert detector.claim([LOGIN_AGAIN])[0][0] is False
+
+
+def test_num_perm_must_split_into_bands() -> None:
+    """Signatures are cut into equal bands."""
+    with pytest.raises(ValueError):
+        DuplicateDetector(num_perm=100, bands=16)
+
+
+def test_duplicate_of_failed_original_is_refiled(monkeypatch: Any, fake_jira: FakeJira,
+                                                 make_test_case: Callable[..., models.TestCase]) -> None:
+    """When the original's create fails its in-batch duplicate is filed instead."""
+    monkeypatch.setattr(settings, 'dedup_enabled', True)
+    monkeypatch.setattr(settings, 'dedup_include_existing', False)
+    monkeypatch.setattr(settings, 'dedup_threshold', 0.7)
+    monkeypatch.setattr(settings, 'dedup_action', 'skip')
+    monkeypatch.setattr(settings, 'dedup_wait_seconds', 0)
+    monkeypatch.setattr(settings, 'journal_enabled', False)
+    title, steps = LOGIN.split('\n')
+    test_cases = [
+        make_test_case(title, test_steps=[{'step_number': 1, 'action': steps, 'expected_result': 'ok'}]),
+        make_test_case(title, test_steps=[{'step_number': 1, 'action': steps + ' again', 'expected_result': 'ok'}]),
+    ]
+    # The first bulk create (the original) fails
+    fake_jira.failing_creates = 1
+    generator = test_case_generator.TestCaseGenerator()
+
+    outcomes: List[Dict[str, Any]] = asyncio.run(generator._create_unique_issues(test_cases, None))
+    assert fake_jira.bulk_calls == [[title], [title]]
+    assert outcomes[0] == {'key': None, 'error': 'HTTP 500'}
+    assert outcomes[1] == {'key': 'TEST-1', 'error': None}
@@ -0,0 +1,92 @@
+"""Unit tests for the bulk-import file exporters."""
+import csv
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Callable, List
+import pytest
+import models
+import test_case_generator
+from config import settings
+import exporters
+from exporters import EXPORTERS, create_exporter
+
+
+def _export(sink: str, path: Any, test_cases: List[models.TestCase], parent_key: str = 'TEST-1') -> list:
+    """Write ``test_cases`` through ``sink`` and return its outcomes."""
+    exporter = create_exporter(sink, str(path))
+    outcomes = exporter.write(test_cases, parent_key)
+    exporter.close()
+    return outcomes
+
+
+def _rows(path: Any) -> List[List[str]]:
+    """Read a CSV export back."""
+    with open(path, encoding='utf-8', newline='') as export_file:
+        return list(csv.reader(export_file))
+
+
+def test_base_exporter_is_abstract(tmp_path: Any) -> None:
+    """Sinks must implement ``_write_case``."""
+    with pytest.raises(TypeError):
+        exporters.TestCaseExporter(str(tmp_path / 'x.csv'))
+
+
+def test_create_exporter_sinks() -> None:
+    """The Jira sink has no exporter and unknown sinks are rejected."""
+    assert create_exporter('jira') is None
+    with pytest.raises(ValueError):
+        create_exporter('excel')
+
+
+def test_jira_csv_has_one_row_per_case(tmp_path: Any, make_test_case: Callable[..., models.TestCase]) -> None:
+    """Each case is a row with space-separated labels and the parent link."""
+    path = tmp_path / 'jira.csv'
+    outcomes = _export('jira_csv', path, [make_test_case('A'), make_test_case('B')])
+    assert [outcome['exported'] for outcome in outcomes] == [f"{path}#1", f"{path}#2"]
+    header, *rows = _rows(path)
+    assert header == EXPORTERS['jira_csv'].HEADER
+    assert [row[0] for row in rows] == ['A', 'B']
+    assert rows[0][4] == 'smoke auth' and rows[0][5] == 'TEST-1'
+
+
+def test_xray_csv_groups_steps_by_tcid(tmp_path: Any, make_test_case: Callable[..., models.TestCase]) -> None:
+    """Fields are on a test's first row, with one row per step."""
+    path = tmp_path / 'xray.csv'
+    _export('xray_csv', path, [make_test_case('A', steps=2), make_test_case('B', steps=1)])
+    _, *rows = _rows(path)
+    assert [row[0] for row in rows] == ['1', '1', '2']
+    assert rows[0][1] == 'A' and rows[1][1] == ''
+    assert [row[6] for row in rows] == ['Action 1', 'Action 2', 'Action 1']
+    assert rows[0][9] == 'TEST-1' and rows[1][9] == ''
+
+
+def test_zephyr_csv_without_steps_keeps_the_outcome(tmp_path: Any,
+                                                   make_test_case: Callable[..., models.TestCase]) -> None:
+    """A case without steps still gets a row carrying its expected outcome."""
+    path = tmp_path / 'zephyr.csv'
+    _export('zephyr_csv', path, [make_test_case('A', steps=0)])
+    _, row = _rows(path)
+    assert row[0] == 'A' and row[2] == 'User account exists' and row[7] == 'The dashboard is shown'
+
+
+def test_junit_xml_is_well_formed(tmp_path: Any, make_test_case: Callable[..., models.TestCase]) -> None:
+    """The XML skeleton parses and escapes titles."""
+    path = tmp_path / 'tests.xml'
+    _export('junit', path, [make_test_case('A <b> & "c"')])
+    testcase = ElementTree.parse(path).getroot().find('testsuite/testcase')
+    assert testcase.get('name') == 'A <b> & "c"'
+    assert testcase.get('classname') == 'TEST-1'
+    assert testcase.find('skipped') is not None
+
+
+def test_generator_opens_the_export_file_on_first_use(tmp_path: Any, monkeypatch: Any) -> None:
+    """Constructing a generator does not create or truncate the export."""
+    path = tmp_path / 'export.csv'
+    path.write_text('previous run', encoding='utf-8')
+    monkeypatch.setattr(settings, 'output_sink', 'jira_csv')
+    monkeypatch.setattr(settings, 'export_path', str(path))
+    monkeypatch.setattr(settings, 'journal_enabled', False)
+    generator = test_case_generator.TestCaseGenerator()
+    assert path.read_text(encoding='utf-8') == 'previous run'
+    assert generator.exporter is generator.exporter
+    generator.exporter.close()
+    assert _rows(path) == [EXPORTERS['jira_csv'].HEADER]
@@ -0,0 +1,46 @@
+"""Unit tests for mapping Jira bulk-create responses back to test cases."""
+from jira_service import JiraService
+
+
+def _issue(key: str) -> dict:
+    """Return an ``issues`` entry as Jira reports a created issue."""
+    return {'id': key.split('-')[1], 'key': key, 'self': f"https://jira/rest/api/2/issue/{key}"}
+
+
+def test_match_bulk_results_all_created() -> None:
+    """Created issues are paired with the inputs in submission order."""
+    response = {'issues': [_issue('TEST-1'), _issue('TEST-2')], 'errors': []}
+    assert JiraService._match_bulk_results(2, response) == [
+        {'key': 'TEST-1', 'error': None},
+        {'key': 'TEST-2', 'error': None},
+    ]
+
+
+def test_match_bulk_results_skips_failed_elements() -> None:
+    """A failed element keeps its error and later keys shift past it."""
+    response = {
+        'issues': [_issue('TEST-1'), _issue('TEST-2')],
+        'errors': [{
+            'status': 400,
+            'failedElementNumber': 1,
+            'elementErrors': {'errorMessages': [], 'errors': {'priority': 'Priority is invalid'}},
+        }],
+    }
+    assert JiraService._match_bulk_results(3, response) == [
+        {'key': 'TEST-1', 'error': None},
+        {'key': None, 'error': 'priority: Priority is invalid'},
+        {'key': 'TEST-2', 'error': None},
+    ]
+
+
+def test_match_bulk_results_falls_back_to_status() -> None:
+    """An element error without messages is reported by its HTTP status."""
+    response = {'errors': [{'status': 403, 'failedElementNumber': 0, 'elementErrors': {}}]}
+    assert JiraService._match_bulk_results(1, response) == [{'key': None, 'error': 'HTTP 403'}]
+
+
+def test_match_bulk_results_reports_missing_issues() -> None:
+    """Inputs the response does not account for are failures, not guesses."""
+    outcomes = JiraService._match_bulk_results(2, {'issues': [_issue('TEST-1')]})
+    assert outcomes[0] == {'key': 'TEST-1', 'error': None}
+    assert outcomes[1]['key'] is None and outcomes[1]['error']
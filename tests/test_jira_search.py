@@ -0,0 +1,55 @@
+"""Tests for paged Jira searches against the fake Jira server."""
+from typing import Any, Callable, Iterator
+import pytest
+from config import settings
+from conftest import INSTANT
+from fake_servers import JiraStore, start_fake_jira
+from jira_service import JiraService
+from rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def store() -> JiraStore:
+    """A project of 50 stories with 4 tests each (250 issues)."""
+    return JiraStore('TEST', stories=50, tests_per_story=4)
+
+
+@pytest.fixture
+def jira(start_server: Callable[..., str], store: JiraStore, monkeypatch: Any) -> Iterator[JiraService]:
+    """A ``JiraService`` on the fake server, without rate limits."""
+    url = start_server(start_fake_jira, INSTANT, store)
+    for name, value in {'jira_url': url, 'jira_email': 'test@example.com', 'jira_api_token': 'test'}.items():
+        monkeypatch.setattr(settings, name, value)
+    service = JiraService()
+    service.rate_limiter = RateLimiter('jira', 0)
+    yield service
+    service.jira.close()
+
+
+# The fake server caps pages at 100 issues, as Jira Cloud does
+@pytest.mark.parametrize('page_size', [7, 150])
+def test_iter_issues_returns_every_page_in_order(jira: JiraService, page_size: int) -> None:
+    """Every matching key comes back once, in result order, with only the requested fields."""
+    issues = list(jira.iter_issues("project = TEST ORDER BY key", fields=['issuetype'],
+                                   page_size=page_size, max_workers=3))
+    assert [issue['key'] for issue in issues] == [f"TEST-{n}" for n in range(1, 251)]
+    assert all(issue['fields'] == {'issuetype': issue['fields']['issuetype']} for issue in issues)
+
+
+def test_iter_issues_filters_by_type(jira: JiraService) -> None:
+    """Only issues matching the JQL are returned."""
+    issues = list(jira.iter_issues("project = TEST AND issuetype = Story ORDER BY key", fields=['issuetype'],
+                                   page_size=20, max_workers=2))
+    assert [issue['key'] for issue in issues] == [f"TEST-{n}" for n in range(1, 251, 5)]
+
+
+def test_iter_issues_without_fields_gets_all_of_them(jira: JiraService) -> None:
+    """Without ``fields`` every field is requested."""
+    issue = next(jira.iter_issues("project = TEST ORDER BY key"))
+    assert set(issue['fields']) == {'issuetype', 'labels'}
+
+
+def test_count_issues_downloads_no_issues(jira: JiraService) -> None:
+    """A count is the search ``total`` alone."""
+    assert jira.count_issues("project = TEST AND issuetype in (Story, Test)") == 250
+    assert jira.count_issues("project = TEST AND issuetype = Story") == 50
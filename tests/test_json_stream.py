@@ -0,0 +1,62 @@
+"""Unit tests for the incremental JSON array parser used while streaming."""
+import json
+from json_stream import JsonArrayStreamParser
+
+
+def _feed_in_chunks(parser: JsonArrayStreamParser, text: str, size: int) -> list:
+    """Feed ``text`` in ``size``-character chunks and collect every object."""
+    objects = []
+    for start in range(0, len(text), size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return objects
+
+
+def test_objects_are_emitted_across_chunk_boundaries() -> None:
+    """Splitting the text anywhere yields the same objects in order."""
+    data = [{'title': 'a {brace} "quoted" [x]', 'n': 1}, {'title': 'b\\', 'nested': {'k': [1, 2]}}]
+    text = '```json\n' + json.dumps(data) + '\n```'
+    for size in (1, 3, 7, len(text)):
+        parser = JsonArrayStreamParser()
+        assert _feed_in_chunks(parser, text, size) == data
+        assert parser.complete
+
+
+def test_prose_before_array_and_non_objects_are_skipped() -> None:
+    """Text before the array and scalar elements never produce objects."""
+    parser = JsonArrayStreamParser()
+    assert parser.feed('Here you go: [{"id": 3}, 1, "two"]') == [{'id': 3}]
+    assert parser.complete
+
+
+def test_bracket_in_prose_does_not_open_the_array() -> None:
+    """Only a ``[`` followed by ``{`` or ``]`` starts the array, even across chunks."""
+    parser = JsonArrayStreamParser()
+    text = 'Cases for [Login] (see [1]): [ \n {"id": 1}]'
+    assert _feed_in_chunks(parser, text, 1) == [{'id': 1}]
+    assert parser.complete
+    parser = JsonArrayStreamParser()
+    assert parser.feed('Only [notes] here') == []
+    assert not parser.started
+
+
+def test_truncated_element_stays_pending() -> None:
+    """A cut-off answer keeps the complete elements and the partial text."""
+    parser = JsonArrayStreamParser()
+    assert parser.feed('[{"id": 1}, {"id": 2, "title": "cut') == [{'id': 1}]
+    assert not parser.complete
+    assert parser.pending == '{"id": 2, "title": "cut'
+
+
+def test_malformed_element_is_rejected_without_stopping() -> None:
+    """An element that fails to decode is kept for repair; parsing goes on."""
+    parser = JsonArrayStreamParser()
+    assert parser.feed('[{"id": 1,}, {"id": 2}]') == [{'id': 2}]
+    assert parser.invalid == 1
+    assert parser.rejected == ['{"id": 1,}']
+
+
+def test_text_after_the_array_is_ignored() -> None:
+    """Nothing after the closing bracket is parsed."""
+    parser = JsonArrayStreamParser()
+    assert parser.feed('[{"id": 1}] trailing {"id": 2}') == [{'id': 1}]
+    assert parser.feed('{"id": 3}') == []
@@ -0,0 +1,133 @@
+"""Unit tests for the on-disk completion cache."""
+import asyncio
+import json
+import sqlite3
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator
+import pytest
+import llm_cache
+import models
+from conftest import build_test_case_data
+from config import settings
+from llm_cache import CompletionCache
+
+
+@pytest.fixture
+def cache(tmp_path: Any) -> Iterator[CompletionCache]:
+    """A cache in a temporary file with a one-minute TTL and three entries."""
+    cache = CompletionCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60, max_entries=3)
+    yield cache
+    cache.close()
+
+
+def _at(monkeypatch: Any, now: float) -> None:
+    """Freeze the cache's clock at ``now``."""
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now)
+
+
+def test_entries_expire_after_ttl(cache: CompletionCache, monkeypatch: Any) -> None:
+    """An entry is served until its TTL elapses, then dropped."""
+    _at(monkeypatch, 1000.0)
+    cache.put('k', 'v')
+    _at(monkeypatch, 1060.0)
+    assert cache.get('k') == 'v'
+    _at(monkeypatch, 1061.0)
+    assert cache.get('k') is None
+    _at(monkeypatch, 1000.0)
+    assert cache.get('k') is None
+
+
+def test_least_recently_read_entries_are_evicted(cache: CompletionCache, monkeypatch: Any) -> None:
+    """The table is trimmed to ``max_entries`` by dropping the oldest reads."""
+    for now, key in enumerate('abc'):
+        _at(monkeypatch, 1000.0 + now)
+        cache.put(key, key.upper())
+    _at(monkeypatch, 1010.0)
+    assert cache.get('a') == 'A'
+    _at(monkeypatch, 1011.0)
+    cache.put('d', 'D')
+    assert [cache.get(key) for key in 'abcd'] == ['A', None, 'C', 'D']
+
+
+def test_delete_drops_an_entry(cache: CompletionCache) -> None:
+    """A deleted entry is a miss."""
+    cache.put('k', 'v')
+    cache.delete('k')
+    assert cache.get('k') is None
+
+
+class _LockedConnection:
+    """A connection whose every statement fails as if another process held the lock."""
+
+    def execute(self, *args: Any) -> None:
+        raise sqlite3.OperationalError('database is locked')
+
+    def close(self) -> None:
+        pass
+
+
+def test_cache_errors_fall_back_to_the_live_answer(ai_service: Any, cache: CompletionCache,
+                                                   make_story: Callable[..., models.UserStory]) -> None:
+    """A cache that cannot be read or written is skipped rather than failing generation."""
+    cache._conn.close()
+    cache._conn = _LockedConnection()
+    ai_service.cache = cache
+    ai_service.client.script('large', json.dumps([build_test_case_data('Live')]), 'not json',
+                             json.dumps([build_test_case_data('Again')]))
+    story = make_story()
+
+    def titles() -> list:
+        test_cases = asyncio.run(ai_service.generate_test_cases(story, cascade=False))
+        return [test_case.title for test_case in test_cases]
+
+    assert titles() == ['Live']
+    assert titles() == ['Again']
+    assert ai_service.client.models == ['large'] * 3
+
+
+def _message(content: str) -> SimpleNamespace:
+    """Return a chat message with a role."""
+    return SimpleNamespace(role='user', content=content)
+
+
+@pytest.mark.parametrize('changes', [
+    {'model': 'other'},
+    {'temperature': 0.7},
+    {'max_tokens': 2000},
+    {'messages': [_message('Other prompt')]},
+    {'subject': models.UserStory(title='Checkout', description='As a buyer I want to pay')},
+    {'subject': None},
+], ids=['model', 'temperature', 'max_tokens', 'messages', 'subject', 'no_subject'])
+def test_make_key_covers_every_request_parameter(make_story: Callable[..., models.UserStory],
+                                                 changes: Dict[str, Any]) -> None:
+    """Changing any parameter that shapes the answer changes the key."""
+    request: Dict[str, Any] = {'model': 'gpt-4', 'messages': [_message('Prompt')], 'temperature': 0.3,
+                               'max_tokens': 4000, 'subject': make_story()}
+    key = CompletionCache.make_key(**request)
+    assert CompletionCache.make_key(**{**request, 'subject': make_story()}) == key
+    assert CompletionCache.make_key(**{**request, **changes}) != key
+
+
+def test_bypass_skips_the_lookup_but_refreshes_the_entry(ai_service: Any, cache: CompletionCache,
+                                                         make_story: Callable[..., models.UserStory],
+                                                         monkeypatch: Any) -> None:
+    """With ``bypass_cache`` the model is asked again and its answer is stored."""
+    ai_service.cache = cache
+    story = make_story()
+    first = json.dumps([build_test_case_data('First')])
+    second = json.dumps([build_test_case_data('Second')])
+    ai_service.client.script('large', first, second)
+
+    def titles(**kwargs: Any) -> list:
+        test_cases = asyncio.run(ai_service.generate_test_cases(story, cascade=False, **kwargs))
+        return [test_case.title for test_case in test_cases]
+
+    assert titles() == ['First']
+    assert titles() == ['First']
+    assert titles(bypass_cache=True) == ['Second']
+    monkeypatch.setattr(settings, 'llm_cache_bypass', True)
+    ai_service.client.script('large', first)
+    assert titles() == ['First']
+    monkeypatch.setattr(settings, 'llm_cache_bypass', False)
+    assert titles() == ['First']
+    assert ai_service.client.models == ['large'] * 3
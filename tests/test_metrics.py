@@ -0,0 +1,149 @@
+"""Unit tests for the metrics registry, per-story summaries and LLM usage accounting."""
+import asyncio
+import json
+import urllib.request
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, List
+import pytest
+import metrics
+import models
+from conftest import FakeAnswer, build_test_case_data
+from metrics import MetricsRegistry, RunSummary, record_usage, serve_prometheus, story_scope, token_cost, track_call
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> SimpleNamespace:
+    """Return a response ``usage`` block."""
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+def test_prometheus_text_format() -> None:
+    """Each metric gets HELP and TYPE lines and one line per labelled series."""
+    registry = MetricsRegistry()
+    calls = registry.counter('calls_total', 'Calls by outcome', ('service', 'outcome'))
+    calls.inc(service='jira', outcome='success')
+    calls.inc(2, service='jira', outcome='success')
+    calls.inc(service='say "hi"\n', outcome='error')
+    registry.counter('plain_total', 'No labels').inc(1.5)
+
+    lines = registry.export_prometheus().splitlines()
+    assert lines[:2] == ['# HELP calls_total Calls by outcome', '# TYPE calls_total counter']
+    assert 'calls_total{service="jira",outcome="success"} 3' in lines
+    assert 'calls_total{service="say \\"hi\\"\\n",outcome="error"} 1' in lines
+    assert lines[-3:] == ['# HELP plain_total No labels', '# TYPE plain_total counter', 'plain_total 1.5']
+
+
+def test_registry_returns_the_existing_metric() -> None:
+    """Asking for a name twice returns the same metric."""
+    registry = MetricsRegistry()
+    assert registry.counter('x_total', 'X') is registry.counter('x_total', 'X')
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    """Each ``le`` bucket counts every observation at or below its bound."""
+    registry = MetricsRegistry()
+    seconds = registry.histogram('call_seconds', 'Call time', ('service',), buckets=(1.0, 0.1, 10.0))
+    for value in (0.03, 0.1, 0.3, 7.0, 42.0):
+        seconds.observe(value, service='ai')
+
+    lines = registry.export_prometheus().splitlines()
+    assert lines[2:] == [
+        'call_seconds_bucket{service="ai",le="0.1"} 2',
+        'call_seconds_bucket{service="ai",le="1.0"} 3',
+        'call_seconds_bucket{service="ai",le="10.0"} 4',
+        'call_seconds_bucket{service="ai",le="+Inf"} 5',
+        'call_seconds_sum{service="ai"} 49.43',
+        'call_seconds_count{service="ai"} 5',
+    ]
+
+
+def test_token_cost_uses_per_1k_prices(monkeypatch: Any) -> None:
+    """Prompt and completion tokens are priced separately; unpriced models are free."""
+    monkeypatch.setattr(metrics, 'PRICING', {'gpt-4': (0.03, 0.06)})
+    assert token_cost('gpt-4', 1000, 500) == pytest.approx(0.06)
+    assert token_cost('other', 1000, 500) == 0.0
+
+
+def test_invalid_pricing_is_ignored(monkeypatch: Any) -> None:
+    """A malformed ``AZURE_AI_PRICING`` leaves every model unpriced."""
+    monkeypatch.setattr(metrics.settings, 'azure_ai_pricing', '{"gpt-4": 3}')
+    assert metrics._load_pricing() == {}
+    monkeypatch.setattr(metrics.settings, 'azure_ai_pricing', '{"gpt-4": [0.03, "0.06"]}')
+    assert metrics._load_pricing() == {'gpt-4': (0.03, 0.06)}
+
+
+def test_story_scope_follows_threads_and_tasks(monkeypatch: Any) -> None:
+    """Calls made in worker threads and tasks count towards the story that made them."""
+    monkeypatch.setattr(metrics, 'PRICING', {'gpt-4': (0.03, 0.06)})
+
+    def blocking_call() -> None:
+        with track_call('jira', 'create_issues'):
+            pass
+
+    async def story(summary: RunSummary, prompt_tokens: int) -> None:
+        with story_scope(summary):
+            await asyncio.to_thread(blocking_call)
+            await asyncio.to_thread(record_usage, 'gpt-4', _usage(prompt_tokens, 500))
+
+    async def run(first: RunSummary, second: RunSummary) -> None:
+        await asyncio.gather(story(first, 1000), story(second, 2000))
+
+    first, second = RunSummary(), RunSummary()
+    asyncio.run(run(first, second))
+    record_usage('gpt-4', _usage(9999, 9999))
+
+    assert first.stages['jira.create_issues']['calls'] == 1
+    assert first.tokens == {'prompt': 1000, 'completion': 500}
+    assert second.tokens == {'prompt': 2000, 'completion': 500}
+    assert first.to_dict()['cost_usd'] == pytest.approx(0.06)
+    assert second.to_dict()['models']['gpt-4']['cost_usd'] == pytest.approx(0.09)
+
+
+def test_failed_call_counts_as_an_error() -> None:
+    """An exception inside ``track_call`` is recorded as an error and re-raised."""
+    summary = RunSummary()
+    with story_scope(summary), pytest.raises(RuntimeError):
+        with track_call('azure_ai', 'validate', 'gpt-4'):
+            raise RuntimeError('boom')
+    stage = summary.stages['azure_ai.validate']
+    assert (stage['calls'], stage['errors']) == (1, 1)
+    assert summary.models['gpt-4']['calls'] == 1
+
+
+async def _collect(stream: AsyncIterator[models.TestCase]) -> List[models.TestCase]:
+    """Drain a test case stream."""
+    return [test_case async for test_case in stream]
+
+
+@pytest.mark.parametrize('stream_usage', [False, True], ids=['estimated', 'reported'])
+def test_streamed_generation_records_usage(ai_service: Any, make_story: Callable[..., models.UserStory],
+                                           stream_usage: bool) -> None:
+    """Streamed stories count towards tokens, estimated when the stream reports none."""
+    content = json.dumps([build_test_case_data('A'), build_test_case_data('B')])
+    ai_service.client.script('large', FakeAnswer(content, stream_usage=stream_usage))
+    story = make_story()
+    summary = RunSummary()
+
+    async def run() -> List[models.TestCase]:
+        with story_scope(summary):
+            return await _collect(ai_service.generate_test_cases_stream(story, cascade=False))
+
+    assert len(asyncio.run(run())) == 2
+    prompt_tokens = 100 if stream_usage else sum(
+        len(message.content) // 4 for message in ai_service._build_generation_messages(story)
+    )
+    assert summary.tokens == {'prompt': prompt_tokens, 'completion': len(content) // 4}
+    assert summary.models['large']['completion_tokens'] == len(content) // 4
+
+
+def test_prometheus_endpoint_listens_on_localhost() -> None:
+    """``/metrics`` is served on 127.0.0.1 unless another host is given."""
+    server = serve_prometheus(0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == '127.0.0.1'
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert '# TYPE tcg_calls_total counter' in response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,142 @@
+"""Tests for the bounded two-stage story pipeline."""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import pytest
+import models
+import test_case_generator
+from config import settings
+from conftest import FakeJira, build_test_case_data
+
+
+class SlowAI:
+    """Generates one test case per story after ``delays[title]`` seconds.
+
+    Stories titled ``Broken`` fail instead. ``started`` lists the titles
+    whose generation has begun.
+    """
+
+    def __init__(self, delays: Dict[str, float]):
+        self.delays = delays
+        self.started: List[str] = []
+
+    async def generate_test_cases(self, user_story: models.UserStory) -> List[models.TestCase]:
+        self.started.append(user_story.title)
+        await asyncio.sleep(self.delays.get(user_story.title, 0.01))
+        if user_story.title == 'Broken':
+            raise RuntimeError('model unavailable')
+        return [models.TestCase(**build_test_case_data(f"{user_story.title} case"))]
+
+    async def validate_test_case(self, test_case: models.TestCase) -> Dict[str, Any]:
+        return {'is_valid': True, 'quality_score': 8, 'feedback': 'Fine', 'suggestions': []}
+
+
+@pytest.fixture
+def generator(fake_jira: FakeJira, monkeypatch: Any) -> test_case_generator.TestCaseGenerator:
+    """A generator filing to ``fake_jira`` with the model review always used."""
+    monkeypatch.setattr(settings, 'journal_enabled', False)
+    monkeypatch.setattr(settings, 'prevalidation_enabled', False)
+    monkeypatch.setattr(settings, 'story_packing', False)
+    return test_case_generator.TestCaseGenerator()
+
+
+def _stories(*titles: str) -> List[Dict[str, Any]]:
+    """Return batch entries for stories with the given titles."""
+    return [{'story': {'title': title, 'description': 'As a user I want it'}, 'parent_key': None}
+            for title in titles]
+
+
+def test_results_come_back_in_input_order(generator: test_case_generator.TestCaseGenerator,
+                                          fake_jira: FakeJira) -> None:
+    """Stories finish out of order but each result lands at its own index."""
+    generator._ai_service = SlowAI({'Slow': 0.1, 'Medium': 0.05, 'Fast': 0.0})
+    emitted: List[Any] = []
+
+    async def run() -> List[Dict[str, Any]]:
+        async def entries() -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+            for entry in enumerate(_stories('Slow', 'Medium', 'Fast')):
+                yield entry
+
+        async def on_result(tag: Any, result: Dict[str, Any]) -> None:
+            emitted.append((tag, result['user_story']))
+
+        await generator.process_story_stream(entries(), on_result, story_concurrency=3)
+        return await generator.batch_process_stories(_stories('Slow', 'Medium', 'Fast'), story_concurrency=3)
+
+    results = asyncio.run(run())
+    assert emitted == [(2, 'Fast'), (1, 'Medium'), (0, 'Slow')]
+    assert [result['user_story'] for result in results] == ['Slow', 'Medium', 'Fast']
+    assert [result['created_jira_issues'] for result in results] == [1, 1, 1]
+
+
+def test_reading_ahead_is_bounded(generator: test_case_generator.TestCaseGenerator, monkeypatch: Any) -> None:
+    """Input is read no further than the queue bound ahead of generation."""
+    monkeypatch.setattr(settings, 'pipeline_queue_size', 2)
+    titles = [f"Story {n}" for n in range(12)]
+    ai = SlowAI({})
+    generator._ai_service = ai
+    queued: List[int] = []
+
+    async def entries() -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+        for read, entry in enumerate(enumerate(_stories(*titles)), 1):
+            # Stories read but not yet picked up by a story worker
+            queued.append(read - len(ai.started))
+            yield entry
+
+    async def on_result(tag: Any, result: Dict[str, Any]) -> None:
+        pass
+
+    asyncio.run(generator.process_story_stream(entries(), on_result, story_concurrency=1))
+    assert ai.started == titles
+    # The queue holds two, the worker one it has taken but not started and
+    # the feeder the one it just read; unbounded, this would reach twelve
+    assert max(queued) <= 2 + 1 + 1
+
+
+def test_failing_story_does_not_stall_the_others(generator: test_case_generator.TestCaseGenerator,
+                                                 fake_jira: FakeJira) -> None:
+    """A story whose generation fails is reported while the rest are filed."""
+    generator._ai_service = SlowAI({'Broken': 0.05})
+    stories = _stories('Broken', 'One', 'Two', 'Three') + [{'story': {'title': 'No description'}}]
+
+    results = asyncio.run(generator.batch_process_stories(stories, story_concurrency=2))
+    assert results[0]['errors'] == ['Error processing user story: model unavailable']
+    assert [result['created_jira_issues'] for result in results[1:4]] == [1, 1, 1]
+    assert results[4]['errors'][0].startswith('Failed to process story')
+    assert sorted(fake_jira.created) == ['One case', 'Three case', 'Two case']
+
+
+async def _story_entries(count: int) -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+    """Yield ``count`` tagged story entries."""
+    for entry in enumerate(_stories(*(f"Story {n}" for n in range(count)))):
+        yield entry
+
+
+def test_failing_sink_stops_the_pipeline(generator: test_case_generator.TestCaseGenerator,
+                                         monkeypatch: Any) -> None:
+    """An ``on_result`` that raises cancels every stage instead of hanging."""
+    monkeypatch.setattr(settings, 'pipeline_queue_size', 2)
+    generator._ai_service = SlowAI({})
+
+    async def on_result(tag: Any, result: Dict[str, Any]) -> None:
+        raise OSError('sink closed')
+
+    stream = generator.process_story_stream(_story_entries(30), on_result, story_concurrency=2,
+                                            jira_writer_concurrency=1)
+    with pytest.raises(OSError, match='sink closed'):
+        asyncio.run(asyncio.wait_for(stream, timeout=5))
+
+
+def test_failing_input_stops_the_pipeline(generator: test_case_generator.TestCaseGenerator) -> None:
+    """An error reading the input is re-raised once the workers are cancelled."""
+    generator._ai_service = SlowAI({})
+
+    async def entries() -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+        async for entry in _story_entries(3):
+            yield entry
+        raise ValueError('truncated input')
+
+    async def on_result(tag: Any, result: Dict[str, Any]) -> None:
+        pass
+
+    with pytest.raises(ValueError, match='truncated input'):
+        asyncio.run(asyncio.wait_for(generator.process_story_stream(entries(), on_result), timeout=5))
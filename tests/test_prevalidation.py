@@ -0,0 +1,80 @@
+"""Unit tests for the rule-based pre-validation of test cases."""
+from typing import Any, Callable, Dict, List
+import pytest
+import models
+from prevalidation import local_verdict, score_test_case
+
+
+def _step(number: int, action: str = 'Act', expected: str = 'Result') -> Dict[str, Any]:
+    """Return a test step payload."""
+    return {'step_number': number, 'action': action, 'expected_result': expected}
+
+
+def test_clean_case_scores_ten(make_test_case: Callable[..., models.TestCase]) -> None:
+    """A structurally complete case has no findings."""
+    assert score_test_case(make_test_case()) == (10, [])
+
+
+@pytest.mark.parametrize('overrides, finding', [
+    ({'test_steps': []}, 'no_steps'),
+    ({'expected_outcome': ' '}, 'missing_expected_outcome'),
+    ({'test_steps': [_step(1, action=''), _step(2)]}, 'blank_action'),
+    ({'test_steps': [_step(1, expected=''), _step(2)]}, 'blank_expected_result'),
+    ({'test_steps': [_step(1), _step(3, action='Other')]}, 'non_sequential_steps'),
+    ({'test_steps': [_step(1), _step(2)]}, 'duplicate_steps'),
+    ({'labels': ['low']}, 'conflicting_labels'),
+    ({'labels': ['smoke', ' ']}, 'blank_label'),
+    ({'test_steps': [_step(1)]}, 'single_step'),
+    ({'description': 'Too short'}, 'short_description'),
+])
+def test_defects_are_found(make_test_case: Callable[..., models.TestCase], overrides: Dict[str, Any],
+                           finding: str) -> None:
+    """Each rule reports its finding and lowers the score."""
+    score, findings = score_test_case(make_test_case(**overrides))
+    assert finding in findings
+    assert score < 10
+
+
+def test_matching_labels_do_not_conflict(make_test_case: Callable[..., models.TestCase]) -> None:
+    """Labels that repeat the case's own priority or type are fine."""
+    assert score_test_case(make_test_case(labels=['high', 'Functional']))[1] == []
+
+
+def test_score_never_drops_below_one(make_test_case: Callable[..., models.TestCase]) -> None:
+    """Stacked penalties bottom out at the lowest score."""
+    assert score_test_case(make_test_case(test_steps=[], expected_outcome='', description=''))[0] == 1
+
+
+def test_broken_case_is_rejected_locally(make_test_case: Callable[..., models.TestCase]) -> None:
+    """A case at or below the reject score gets a rules verdict."""
+    verdict = local_verdict(make_test_case(test_steps=[]), accept_score=11, reject_score=3)
+    assert verdict is not None
+    assert verdict['is_valid'] is False and verdict['source'] == 'rules'
+    assert "no test steps" in verdict['feedback']
+
+
+def test_default_accept_score_allows_one_minor_finding(make_test_case: Callable[..., models.TestCase]) -> None:
+    """At the default of 9 a single minor finding is accepted, a second is not."""
+    accept_score = 9
+    verdict = local_verdict(make_test_case(test_steps=[_step(1)]), accept_score, reject_score=3)
+    assert verdict is not None and verdict['is_valid'] is True and verdict['quality_score'] == 9
+    thin = make_test_case(test_steps=[_step(1)], description='Too short')
+    assert local_verdict(thin, accept_score, reject_score=3) is None
+
+
+def test_accept_score_above_ten_keeps_clean_cases_in_review(make_test_case: Callable[..., models.TestCase]) -> None:
+    """Above the maximum score, even a perfect case still needs the model."""
+    assert local_verdict(make_test_case(), accept_score=11, reject_score=3) is None
+
+
+def test_clean_case_can_be_accepted_when_configured(make_test_case: Callable[..., models.TestCase]) -> None:
+    """Lowering the accept score lets clean cases skip the review."""
+    verdict = local_verdict(make_test_case(), accept_score=10, reject_score=3)
+    assert verdict is not None and verdict['is_valid'] is True
+
+
+def test_borderline_case_needs_the_model(make_test_case: Callable[..., models.TestCase]) -> None:
+    """Scores strictly between the thresholds are left to the LLM."""
+    findings: List[str] = score_test_case(make_test_case(test_steps=[_step(1)]))[1]
+    assert findings == ['single_step']
+    assert local_verdict(make_test_case(test_steps=[_step(1)]), accept_score=10, reject_score=3) is None
@@ -0,0 +1,168 @@
+"""Unit tests for the token buckets, AIMD adaptation and Retry-After handling."""
+import email.utils
+import time
+from typing import Any, Dict, Optional
+import pytest
+import rate_limiter
+from rate_limiter import (
+    RateLimiter, TokenBucket, call_with_retry, classify_error, retry_after_seconds
+)
+
+
+class FakeHTTPError(Exception):
+    """An error carrying ``status`` and ``headers`` like the real clients do."""
+
+    def __init__(self, status: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+def test_bucket_allows_burst_up_to_capacity() -> None:
+    """A full bucket serves its capacity without waiting, then asks to wait."""
+    bucket = TokenBucket(60)
+    assert all(bucket.reserve() == 0.0 for _ in range(60))
+    # One unit over at 1 unit/second is roughly a one second wait
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_bucket_refills_over_time(monkeypatch: Any) -> None:
+    """Units accrue at rate/60 per second and never exceed the capacity."""
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(60)
+    bucket.reserve(60)
+    now[0] += 30
+    assert bucket.reserve(30) == 0.0
+    now[0] += 3600
+    bucket.reserve(0)
+    assert bucket._tokens == bucket.capacity
+
+
+def test_bucket_with_zero_rate_is_unlimited() -> None:
+    """A budget of 0 disables the bucket."""
+    bucket = TokenBucket(0)
+    assert bucket.reserve(1_000_000) == 0.0
+
+
+def test_adjust_refunds_unused_reservation() -> None:
+    """A negative adjustment gives back units, capped at the capacity."""
+    bucket = TokenBucket(100)
+    bucket.reserve(100)
+    bucket.adjust(-40)
+    assert bucket._tokens == pytest.approx(40, abs=1)
+    bucket.adjust(-1000)
+    assert bucket._tokens == bucket.capacity
+
+
+def test_throttle_halves_rate_and_success_restores_it() -> None:
+    """AIMD: a 429 halves the rate, successes add 5% of the ceiling back."""
+    limiter = RateLimiter('test', 100)
+    limiter.on_throttle()
+    assert limiter.requests.rate_per_minute == 50
+    limiter.on_success()
+    assert limiter.requests.rate_per_minute == 55
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.requests.rate_per_minute == 100
+
+
+def test_throttle_never_drops_below_minimum() -> None:
+    """Repeated throttling stops at ``min_requests_per_minute``."""
+    limiter = RateLimiter('test', 8, min_requests_per_minute=2)
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.requests.rate_per_minute == 2
+
+
+def test_retry_after_pauses_every_caller() -> None:
+    """A Retry-After hint delays the next reservation of the whole limiter."""
+    limiter = RateLimiter('test', 1000)
+    limiter.on_throttle(retry_after=5)
+    assert limiter._reserve(0) == pytest.approx(5, abs=0.1)
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({}, None),
+    ({'Retry-After': '7'}, 7.0),
+    ({'retry-after': '-3'}, 0.0),
+    ({'retry-after-ms': '1500'}, 1.5),
+    ({'x-ms-retry-after-ms': '250', 'Retry-After': '9'}, 0.25),
+    ({'Retry-After': 'soon'}, None),
+])
+def test_retry_after_seconds(headers: Dict[str, str], expected: Optional[float]) -> None:
+    """Seconds, millisecond variants and garbage values are parsed as documented."""
+    assert retry_after_seconds(headers) == expected
+
+
+def test_retry_after_http_date() -> None:
+    """An HTTP date is converted to the seconds remaining until it."""
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert retry_after_seconds({'Retry-After': value}) == pytest.approx(30, abs=2)
+
+
+@pytest.mark.parametrize('error, expected', [
+    (FakeHTTPError(429, {'Retry-After': '2'}), (True, True, 2.0)),
+    (FakeHTTPError(503), (True, False, None)),
+    (FakeHTTPError(400), (False, False, None)),
+    (ConnectionError(), (True, False, None)),
+    (ValueError(), (False, False, None)),
+])
+def test_classify_error(error: BaseException, expected: Any) -> None:
+    """Throttling, transient and permanent failures are told apart."""
+    assert classify_error(error) == expected
+
+
+def test_call_with_retry_retries_transient_errors(monkeypatch: Any) -> None:
+    """Transient failures are retried and a throttle lowers the rate."""
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt, retry_after=None: 0.0)
+    limiter = RateLimiter('test', 1000)
+    errors = [FakeHTTPError(429), FakeHTTPError(503)]
+
+    def flaky() -> str:
+        if errors:
+            raise errors.pop(0)
+        return 'ok'
+
+    assert call_with_retry(flaky, limiter=limiter, max_retries=3) == 'ok'
+    assert limiter.requests.rate_per_minute < 1000
+
+
+def test_call_with_retry_raises_permanent_errors(monkeypatch: Any) -> None:
+    """A non-retryable error is raised on the first attempt."""
+    calls = []
+
+    def broken() -> None:
+        calls.append(1)
+        raise FakeHTTPError(400)
+
+    with pytest.raises(FakeHTTPError):
+        call_with_retry(broken, limiter=RateLimiter('test', 1000), max_retries=3)
+    assert len(calls) == 1
+
+
+def test_non_idempotent_call_is_not_replayed_after_ambiguous_failure(monkeypatch: Any) -> None:
+    """A 5xx may follow an applied request, so a non-idempotent call raises."""
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt, retry_after=None: 0.0)
+    calls = []
+
+    def create() -> None:
+        calls.append(1)
+        raise FakeHTTPError(503)
+
+    with pytest.raises(FakeHTTPError):
+        call_with_retry(create, limiter=RateLimiter('test', 1000), max_retries=3, idempotent=False)
+    assert len(calls) == 1
+
+
+def test_non_idempotent_call_retries_throttling(monkeypatch: Any) -> None:
+    """A 429 means the request was not applied, so it is still retried."""
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt, retry_after=None: 0.0)
+    errors = [FakeHTTPError(429)]
+
+    def create() -> str:
+        if errors:
+            raise errors.pop(0)
+        return 'TEST-1'
+
+    assert call_with_retry(create, limiter=RateLimiter('test', 1000), max_retries=3, idempotent=False) == 'TEST-1'
@@ -0,0 +1,86 @@
+"""Unit tests for salvaging and normalizing malformed generation answers."""
+import json
+from typing import Any, Callable, Dict
+import pytest
+from recovery import coerce_test_case, normalize_test_case_data, salvage_test_cases
+
+# Builds a valid test case payload (the ``make_test_case_data`` fixture)
+DataFactory = Callable[..., Dict[str, Any]]
+
+
+@pytest.mark.parametrize('labels, expected', [
+    ('smoke, login', ['smoke', 'login']),
+    ('smoke login,,regression ', ['smoke', 'login', 'regression']),
+    (' , ', []),
+    ('single', ['single']),
+])
+def test_label_strings_are_split(make_test_case_data: DataFactory, labels: str, expected: list) -> None:
+    """A labels string becomes one label per comma or whitespace separated part."""
+    assert normalize_test_case_data(make_test_case_data(labels=labels))['labels'] == expected
+
+
+def test_normalize_fixes_common_shape_mistakes(make_test_case_data: DataFactory) -> None:
+    """Plain-text steps, enum spellings and structured test data are coerced."""
+    data = normalize_test_case_data(make_test_case_data(
+        test_steps=['Open page', {'action': 'Submit', 'expected_result': 'Saved'}],
+        preconditions='Logged in', test_data={'user': 'alice'},
+        priority='high', test_type='edge_case', labels=None
+    ))
+    assert data['test_steps'][0] == {'step_number': 1, 'action': 'Open page', 'expected_result': ''}
+    assert data['test_steps'][1]['step_number'] == 2
+    assert data['preconditions'] == ['Logged in']
+    assert json.loads(data['test_data']) == {'user': 'alice'}
+    assert (data['priority'], data['test_type']) == ('High', 'Edge Case')
+    assert 'labels' not in data
+
+
+def test_unknown_enum_value_falls_back_to_default(make_test_case_data: DataFactory) -> None:
+    """An unknown priority is dropped so the model default applies."""
+    test_case, normalized = coerce_test_case(make_test_case_data(priority='urgent'))
+    assert normalized and test_case.priority.value == 'Medium'
+
+
+def test_coerce_leaves_valid_data_alone(make_test_case_data: DataFactory) -> None:
+    """Valid data is used as given."""
+    assert coerce_test_case(make_test_case_data())[1] is False
+
+
+def test_missing_required_field_still_fails() -> None:
+    """Normalization never invents content."""
+    with pytest.raises(ValueError):
+        coerce_test_case({'title': 'No outcome', 'description': 'd'})
+    with pytest.raises(TypeError):
+        coerce_test_case(['not', 'an', 'object'])
+
+
+def test_salvage_fenced_answer_with_trailing_comma(make_test_case_data: DataFactory) -> None:
+    """A fenced array with a trailing comma decodes whole."""
+    text = json.dumps([make_test_case_data('A'), make_test_case_data('B')])
+    answer = salvage_test_cases('```json\n' + text[:-1] + ',]\n```')
+    assert [test_case.title for test_case in answer.test_cases] == ['A', 'B']
+    assert answer.complete
+
+
+def test_salvage_truncated_answer_keeps_complete_cases(make_test_case_data: DataFactory) -> None:
+    """A cut-off array keeps every closed case and reports it incomplete."""
+    text = json.dumps([make_test_case_data('A'), make_test_case_data('B')])
+    answer = salvage_test_cases(text[:-30])
+    assert [test_case.title for test_case in answer.test_cases] == ['A']
+    assert not answer.complete
+
+
+def test_salvage_sorts_broken_cases_for_repair(make_test_case_data: DataFactory) -> None:
+    """Cases that fail even after normalization are kept with their error."""
+    payload = [make_test_case_data('A'), {'title': 'B'}, make_test_case_data('C', labels='x y')]
+    answer = salvage_test_cases(json.dumps(payload))
+    assert [test_case.title for test_case in answer.test_cases] == ['A', 'C']
+    assert answer.test_cases[1].labels == ['x', 'y']
+    assert answer.normalized == 1
+    assert len(answer.broken) == 1 and answer.broken[0][0] == {'title': 'B'}
+
+
+def test_salvage_unwraps_an_object(make_test_case_data: DataFactory) -> None:
+    """An object wrapping the array, or a single case, is accepted."""
+    wrapped = {'test_cases': [make_test_case_data('A'), make_test_case_data('B')]}
+    assert len(salvage_test_cases(json.dumps(wrapped)).test_cases) == 2
+    assert len(salvage_test_cases(json.dumps(make_test_case_data('A'))).test_cases) == 1
@@ -0,0 +1,90 @@
+"""Unit tests for the work journal and resuming Jira writes from it."""
+import asyncio
+from typing import Any, Callable, Dict, List
+import pytest
+from config import settings
+import models
+import test_case_generator
+from conftest import FakeJira
+from work_journal import WorkJournal, fingerprint_label, story_fingerprint
+
+# Builds a valid test case (the ``make_test_case`` fixture)
+CaseFactory = Callable[..., models.TestCase]
+
+
+@pytest.fixture
+def journal_path(tmp_path: Any, monkeypatch: Any) -> str:
+    """Enable the journal at a temporary path."""
+    path = str(tmp_path / 'journal.sqlite3')
+    monkeypatch.setattr(settings, 'journal_enabled', True)
+    monkeypatch.setattr(settings, 'journal_path', path)
+    monkeypatch.setattr(settings, 'dedup_enabled', False)
+    return path
+
+
+def _file(generator: test_case_generator.TestCaseGenerator, story_fp: str,
+          test_cases: List[models.TestCase]) -> Dict[str, Any]:
+    """File ``test_cases`` through the generator and return the story results."""
+    results = generator._new_result('story')
+    asyncio.run(generator._write_test_cases(test_cases, 'TEST-100', results, story_fp))
+    return results
+
+
+def test_generation_is_only_reused_once_complete(tmp_path: Any, make_test_case: CaseFactory) -> None:
+    """Test cases come back only after the story is marked complete."""
+    journal = WorkJournal(str(tmp_path / 'journal.sqlite3'))
+    journal.record_test_case('fp', 'story', 0, make_test_case('first'))
+    assert journal.get_test_cases('fp') is None
+    journal.record_test_cases('fp', 'story', [make_test_case('first'), make_test_case('second')])
+    assert [test_case.title for test_case in journal.get_test_cases('fp')] == ['first', 'second']
+    journal.close()
+
+
+def test_attempted_slots_without_key_are_unconfirmed(tmp_path: Any, make_test_case: CaseFactory) -> None:
+    """Only attempted slots with no recorded key need reconciling."""
+    journal = WorkJournal(str(tmp_path / 'journal.sqlite3'))
+    journal.record_test_cases('fp', 'story', [make_test_case('a'), make_test_case('b'), make_test_case('c')])
+    journal.mark_attempted('fp', [0, 1])
+    journal.record_jira_key('fp', 0, 'TEST-1')
+    assert journal.get_unconfirmed_attempts('fp') == {1}
+    assert journal.get_jira_keys('fp') == {0: 'TEST-1'}
+    journal.close()
+
+
+def test_rerun_reports_filed_slots_as_existing(journal_path: str, fake_jira: FakeJira, make_test_case: CaseFactory,
+                                                make_story: Callable[..., models.UserStory]) -> None:
+    """A rerun files nothing again, needs no search and counts keys as existing."""
+    test_cases = [make_test_case('a'), make_test_case('b')]
+    story_fp = story_fingerprint(make_story('story'), 'TEST-100')
+
+    generator = test_case_generator.TestCaseGenerator()
+    generator.journal.record_test_cases(story_fp, 'story', test_cases)
+    first = _file(generator, story_fp, test_cases)
+    assert first['created_jira_issues'] == 2 and first['existing_jira_issues'] == 0
+    assert fake_jira.searches == []
+    generator.journal.close()
+
+    generator = test_case_generator.TestCaseGenerator()
+    second = _file(generator, story_fp, test_cases)
+    assert second['created_jira_issues'] == 0 and second['existing_jira_issues'] == 2
+    assert second['test_case_keys'] == first['test_case_keys']
+    assert fake_jira.created == ['a', 'b'] and fake_jira.searches == []
+    generator.journal.close()
+
+
+def test_interrupted_create_is_reconciled_by_label(journal_path: str, fake_jira: FakeJira,
+                                                   make_test_case: CaseFactory) -> None:
+    """An attempted slot without a key is looked up by label, not recreated."""
+    test_cases = [make_test_case('a'), make_test_case('b')]
+    generator = test_case_generator.TestCaseGenerator()
+    generator.journal.record_test_cases('fp', 'story', test_cases)
+    # The previous run died after Jira created slot 0 but before the key was recorded
+    generator.journal.mark_attempted('fp', [0])
+    fake_jira.labelled = {fingerprint_label('fp', 0): 'TEST-7'}
+
+    results = _file(generator, 'fp', test_cases)
+    assert fake_jira.searches == [[fingerprint_label('fp', 0)]]
+    assert fake_jira.created == ['b']
+    assert results['existing_jira_issues'] == 1 and results['created_jira_issues'] == 1
+    assert generator.journal.get_jira_keys('fp') == {0: 'TEST-7', 1: 'TEST-1'}
+    generator.journal.close()